@@ -0,0 +1,164 @@
+import asyncio
+import itertools
+
+from aiohttp import WSMsgType, web
+
+ITEM_ID = "benchmark-item"
+
+
+class MockReportingService:  # pylint: disable=too-many-instance-attributes
+    """A local stand-in for a portal and reporting service, for benchmarking the client.
+
+    Jobs finish `job_duration` seconds after they're submitted, and every request is
+    delayed by `latency` seconds. The service counts the connections made to it, so
+    connection reuse can be compared between modes.
+
+    Args:
+        job_duration (float, optional): The seconds each job takes. Defaults to `0.2`.
+        latency (float, optional): The seconds added to each request. Defaults to `0`.
+        artifact_size (int, optional): The size of each artifact in bytes.
+            Defaults to 64 KiB.
+        secured (bool, optional): When `True`, the portal item isn't public, so the
+            client has to exchange its token for a reporting token. Defaults to `False`.
+    """
+
+    def __init__(
+        self, *, job_duration=0.2, latency=0.0, artifact_size=64 * 1024, secured=False
+    ):
+        self.job_duration = job_duration
+        self.latency = latency
+        self.artifact = b"%PDF" + b"x" * max(artifact_size - 4, 0)
+        self.secured = secured
+        self.base_url = ""
+        self._runner = None
+        self._tickets = itertools.count()
+        self._jobs = {}
+        self.requests = 0
+        self.websockets = 0
+        self.open_websockets = 0
+        self.max_open_websockets = 0
+        self._peers = set()
+
+    def reset_stats(self):
+        """Reset the request and connection counts."""
+
+        self.requests = 0
+        self.websockets = 0
+        self.open_websockets = 0
+        self.max_open_websockets = 0
+        self._peers = set()
+
+    @property
+    def http_connections(self) -> int:
+        """The number of distinct HTTP connections made since the stats were reset."""
+        return len(self._peers)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def start(self):
+        """Start listening on a free local port."""
+
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get(f"/sharing/rest/content/items/{ITEM_ID}", self._get_item),
+                web.post("/reporting/service/auth/token/run", self._exchange_token),
+                web.post("/reporting/service/job/run", self._run_job),
+                web.get("/reporting/service/job/artifacts", self._get_artifacts),
+                web.get("/reporting/service/job/result", self._get_result),
+            ]
+        )
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        self.base_url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+
+    async def stop(self):
+        """Stop the service and close its connections."""
+
+        await self._runner.cleanup()
+
+    async def _handle(self, request):
+        self.requests += 1
+        self._peers.add(request.transport.get_extra_info("peername"))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _get_job_status(self, ticket: str) -> dict:
+        finishes_at = self._jobs.get(ticket)
+        if finishes_at is None:
+            raise web.HTTPNotFound()
+        if asyncio.get_event_loop().time() < finishes_at:
+            return {"results": []}
+
+        return {
+            "results": [
+                {
+                    "$type": "JobResult",
+                    "tag": "benchmark",
+                    "contentType": "application/pdf",
+                    "length": len(self.artifact),
+                },
+                {"$type": "JobQuit", "kind": "Run"},
+            ]
+        }
+
+    async def _get_item(self, request):
+        await self._handle(request)
+        return web.json_response(
+            {
+                "access": "private" if self.secured else "public",
+                "url": f"{self.base_url}/reporting",
+            }
+        )
+
+    async def _exchange_token(self, request):
+        await self._handle(request)
+        return web.json_response(
+            {"response": {"token": "benchmark-token", "expiresIn": 3600}}
+        )
+
+    async def _run_job(self, request):
+        await self._handle(request)
+        ticket = str(next(self._tickets))
+        self._jobs[ticket] = asyncio.get_event_loop().time() + self.job_duration
+        return web.json_response({"response": {"ticket": ticket}})
+
+    async def _get_artifacts(self, request):
+        ticket = request.query.get("ticket", "")
+        websocket = web.WebSocketResponse()
+        if not websocket.can_prepare(request).ok:
+            await self._handle(request)
+            return web.json_response(self._get_job_status(ticket))
+
+        self.websockets += 1
+        self.open_websockets += 1
+        self.max_open_websockets = max(self.max_open_websockets, self.open_websockets)
+        try:
+            await websocket.prepare(request)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            # Only the final status is sent, once the job has finished.
+            delay = self._jobs.get(ticket, 0) - asyncio.get_event_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await websocket.send_json(self._get_job_status(ticket))
+
+            async for message in websocket:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self.open_websockets -= 1
+
+        return websocket
+
+    async def _get_result(self, request):
+        await self._handle(request)
+        self._get_job_status(request.query.get("ticket", ""))
+        return web.Response(body=self.artifact, content_type="application/pdf")
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import math
+import time
+
+from geocortex.reporting.client import (
+    AiohttpTransport,
+    PollingStrategy,
+    ReportingClient,
+    RequestsTransport,
+)
+from geocortex.reporting.client.auth import reporting_token_cache
+from geocortex.reporting.client.portal_utils import portal_item_cache
+
+from benchmarks.mock_service import ITEM_ID, MockReportingService
+
+TRANSPORTS = {"requests": RequestsTransport, "aiohttp": AiohttpTransport}
+
+
+def percentile(values, fraction: float) -> float:
+    """Return the nearest-rank percentile of `values`, e.g. `fraction=0.99` for p99."""
+
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class ScenarioResult:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """The measurements from running one benchmark scenario."""
+
+    __slots__ = (
+        "name",
+        "jobs",
+        "errors",
+        "seconds",
+        "latencies",
+        "http_connections",
+        "websockets",
+        "requests",
+    )
+
+    def __init__(self, name: str):
+        self.name = name
+        self.jobs = 0
+        self.errors = []
+        self.seconds = 0.0
+        self.latencies = []
+        self.http_connections = 0
+        self.websockets = 0
+        self.requests = 0
+
+    @property
+    def jobs_per_second(self) -> float:
+        """The number of jobs completed per second of wall time."""
+        return self.jobs / self.seconds if self.seconds else 0.0
+
+    def format_row(self) -> str:
+        """Return the result as a row of the results table."""
+
+        if not self.jobs and self.errors:
+            return f"{self.name:<20} failed: {self.errors[0]!r}"
+
+        return (
+            f"{self.name:<20} {self.jobs:>6} {len(self.errors):>6}"
+            f" {self.jobs_per_second:>9.1f} {percentile(self.latencies, 0.5):>9.3f}"
+            f" {percentile(self.latencies, 0.99):>9.3f} {self.http_connections:>6}"
+            f" {self.websockets:>6} {self.requests:>8}"
+        )
+
+
+TABLE_HEADER = (
+    f"{'scenario':<20} {'jobs':>6} {'errors':>6} {'jobs/s':>9} {'p50 (s)':>9}"
+    f" {'p99 (s)':>9} {'http':>6} {'ws':>6} {'requests':>8}"
+)
+
+
+async def run_scenario(  # pylint: disable=too-many-arguments,too-many-locals
+    service: MockReportingService,
+    *,
+    use_polling: bool,
+    batch: bool,
+    jobs: int,
+    concurrency: int,
+    transport="requests",
+    polling_strategy: PollingStrategy = None,
+) -> ScenarioResult:
+    """Run `jobs` reports against `service` and measure them.
+
+    Single runs call `ReportingClient.run` for one job at a time. Batch runs submit
+    every job through `ReportingClient.run_many` with `concurrency` jobs in flight.
+    """
+
+    name = (
+        f"{'polling' if use_polling else 'websocket'}/{'batch' if batch else 'single'}"
+    )
+    result = ScenarioResult(name)
+    portal_item_cache.clear()
+    reporting_token_cache.clear()
+    service.reset_stats()
+
+    def record(job_result, error):
+        if error is not None:
+            result.errors.append(error)
+        elif job_result is not None:
+            result.jobs += 1
+            result.latencies.append(job_result.duration)
+
+    # The client doesn't close a transport it's given.
+    client_transport = TRANSPORTS[transport](pool_size=max(concurrency, 1))
+    start = time.perf_counter()
+    try:
+        async with ReportingClient(
+            portal_url=service.base_url,
+            token="benchmark" if service.secured else "",
+            transport=client_transport,
+        ) as client:
+            if batch:
+                async for batch_result in client.run_many(
+                    ITEM_ID,
+                    ({"Index": x} for x in range(jobs)),
+                    max_concurrency=concurrency,
+                    use_polling=use_polling,
+                    polling_strategy=polling_strategy,
+                ):
+                    record(batch_result.result, batch_result.error)
+            else:
+                for index in range(jobs):
+                    try:
+                        job_result = await client.run(
+                            ITEM_ID,
+                            use_polling=use_polling,
+                            polling_strategy=polling_strategy,
+                            return_job_result=True,
+                            Index=index,
+                        )
+                        record(job_result, None)
+                    except Exception as error:  # pylint: disable=broad-except
+                        record(None, error)
+        result.seconds = time.perf_counter() - start
+    finally:
+        await client_transport.close()
+
+    result.http_connections = service.http_connections
+    result.websockets = service.websockets
+    result.requests = service.requests
+    return result
+
+
+async def main(args) -> list:
+    """Run every requested scenario and print a table of the results."""
+
+    strategy = PollingStrategy(
+        initial_interval=args.poll_interval,
+        max_interval=max(args.poll_interval, args.max_poll_interval),
+    )
+    results = []
+    print(TABLE_HEADER)
+    async with MockReportingService(
+        job_duration=args.job_duration,
+        latency=args.latency,
+        artifact_size=args.artifact_size,
+        secured=args.secured,
+    ) as service:
+        for mode in args.modes:
+            for batch in (False, True):
+                result = await run_scenario(
+                    service,
+                    use_polling=mode == "polling",
+                    batch=batch,
+                    jobs=args.single_jobs if not batch else args.jobs,
+                    concurrency=args.concurrency,
+                    transport=args.transport,
+                    polling_strategy=strategy,
+                )
+                print(result.format_row())
+                results.append(result)
+
+    return results
+
+
+def parse_args(argv=None):
+    """Parse the benchmark's command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description="Measure report throughput and latency against a local mock service."
+    )
+    parser.add_argument("--jobs", type=int, default=200, help="Jobs per batch run.")
+    parser.add_argument(
+        "--single-jobs", type=int, default=20, help="Jobs run one at a time."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=20, help="Jobs in flight per batch."
+    )
+    parser.add_argument(
+        "--job-duration", type=float, default=0.2, help="Seconds each job takes."
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.002, help="Seconds added to each request."
+    )
+    parser.add_argument("--artifact-size", type=int, default=64 * 1024)
+    parser.add_argument(
+        "--secured", action="store_true", help="Exchange a token for each client."
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["polling", "websocket"],
+        default=["polling", "websocket"],
+    )
+    parser.add_argument("--transport", choices=sorted(TRANSPORTS), default="requests")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--max-poll-interval", type=float, default=0.5)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main(parse_args()))
@@ -1,4 +1,88 @@
-__all__ = ["run"]
-
-from .reporting_service import run
+__all__ = [
+    "run",
+    "run_many",
+    "run_sync",
+    "run_chunked",
+    "prewarm",
+    "ReportingClient",
+    "PreparedTemplate",
+    "ReportExecutor",
+    "download",
+    "download_many",
+    "download_merged",
+    "DownloadResult",
+    "IncompleteDownloadError",
+    "JobNotFinishedError",
+    "stream_result",
+    "BatchResult",
+    "JobResult",
+    "JobEvent",
+    "JobEventStream",
+    "TicketJournal",
+    "JournalEntry",
+    "PollingStrategy",
+    "JobTimeoutError",
+    "RetryPolicy",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "EndpointPool",
+    "SubmissionQueue",
+    "INTERACTIVE",
+    "BATCH",
+    "portal_item_cache",
+    "invalidate_portal_item",
+    "reporting_token_cache",
+    "ResultCache",
+    "MemoryResultCache",
+    "DiskResultCache",
+    "Transport",
+    "RequestsTransport",
+    "AiohttpTransport",
+    "HTTPStatusError",
+    "Instrumentation",
+    "MetricsInstrumentation",
+    "OpenTelemetryInstrumentation",
+    "StreamedResponse",
+]
 
+from .auth import reporting_token_cache
+from .balancing import EndpointPool
+from .download import (
+    DownloadResult,
+    IncompleteDownloadError,
+    JobNotFinishedError,
+    download,
+    download_many,
+    download_merged,
+    stream_result,
+)
+from .events import JobEvent, JobEventStream
+from .executor import ReportExecutor, run_sync
+from .instrumentation import (
+    Instrumentation,
+    MetricsInstrumentation,
+    OpenTelemetryInstrumentation,
+)
+from .job_args import PreparedTemplate
+from .job_status import JobResult
+from .journal import JournalEntry, TicketJournal
+from .polling import JobTimeoutError, PollingStrategy
+from .portal_utils import invalidate_portal_item, portal_item_cache
+from .reporting_service import (
+    BatchResult,
+    ReportingClient,
+    prewarm,
+    run,
+    run_chunked,
+    run_many,
+)
+from .result_cache import DiskResultCache, MemoryResultCache, ResultCache
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from .submission_queue import BATCH, INTERACTIVE, SubmissionQueue
+from .transport import (
+    AiohttpTransport,
+    HTTPStatusError,
+    RequestsTransport,
+    StreamedResponse,
+    Transport,
+)
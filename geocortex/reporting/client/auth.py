@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import weakref
+
+from .cache import TTLCache
+from .transport import Transport
+
+# Used when the token's lifetime can't be determined from the token exchange.
+DEFAULT_TOKEN_LIFETIME = 30 * 60
+
+# Tokens are refreshed this many seconds before they expire.
+TOKEN_REFRESH_MARGIN = 60
+
+# Reporting tokens keyed on the service URL, portal URL and portal token.
+# The values are a tuple of the reporting token and the time it should be refreshed.
+reporting_token_cache = TTLCache(max_size=256, ttl=DEFAULT_TOKEN_LIFETIME)
+
+# In-flight token exchanges, per event loop.
+_exchanges = weakref.WeakKeyDictionary()
+
+
+def _get_cache_key(service_url: str, portal_url: str, token: str) -> tuple:
+    return (service_url, portal_url, hashlib.sha256(token.encode()).hexdigest())
+
+
+def _get_jwt_expiry(token: str) -> float:
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return 0
+
+
+def _get_token_lifetime(response: dict) -> float:
+    """Returns the number of seconds a reporting token is valid for."""
+
+    if "expiresIn" in response:
+        return float(response["expiresIn"])
+
+    # ArcGIS style expiry, in milliseconds since the epoch.
+    expires = response.get("expires", 0) / 1000 or _get_jwt_expiry(response["token"])
+    if expires:
+        return expires - time.time()
+
+    return DEFAULT_TOKEN_LIFETIME
+
+
+async def _exchange_token(
+    transport: Transport, service_url: str, portal_url: str, token: str
+) -> str:
+    token_args = {"accessToken": token, "portalUrl": portal_url}
+    response_json = await transport.post_json(
+        service_url + "/auth/token/run", token_args
+    )
+    response = response_json["response"]
+    reporting_token = response["token"]
+
+    lifetime = _get_token_lifetime(response)
+    if lifetime > 0:
+        refresh_at = time.monotonic() + max(lifetime - TOKEN_REFRESH_MARGIN, 0)
+        reporting_token_cache.set(
+            _get_cache_key(service_url, portal_url, token),
+            (reporting_token, refresh_at),
+            ttl=lifetime,
+        )
+
+    return reporting_token
+
+
+def _start_exchange(
+    transport: Transport, service_url: str, portal_url: str, token: str
+) -> asyncio.Future:
+    # Concurrent callers share a single exchange rather than each making their own.
+    loop_exchanges = _exchanges.setdefault(asyncio.get_event_loop(), {})
+    key = _get_cache_key(service_url, portal_url, token)
+    future = loop_exchanges.get(key)
+    if future is None:
+        future = asyncio.ensure_future(
+            _exchange_token(transport, service_url, portal_url, token)
+        )
+        loop_exchanges[key] = future
+        future.add_done_callback(lambda _: loop_exchanges.pop(key, None))
+
+    return future
+
+
+def _ignore_refresh_error(future: asyncio.Future):
+    # A failed background refresh is retried when the token is next requested.
+    if not future.cancelled():
+        future.exception()
+
+
+async def get_reporting_token(
+    transport: Transport, service_url: str, portal_url: str, token: str
+) -> str:
+    """Exchange a portal token for a reporting token, reusing a cached one if possible.
+
+    Tokens that are close to expiring are still returned, but are refreshed in the
+    background so later callers get a fresh one.
+    """
+
+    entry = reporting_token_cache.get(_get_cache_key(service_url, portal_url, token))
+    if entry is not None:
+        reporting_token, refresh_at = entry
+        if time.monotonic() >= refresh_at:
+            future = _start_exchange(transport, service_url, portal_url, token)
+            future.add_done_callback(_ignore_refresh_error)
+        return reporting_token
+
+    future = _start_exchange(transport, service_url, portal_url, token)
+    # Shield the shared exchange so one cancelled caller doesn't cancel the others.
+    return await asyncio.shield(future)
+
+
+def invalidate_reporting_token(
+    service_url: str, portal_url: str, token: str, reporting_token=""
+):
+    """Remove a cached reporting token.
+
+    If `reporting_token` is provided, the cached token is only removed if it matches.
+    This avoids discarding a token that another caller has already refreshed.
+    """
+
+    key = _get_cache_key(service_url, portal_url, token)
+    entry = reporting_token_cache.get(key)
+    if entry is not None and (not reporting_token or entry[0] == reporting_token):
+        reporting_token_cache.invalidate(key)
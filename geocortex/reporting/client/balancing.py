@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+
+from .transport import Transport, is_transient_error
+
+# The ways an `EndpointPool` picks an endpoint for a job.
+LEAST_OUTSTANDING = "least_outstanding"
+LOWEST_LATENCY = "latency"
+
+# How much each finished job moves an endpoint's average job duration.
+_LATENCY_WEIGHT = 0.3
+
+
+def _to_service_url(url: str) -> str:
+    url = url.strip("/")
+    return url if url.endswith("/service") else url + "/service"
+
+
+async def _probe(transport: Transport, service_url: str):
+    # Any answer, even one rejecting the unknown ticket, shows the service is up.
+    try:
+        await transport.get_json(f"{service_url}/job/artifacts?ticket=health-check")
+    except Exception as error:  # pylint: disable=broad-except
+        if is_transient_error(error):
+            raise
+
+
+class _Endpoint:  # pylint: disable=too-few-public-methods
+    __slots__ = ("service_url", "outstanding", "latency", "failures", "next_check")
+
+    def __init__(self, service_url: str):
+        self.service_url = service_url
+        self.outstanding = 0
+        self.latency = None
+        self.failures = 0
+        # When the endpoint is next health checked, or `None` while it's healthy.
+        self.next_check = None
+
+
+class EndpointPool:  # pylint: disable=too-many-instance-attributes
+    """Spreads jobs across several instances of a reporting service.
+
+    Pass a pool to `ReportingClient` or `run_many` and each job is submitted to, and
+    waited on at, the endpoint the pool picks for it, rather than the one named by
+    the portal item. Endpoints are picked by `strategy`:
+
+    - `"least_outstanding"`: the endpoint with the fewest jobs in flight.
+    - `"latency"`: the endpoint whose recent jobs finished fastest, weighted by the
+      jobs it has in flight. Until every endpoint has finished a job, the endpoint
+      with the fewest jobs in flight is picked instead, so each is tried without one
+      that never finishes its jobs drawing them all.
+
+    Ties go to the endpoint with the fewest jobs in flight, then to each endpoint in
+    turn. Once `unhealthy_threshold` jobs in a row fail on an endpoint with a
+    transient error or time out, it's drained: jobs already on it carry on,
+    but new jobs go elsewhere. Every `health_check_interval` seconds a drained
+    endpoint is sent a request, and it rejoins the pool once it answers. If every
+    endpoint is drained, jobs are spread across all of them.
+
+    Share a pool between clients for them to share its state; it's safe to use from
+    many threads.
+
+    Args:
+        service_urls (Iterable[str]): The URLs of the reporting services, e.g.
+            `https://server1/reporting`. They must all serve the same templates.
+        strategy (str, optional): `"least_outstanding"` or `"latency"`. Defaults to
+            `"least_outstanding"`.
+        unhealthy_threshold (int, optional): The number of consecutive failed jobs that
+            drain an endpoint. Defaults to `3`.
+        health_check_interval (float, optional): The number of seconds between health
+            checks of a drained endpoint. Defaults to `30`.
+        health_check_timeout (float, optional): The number of seconds to wait for a
+            health check to answer. Defaults to `5`.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        service_urls,
+        *,
+        strategy=LEAST_OUTSTANDING,
+        unhealthy_threshold=3,
+        health_check_interval=30.0,
+        health_check_timeout=5.0,
+    ):
+        self._endpoints = [_Endpoint(_to_service_url(x)) for x in service_urls]
+        if not self._endpoints:
+            raise ValueError("An endpoint pool needs at least one service URL.")
+        if strategy not in (LEAST_OUTSTANDING, LOWEST_LATENCY):
+            raise ValueError(f"Unknown strategy: {strategy}")
+        if unhealthy_threshold < 1:
+            raise ValueError("unhealthy_threshold must be at least 1.")
+
+        self.strategy = strategy
+        self.unhealthy_threshold = unhealthy_threshold
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self._by_url = {x.service_url: x for x in self._endpoints}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def service_urls(self) -> list:
+        """The URLs of the endpoints' reporting services, in the order given."""
+        return [x.service_url for x in self._endpoints]
+
+    def is_healthy(self, service_url: str) -> bool:
+        """Return whether new jobs may be sent to `service_url`."""
+
+        with self._lock:
+            return self._by_url[service_url].next_check is None
+
+    def outstanding(self, service_url: str) -> int:
+        """Return the number of jobs in flight on `service_url`."""
+
+        with self._lock:
+            return self._by_url[service_url].outstanding
+
+    def _get_load(self, candidates: list):
+        if self.strategy == LEAST_OUTSTANDING or any(
+            x.latency is None for x in candidates
+        ):
+            return lambda endpoint: (endpoint.outstanding,)
+
+        return lambda endpoint: (
+            endpoint.latency * (endpoint.outstanding + 1),
+            endpoint.outstanding,
+        )
+
+    def acquire(self) -> str:
+        """Pick the endpoint for a job, counting the job as in flight on it.
+
+        Returns:
+            The URL of the endpoint's reporting service. Pass it to `release` once
+            the job is done.
+        """
+
+        with self._lock:
+            count = len(self._endpoints)
+            # Start from a different endpoint each time so ties take turns.
+            ordered = [self._endpoints[(self._next + x) % count] for x in range(count)]
+            self._next = (self._next + 1) % count
+
+            candidates = [x for x in ordered if x.next_check is None] or ordered
+            endpoint = min(candidates, key=self._get_load(candidates))
+            endpoint.outstanding += 1
+            return endpoint.service_url
+
+    def release(self, service_url: str, duration: float = None, failed=False):
+        """Count a job on `service_url` as done.
+
+        Args:
+            service_url (str): The URL returned by `acquire`.
+            duration (float, optional): How long the job took, if it succeeded.
+            failed (bool, optional): Whether the job failed because the service
+                couldn't be reached, answered with a server error or didn't finish
+                the job in time.
+        """
+
+        with self._lock:
+            endpoint = self._by_url[service_url]
+            endpoint.outstanding -= 1
+            if duration is not None:
+                endpoint.failures = 0
+                if endpoint.latency is None:
+                    endpoint.latency = duration
+                else:
+                    endpoint.latency += _LATENCY_WEIGHT * (duration - endpoint.latency)
+            elif failed:
+                endpoint.failures += 1
+                if (
+                    endpoint.failures >= self.unhealthy_threshold
+                    and endpoint.next_check is None
+                ):
+                    endpoint.next_check = time.monotonic() + self.health_check_interval
+
+    async def check_health(self, transport: Transport):
+        """Health check the drained endpoints that are due one.
+
+        Returns straight away if none are due. Each due endpoint is only checked by
+        one caller.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                x
+                for x in self._endpoints
+                if x.next_check is not None and x.next_check <= now
+            ]
+            for endpoint in due:
+                endpoint.next_check = now + self.health_check_interval
+
+        if due:
+            await asyncio.gather(*(self._check(transport, x) for x in due))
+
+    async def _check(self, transport: Transport, endpoint: _Endpoint):
+        try:
+            await asyncio.wait_for(
+                _probe(transport, endpoint.service_url), self.health_check_timeout
+            )
+        except Exception:  # pylint: disable=broad-except
+            return
+
+        with self._lock:
+            endpoint.failures = 0
+            endpoint.next_check = None
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """A thread-safe, size-bounded cache whose entries expire after a time to live.
+
+    When the cache is full the least recently used entry is evicted.
+
+    Args:
+        max_size (int, optional): The maximum number of entries. Defaults to `256`.
+        ttl (float, optional): The number of seconds entries stay valid for.
+            Defaults to `300`. A TTL of `0` disables the cache.
+        clock (callable, optional): Returns the current time in seconds.
+            Defaults to `time.monotonic`.
+
+    Attributes:
+        hits (int): The number of lookups that found a valid entry.
+        misses (int): The number of lookups that found no entry, or an expired one.
+    """
+
+    def __init__(self, *, max_size=256, ttl=300.0, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the value cached for `key`, or `default` if it's missing or expired."""
+
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Cache a value, optionally overriding the cache's TTL for this entry."""
+
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove the entry for `key`, if there is one."""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Remove every entry whose key matches `predicate`."""
+
+        with self._lock:
+            for key in [x for x in self._entries if predicate(x)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove every entry and reset the hit and miss counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
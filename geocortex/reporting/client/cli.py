@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import contextlib
+import csv
+import itertools
+import mimetypes
+import os
+import sys
+
+from .journal import TicketJournal
+from .json_codec import dumps, loads
+from .reporting_service import ReportingClient
+from .transport import AiohttpTransport, RequestsTransport, Transport
+
+TRANSPORTS = {"requests": RequestsTransport, "aiohttp": AiohttpTransport}
+
+# The portal token is read from the environment so it isn't visible in process lists.
+TOKEN_VARIABLE = "VERTIGIS_PORTAL_TOKEN"
+
+
+def _parse_value(text: str):
+    """Return `text` decoded as JSON if it's valid JSON, otherwise as a string."""
+
+    try:
+        return loads(text)
+    except ValueError:
+        return text
+
+
+def _parse_param(text: str) -> tuple:
+    name, separator, value = text.partition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f"{text!r} isn't in the form NAME=VALUE.")
+    return name, _parse_value(value)
+
+
+def _get_format(args) -> str:
+    if args.format:
+        return args.format
+    return "csv" if args.input.lower().endswith(".csv") else "jsonl"
+
+
+def read_param_sets(file, file_format: str):
+    """Yields a dict of parameters for each record in a CSV or JSON Lines file.
+
+    The file is read one record at a time, so it can be of any size. CSV cells are
+    decoded as JSON where they're valid JSON, so `[1, 2]` is a list and `3` a number,
+    and are otherwise strings. Empty cells are left out.
+    """
+
+    if file_format == "csv":
+        for row in csv.DictReader(file):
+            yield {k: _parse_value(v) for k, v in row.items() if k and v}
+        return
+
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        parameters = loads(line)
+        if not isinstance(parameters, dict):
+            raise ValueError(f"Line {number} of the input isn't a JSON object.")
+        yield parameters
+
+
+def read_log(path: str) -> tuple:
+    """Return the indices of the jobs that succeeded in a result log.
+
+    Also returns whether the log ends part way through a line, as it does when the
+    previous run was stopped while writing it. That line is ignored.
+    """
+
+    succeeded = set()
+    if not os.path.exists(path):
+        return succeeded, False
+
+    line = b""
+    with open(path, "rb") as file:
+        for line in file:
+            try:
+                record = loads(line)
+            except ValueError:
+                continue
+            if record.get("error") is None:
+                succeeded.add(record["index"])
+    return succeeded, bool(line) and not line.endswith(b"\n")
+
+
+def _get_record(batch_result, index: int, path=None, error=None) -> dict:
+    job_result = batch_result.result
+    error = error or batch_result.error
+    return {
+        "index": index,
+        "parameters": batch_result.parameters,
+        "url": batch_result.url or None,
+        "path": path,
+        "error": f"{type(error).__name__}: {error}" if error else None,
+        "result": job_result.to_dict() if job_result else None,
+    }
+
+
+class _Counts:  # pylint: disable=too-few-public-methods
+    __slots__ = ("succeeded", "failed", "skipped")
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+
+
+async def _run_jobs(  # pylint: disable=too-many-locals
+    args, client: ReportingClient, param_sets, log, succeeded: set
+) -> _Counts:
+    counts = _Counts()
+    # Maps a job's position in the batch to its index in the input, for the jobs
+    # in flight. Skipped records leave gaps, so the two can differ.
+    indices = {}
+    positions = itertools.count()
+
+    def skip_succeeded():
+        for index, parameters in enumerate(param_sets):
+            if index in succeeded:
+                counts.skipped += 1
+                continue
+            indices[next(positions)] = index
+            yield parameters
+
+    def write(record: dict):
+        log.write(dumps(record) + b"\n")
+        log.flush()
+        if record["error"] is None:
+            counts.succeeded += 1
+        else:
+            counts.failed += 1
+
+    async def download_and_write(batch_result, index: int):
+        job_result = batch_result.result
+        extension = mimetypes.guess_extension(job_result.content_type or "") or ""
+        path = os.path.join(args.download_dir, f"{index}{extension}")
+        try:
+            await client.download(job_result, path, resume=args.resume)
+            write(_get_record(batch_result, index, path))
+        except Exception as error:  # pylint: disable=broad-except
+            write(_get_record(batch_result, index, error=error))
+        finally:
+            download_slots.release()
+
+    download_slots = asyncio.Semaphore(args.concurrency)
+    downloads = set()
+    template = client.prepare(
+        args.item_id, culture=args.culture, dpi=args.dpi, **dict(args.param)
+    )
+    batch = client.run_many(
+        template,
+        skip_succeeded(),
+        max_concurrency=args.concurrency,
+        use_polling=args.polling,
+    )
+    try:
+        async for batch_result in batch:
+            index = indices.pop(batch_result.index)
+            if args.download_dir and batch_result.result is not None:
+                # At most `concurrency` downloads are in flight at once.
+                await download_slots.acquire()
+                task = asyncio.ensure_future(download_and_write(batch_result, index))
+                downloads.add(task)
+                task.add_done_callback(downloads.discard)
+            else:
+                write(_get_record(batch_result, index))
+        if downloads:
+            await asyncio.gather(*downloads)
+    finally:
+        await batch.aclose()
+        for task in downloads:
+            task.cancel()
+
+    return counts
+
+
+async def run_batch(args, *, transport: Transport = None) -> int:
+    """Runs the `batch` command with the parsed `args`, returning its exit status.
+
+    Each finished job is written to the result log as soon as it completes, so the
+    log is complete up to the moment a run is stopped. With `--resume`, the jobs
+    that succeeded in the log are skipped and the rest are appended to it.
+    """
+
+    succeeded, partial_line = read_log(args.output) if args.resume else (set(), False)
+    if args.download_dir:
+        os.makedirs(args.download_dir, exist_ok=True)
+
+    owns_transport = transport is None
+    transport = transport or TRANSPORTS[args.transport]()
+    try:
+        with contextlib.ExitStack() as stack:
+            journal = None
+            if args.journal:
+                journal = stack.enter_context(TicketJournal(args.journal))
+
+            if args.input == "-":
+                input_file = sys.stdin
+            else:
+                input_file = stack.enter_context(
+                    open(args.input, newline="", encoding="utf-8-sig")
+                )
+            if args.output == "-":
+                log = sys.stdout.buffer
+            else:
+                mode = "ab" if args.resume else "wb"
+                log = stack.enter_context(open(args.output, mode))
+            if partial_line:
+                log.write(b"\n")
+
+            client = ReportingClient(
+                portal_url=args.portal_url,
+                token=args.token,
+                transport=transport,
+                journal=journal,
+            )
+            param_sets = read_param_sets(input_file, _get_format(args))
+            counts = await _run_jobs(args, client, param_sets, log, succeeded)
+    finally:
+        if owns_transport:
+            await transport.close()
+
+    print(
+        f"{counts.succeeded} succeeded, {counts.failed} failed, "
+        f"{counts.skipped} skipped.",
+        file=sys.stderr,
+    )
+    return 1 if counts.failed else 0
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments of `vertigis-report`."""
+
+    parser = argparse.ArgumentParser(
+        prog="vertigis-report", description="Run VertiGIS Studio Reporting jobs."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    batch = subparsers.add_parser(
+        "batch",
+        help="Run a job for each record of a CSV or JSON Lines file.",
+        description="Run a job for each record of a CSV or JSON Lines file, writing "
+        "each job's outcome to a JSON Lines log as it finishes.",
+    )
+    batch.add_argument("item_id", help="The portal item ID of the report template.")
+    batch.add_argument(
+        "input", help="The CSV or JSON Lines file of parameters, or - for stdin."
+    )
+    batch.add_argument(
+        "--format",
+        choices=["csv", "jsonl"],
+        help="The input's format. Defaults to csv for .csv files, otherwise jsonl.",
+    )
+    batch.add_argument(
+        "-o", "--output", default="-", help="The result log. Defaults to stdout."
+    )
+    batch.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the jobs that succeeded in the result log and append to it.",
+    )
+    batch.add_argument(
+        "--journal", help="A ticket journal, so jobs in flight resume after a restart."
+    )
+    batch.add_argument(
+        "--concurrency", type=int, default=4, help="Jobs in flight at once."
+    )
+    batch.add_argument(
+        "--polling", action="store_true", help="Poll for results instead of WebSockets."
+    )
+    batch.add_argument(
+        "--download-dir", help="Download each artifact to this directory."
+    )
+    batch.add_argument(
+        "--param",
+        type=_parse_param,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="A parameter passed to every job. Can be repeated.",
+    )
+    batch.add_argument("--culture", default="")
+    batch.add_argument("--dpi", type=int, default=0)
+    batch.add_argument("--portal-url", default="https://www.arcgis.com")
+    batch.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_VARIABLE, ""),
+        help=f"The portal access token. Defaults to ${TOKEN_VARIABLE}.",
+    )
+    batch.add_argument("--transport", choices=sorted(TRANSPORTS), default="requests")
+
+    args = parser.parse_args(argv)
+    if args.resume and args.output == "-":
+        batch.error("--resume requires an --output file.")
+    if args.concurrency < 1:
+        batch.error("--concurrency must be at least 1.")
+    return args
+
+
+def main(argv=None) -> int:
+    """The entry point of the `vertigis-report` command."""
+
+    args = parse_args(argv)
+    try:
+        return asyncio.get_event_loop().run_until_complete(run_batch(args))
+    except (OSError, ValueError) as error:
+        print(f"vertigis-report: error: {error}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import asyncio
+
+# Put on the results queue by a worker when it runs out of items.
+_WORKER_DONE = object()
+
+
+async def map_unordered(func, items, max_concurrency: int):
+    """Awaits `func(item)` for each item, yielding the results as they complete.
+
+    At most `max_concurrency` calls are in flight at once. `items` is consumed lazily,
+    so it can be a generator. Outstanding calls are cancelled if the caller stops
+    iterating early.
+    """
+
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    items = iter(items)
+    results = asyncio.Queue()
+
+    async def worker():
+        try:
+            # Workers share the one iterator, so each item is processed once.
+            for item in items:
+                results.put_nowait(await func(item))
+        finally:
+            results.put_nowait(_WORKER_DONE)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_concurrency)]
+    try:
+        running = len(workers)
+        while running:
+            result = await results.get()
+            if result is _WORKER_DONE:
+                running -= 1
+            else:
+                yield result
+
+        # Surface errors raised while iterating `items`, or by `func`.
+        for finished_worker in workers:
+            finished_worker.result()
+    finally:
+        for unfinished_worker in workers:
+            unfinished_worker.cancel()
@@ -0,0 +1,449 @@
+import asyncio
+import mimetypes
+import os
+import tempfile
+from urllib.parse import parse_qs, urlsplit
+
+from .concurrency import map_unordered
+from .instrumentation import Instrumentation, track_stage
+from .job_status import JobResult, parse_job_result
+from .transport import (
+    HTTPStatusError,
+    Transport,
+    get_default_transport,
+    is_transient_error,
+)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class IncompleteDownloadError(Exception):
+    """Raised when a downloaded artifact isn't the expected length."""
+
+
+class JobNotFinishedError(Exception):
+    """Raised when downloading the artifact of a job that hasn't finished yet."""
+
+
+def _get_headers(token: str, offset: int, validator="") -> dict:
+    headers = {}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if validator:
+            headers["If-Range"] = validator
+    return headers
+
+
+def _get_validator(headers) -> str:
+    """Returns the header that identifies the version of an artifact, for `If-Range`."""
+
+    etag = headers.get("ETag", "")
+    # Weak ETags can't be used in If-Range.
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified", "")
+
+
+def _get_validator_path(dest) -> str:
+    return os.fspath(dest) + ".validator"
+
+
+def _read_validator(path: str) -> str:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def _write_validator(path: str, validator: str):
+    if validator:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(validator)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+async def stream_result(
+    result_url,
+    *,
+    offset=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    token="",
+    transport: Transport = None,
+):
+    """Streams a report artifact, yielding its content in chunks of bytes.
+
+    Only one chunk is held in memory at a time, so this is suitable for large artifacts.
+
+    Args:
+        result_url (str or JobResult): The URL to the report artifact, or the
+            `JobResult` of its job, as returned by `run`.
+        offset (int, optional): The number of bytes at the start of the artifact to skip.
+            Defaults to `0`.
+        chunk_size (int, optional): The maximum size of each chunk, in bytes.
+            Defaults to 64 KiB.
+        token (str, optional): A reporting token to send with the request, if needed.
+        transport (Transport, optional): The transport used to make the request.
+            Defaults to a `RequestsTransport` shared by all calls.
+
+    Yields:
+        The artifact's content, in chunks of bytes.
+    """
+
+    transport = transport or get_default_transport()
+    headers = _get_headers(token, offset)
+    if isinstance(result_url, JobResult):
+        result_url = result_url.url
+
+    async with await transport.stream(result_url, headers=headers) as response:
+        skip = 0
+        if offset and response.status != 206:
+            # The server ignored the range, so skip the bytes ourselves.
+            skip = offset
+
+        async for chunk in response.iter_chunks(chunk_size):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            yield chunk
+
+
+async def download(  # pylint: disable=too-many-locals
+    result_url,
+    dest: str,
+    *,
+    expected_length: int = None,
+    resume=False,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    token="",
+    transport: Transport = None,
+    progress=None,
+) -> int:
+    """Downloads a report artifact to a file, streaming it in chunks.
+
+    While the download is in progress, the artifact's `ETag` or `Last-Modified`
+    header is kept in a `.validator` file next to `dest`, so an interrupted download
+    can be resumed. The file is removed once the download is complete.
+
+    Args:
+        result_url (str or JobResult): The URL to the report artifact, or the
+            `JobResult` of its job, as returned by `run`.
+        dest (str or os.PathLike): The path of the file to write the artifact to.
+        expected_length (int, optional): The size of the artifact in bytes, if known.
+            The download is checked against it. Defaults to the length on
+            `result_url` if it's a `JobResult`.
+        resume (bool, optional): When `True` and `dest` holds an interrupted download,
+            only the rest of the artifact is requested and appended to it. The request
+            carries the artifact's validator in an `If-Range` header, so the whole
+            artifact is downloaded again if it has changed. A file that can't be
+            checked this way is overwritten. When `False`, an existing file is
+            always overwritten. Defaults to `False`.
+        chunk_size (int, optional): The maximum number of bytes held in memory at once.
+            Defaults to 64 KiB.
+        token (str, optional): A reporting token to send with the request, if needed.
+        transport (Transport, optional): The transport used to make the request.
+            Defaults to a `RequestsTransport` shared by all calls.
+        progress (callable, optional): Called after each chunk is written with the
+            number of bytes in the file so far and `expected_length`.
+
+    Returns:
+        The size of the downloaded file in bytes.
+    """
+
+    transport = transport or get_default_transport()
+    if isinstance(result_url, JobResult):
+        if expected_length is None:
+            expected_length = result_url.length
+        result_url = result_url.url
+
+    validator_path = _get_validator_path(dest)
+    validator = _read_validator(validator_path) if resume else ""
+    offset = os.path.getsize(dest) if validator and os.path.exists(dest) else 0
+    if expected_length is not None and offset > expected_length:
+        # The file can't be the start of this artifact.
+        offset = 0
+
+    try:
+        response = await transport.stream(
+            result_url, headers=_get_headers(token, offset, validator)
+        )
+    except HTTPStatusError as error:
+        if not offset or error.status != 416:
+            raise
+        if offset == expected_length:
+            # The artifact hasn't changed and the file already holds all of it.
+            os.remove(validator_path)
+            return offset
+
+        # The file can't be checked, so start again from the beginning.
+        offset = 0
+        response = await transport.stream(result_url, headers=_get_headers(token, 0))
+
+    async with response:
+        if offset and response.status != 206:
+            # The artifact has changed, or the server doesn't support ranges.
+            offset = 0
+        if not offset:
+            _write_validator(validator_path, _get_validator(response.headers))
+
+        with open(dest, "ab" if offset else "wb") as file:
+            async for chunk in response.iter_chunks(chunk_size):
+                file.write(chunk)
+                if progress:
+                    progress(file.tell(), expected_length)
+            length = file.tell()
+
+    if expected_length is not None and length != expected_length:
+        raise IncompleteDownloadError(
+            f"Downloaded {length} bytes from {result_url} but expected {expected_length}."
+        )
+
+    if os.path.exists(validator_path):
+        os.remove(validator_path)
+    return length
+
+
+def _import_pypdf():
+    # pypdf is slow to import, so is only imported when PDFs are merged.
+    try:
+        import pypdf  # pylint: disable=import-outside-toplevel
+    except ImportError as error:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "download_merged requires the 'pypdf' package to be installed."
+        ) from error
+    return pypdf
+
+
+def _merge_pdfs(paths: list, dest: str) -> int:
+    writer = _import_pypdf().PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(dest, "wb") as file:
+        writer.write(file)
+    return len(writer.pages)
+
+
+async def download_merged(
+    results,
+    dest: str,
+    *,
+    max_concurrency=4,
+    token="",
+    transport: Transport = None,
+) -> int:
+    """Downloads the PDF artifacts of several jobs and merges them into one file.
+
+    Requires the `pdf` extra: `pip install geocortex-reporting-client[pdf]`.
+
+    Args:
+        results (list): The result URLs or `JobResult` objects of the jobs, in the
+            order their pages should appear, as returned by `run_chunked`.
+        dest (str or os.PathLike): The path of the merged PDF.
+        max_concurrency (int, optional): The maximum number of downloads in flight.
+            Defaults to `4`.
+        token (str, optional): A reporting token to send with each request, if needed.
+        transport (Transport, optional): The transport used to make requests.
+            Defaults to a `RequestsTransport` shared by all calls.
+
+    Returns:
+        The number of pages in the merged PDF.
+    """
+
+    # Fail before downloading anything if the PDFs can't be merged.
+    _import_pypdf()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = [
+            os.path.join(temp_dir, f"{index}.pdf") for index in range(len(results))
+        ]
+
+        async def download_part(part: tuple):
+            result, path = part
+            await download(result, path, token=token, transport=transport)
+
+        parts = map_unordered(download_part, zip(results, paths), max_concurrency)
+        async for _ in parts:
+            pass
+
+        # Merging is CPU bound, so is kept off the event loop.
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, _merge_pdfs, paths, dest)
+
+
+class DownloadResult:  # pylint: disable=too-few-public-methods
+    """The outcome of one download made by `download_many`.
+
+    Attributes:
+        url (str): The URL the artifact was downloaded from, or `""` if it couldn't
+            be determined from a ticket.
+        path (str): The path of the downloaded file.
+        length (int): The size of the downloaded file in bytes.
+        error (Exception): The error that stopped the download, or `None` if it succeeded.
+    """
+
+    __slots__ = ("url", "path", "length", "error")
+
+    def __init__(self, url: str, path: str, length=0, error=None):
+        self.url = url
+        self.path = path
+        self.length = length
+        self.error = error
+
+    def __repr__(self):
+        outcome = f"error={self.error!r}" if self.error else f"length={self.length}"
+        return f"DownloadResult(path={self.path!r}, {outcome})"
+
+
+def _get_file_name(ticket: str, content_type: str) -> str:
+    extension = mimetypes.guess_extension(content_type or "") or ""
+    return f"{ticket}{extension}"
+
+
+def _parse_download_item(item, service_url: str) -> tuple:
+    """Returns the result URL, service URL and ticket of an item to download."""
+
+    if isinstance(item, JobResult):
+        return item.url, item.service_url, item.ticket
+
+    if not item.startswith(("http://", "https://")):
+        if not service_url:
+            raise ValueError(f"A service_url is required to download ticket {item}.")
+        return "", service_url, item
+
+    ticket = parse_qs(urlsplit(item).query).get("ticket", [""])[0]
+    if not ticket:
+        raise ValueError(f"{item} is not a report result URL.")
+    return item, item.split("/job/result", 1)[0], ticket
+
+
+async def _resolve_ticket(
+    transport: Transport, service_url: str, ticket: str
+) -> JobResult:
+    job_status = await transport.get_json(
+        f"{service_url}/job/artifacts?ticket={ticket}"
+    )
+    job_result = parse_job_result(service_url, ticket, job_status)
+    if not job_result:
+        raise JobNotFinishedError(f"Report job hasn't finished yet. Ticket: {ticket}")
+
+    return job_result
+
+
+def download_many(  # pylint: disable=too-many-locals
+    items,
+    dest_dir: str,
+    *,
+    service_url="",
+    max_concurrency=8,
+    max_per_host=4,
+    retries=3,
+    retry_delay=0.5,
+    verify_length=True,
+    progress=None,
+    token="",
+    transport: Transport = None,
+    instrumentation: Instrumentation = None,
+):
+    """Downloads many report artifacts concurrently, yielding results as they complete.
+
+    Each artifact is saved in `dest_dir`, named after its job's ticket. Downloads that
+    fail with a transient error are retried, resuming from where they stopped.
+
+    Args:
+        items (Iterable[str or JobResult]): The result URLs or `JobResult` objects
+            returned by `run`, or the tickets of finished jobs on `service_url`.
+            Consumed lazily, so it can be a generator.
+        dest_dir (str): The directory to save the artifacts in.
+        service_url (str, optional): The URL of the reporting service, ending in
+            `/service`. Required when `items` contains tickets.
+        max_concurrency (int, optional): The maximum number of downloads in flight.
+            Defaults to `8`.
+        max_per_host (int, optional): The maximum number of downloads in flight to any
+            one host. Defaults to `4`.
+        retries (int, optional): The number of times a download that fails with a
+            transient error is retried. Defaults to `3`.
+        retry_delay (float, optional): The seconds to wait before the first retry,
+            doubling with each retry after that. Defaults to `0.5`.
+        verify_length (bool, optional): When `True`, the job's result record is
+            fetched for each URL so the length of its download can be checked. Tickets
+            are always resolved this way, and `JobResult` items already carry their
+            length. Defaults to `True`.
+        progress (callable, optional): Called after each chunk is written with the
+            result URL, the bytes downloaded so far and the expected length, if known.
+        token (str, optional): A reporting token to send with each request, if needed.
+        transport (Transport, optional): The transport used to make requests.
+            Defaults to a `RequestsTransport` shared by all calls.
+        instrumentation (Instrumentation, optional): Receives the timing of each
+            download as a `download` stage, and each retry.
+
+    Returns:
+        An async iterator of a `DownloadResult` for each item, in the order the downloads
+        complete. A failing download doesn't stop the others; its error is captured on
+        the result instead.
+    """
+
+    transport = transport or get_default_transport()
+    hosts = {}
+
+    def get_host_slots(url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in hosts:
+            hosts[host] = asyncio.Semaphore(max_per_host)
+        return hosts[host]
+
+    async def download_item(item) -> DownloadResult:
+        try:
+            url, item_service_url, ticket = _parse_download_item(item, service_url)
+        except ValueError as error:
+            return DownloadResult(item, "", error=error)
+
+        job_result = item if isinstance(item, JobResult) else None
+        path = os.path.join(dest_dir, ticket)
+
+        def report_progress(downloaded: int, total: int):
+            progress(url, downloaded, total)
+
+        for attempt in range(retries + 1):
+            try:
+                if job_result is None and (verify_length or not url):
+                    job_result = await _resolve_ticket(
+                        transport, item_service_url, ticket
+                    )
+                if job_result is not None:
+                    url = job_result.url
+                    path = os.path.join(
+                        dest_dir, _get_file_name(ticket, job_result.content_type)
+                    )
+
+                async with get_host_slots(url):
+                    with track_stage(instrumentation, "download", url=url):
+                        length = await download(
+                            job_result or url,
+                            path,
+                            # Retries carry on from where the last attempt stopped.
+                            resume=attempt > 0,
+                            token=token,
+                            transport=transport,
+                            progress=report_progress if progress else None,
+                        )
+                return DownloadResult(url, path, length)
+            except Exception as error:  # pylint: disable=broad-except
+                retryable = is_transient_error(error) or isinstance(
+                    error, IncompleteDownloadError
+                )
+                if attempt == retries or not retryable:
+                    return DownloadResult(url, path, error=error)
+                if instrumentation is not None:
+                    instrumentation.retried("download", attempt + 1, error)
+
+            await asyncio.sleep(retry_delay * 2**attempt)
+
+        return None
+
+    return map_unordered(download_item, items, max_concurrency)
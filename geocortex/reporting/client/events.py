@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from .job_status import JobResult
+
+
+class JobEvent:  # pylint: disable=too-few-public-methods
+    """A status record reported by the reporting service while a job runs.
+
+    Attributes:
+        ticket (str): The job's ticket.
+        type (str): The record's `$type`, e.g. `"JobResult"` or `"JobQuit"`.
+        data (dict): The record as it was sent by the service.
+        received (float): When the record was received, as a Unix timestamp.
+    """
+
+    __slots__ = ("ticket", "type", "data", "received")
+
+    def __init__(self, ticket: str, event_type: str, data: dict, received: float):
+        self.ticket = ticket
+        self.type = event_type
+        self.data = data
+        self.received = received
+
+    def __repr__(self):
+        return f"JobEvent(ticket={self.ticket!r}, type={self.type!r})"
+
+
+class EventDispatcher:  # pylint: disable=too-few-public-methods
+    """Passes the records of a job's status that haven't been seen yet to callbacks.
+
+    Each status lists every record of the job so far, so only the records after the
+    last status seen are new. Events are only created when there are callbacks.
+
+    Args:
+        ticket (str): The job's ticket.
+    """
+
+    __slots__ = ("ticket", "callbacks", "_seen")
+
+    def __init__(self, ticket: str):
+        self.ticket = ticket
+        self.callbacks = []
+        self._seen = 0
+
+    def dispatch(self, job_status: dict):
+        """Call the callbacks with an event for each new record in `job_status`."""
+
+        records = job_status.get("results", None) or []
+        if len(records) < self._seen:
+            # The status started over, e.g. on a new connection.
+            self._seen = 0
+
+        new_records = records[self._seen :]
+        self._seen = len(records)
+        if not new_records or not self.callbacks:
+            return
+
+        received = time.time()
+        for record in new_records:
+            event = JobEvent(self.ticket, record.get("$type", ""), record, received)
+            for callback in list(self.callbacks):
+                callback(event)
+
+
+class JobEventStream:
+    """An async iterator of the events of one job, started on first iteration.
+
+    Iteration ends once the job finishes, after which its `JobResult` is available
+    as `result`. If the job fails its error is raised by the iteration. Call `aclose`
+    to cancel the job if the stream isn't iterated to the end.
+
+    Attributes:
+        result (JobResult): The result of the job, or `None` until it has finished.
+    """
+
+    def __init__(self, run_job):
+        self._run_job = run_job
+        self._queue = asyncio.Queue()
+        self._task = None
+        self.result: JobResult = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> JobEvent:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run_job(self._queue.put_nowait))
+
+        if self._queue.empty() and not self._task.done():
+            get = asyncio.ensure_future(self._queue.get())
+            try:
+                await asyncio.wait(
+                    [get, self._task], return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                if not get.done():
+                    get.cancel()
+            if get.done():
+                return get.result()
+
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+
+        self.result = self._task.result()
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        """Cancel the job if it's still running."""
+
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
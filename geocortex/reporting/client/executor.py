@@ -0,0 +1,208 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from .reporting_service import ReportingClient, run
+
+
+class _BackgroundLoop:
+    """An event loop running in a daemon thread, started on first use."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop from any thread."""
+
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._run_loop, args=(self._loop,), name=self._name
+                )
+                self._thread.daemon = True
+                self._thread.start()
+
+            return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        """Run a coroutine on the loop, blocking until it completes."""
+
+        if threading.current_thread() is self._thread:
+            coro.close()
+            # Blocking here would stop the loop from ever running the coroutine.
+            raise RuntimeError(
+                "Can't wait for a report from the event loop that's running it."
+            )
+
+        return self.submit(coro).result()
+
+    def stop(self):
+        """Stop the loop and wait for its thread to exit."""
+
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+
+
+# Shared by every call to `run_sync`.
+_default_loop = _BackgroundLoop("geocortex-reporting-loop")
+
+
+def run_sync(item_id: str, **kwargs):
+    """Runs a report job from synchronous code and returns a URL to the report artifact.
+
+    The job runs on an event loop in a background thread that is shared by every call,
+    so callers don't need to create or manage a loop of their own. It's safe to call
+    from many threads at once, and their jobs will run concurrently.
+
+    Args:
+        item_id (str): The portal item ID of the Reporting or Printing item.
+        **kwargs: The other arguments accepted by `run`.
+
+    Returns:
+        A string of the URL to the report artifact, or a `JobResult` if
+        `return_job_result` is `True`.
+    """
+
+    return _default_loop.run(run(item_id, **kwargs))
+
+
+class ReportExecutor:
+    """Runs report jobs on a background event loop and returns futures for them.
+
+    This gives synchronous code concurrent jobs without managing an event loop.
+    Every job shares a `ReportingClient`, and with it its connections and caches.
+    Shut the executor down when done with it, or use it as a context manager.
+
+    Args:
+        **options: The arguments accepted by `ReportingClient`, such as `token`,
+            `pool_size`, `retry_policy` or `journal`. A transport that is passed in
+            isn't closed by the executor.
+    """
+
+    def __init__(self, **options):
+        self.client = ReportingClient(**options)
+        self._loop = _BackgroundLoop("geocortex-report-executor")
+        self._futures = set()
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _submit(self, coro) -> concurrent.futures.Future:
+        with self._lock:
+            if self._shutdown:
+                coro.close()
+                raise RuntimeError(
+                    "Can't submit reports after the executor is shut down."
+                )
+
+            future = self._loop.submit(coro)
+            self._futures.add(future)
+
+        future.add_done_callback(self._futures.discard)
+        return future
+
+    def submit(self, item_id: str, **kwargs) -> concurrent.futures.Future:
+        """Starts a report job and returns a future for its result.
+
+        Args:
+            item_id (str): The portal item ID of the Reporting or Printing item.
+            **kwargs: The other arguments accepted by `ReportingClient.run`.
+
+        Returns:
+            A `concurrent.futures.Future` resolving to the URL to the report artifact,
+            or a `JobResult` if `return_job_result` is `True`.
+        """
+
+        return self._submit(self.client.run(item_id, **kwargs))
+
+    def map(self, item_id: str, param_sets, *, timeout=None, **kwargs):
+        """Runs a report job for each set of parameters, returning results in order.
+
+        Every job is submitted before this returns, so they run concurrently.
+
+        Args:
+            item_id (str): The portal item ID of the Reporting or Printing item.
+            param_sets (Iterable[dict]): The parameters to pass to each job.
+            timeout (float, optional): The number of seconds to wait for each result.
+                Defaults to `None`, which waits indefinitely.
+            **kwargs: The other arguments accepted by `ReportingClient.run`.
+
+        Returns:
+            An iterator of the results, in the order of `param_sets`. Iterating raises
+            the error of the first failed job reached.
+        """
+
+        futures = [self.submit(item_id, **kwargs, **x) for x in param_sets]
+
+        def results():
+            try:
+                for future in futures:
+                    yield future.result(timeout)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return results()
+
+    def prewarm(self, *item_ids: str) -> concurrent.futures.Future:
+        """Looks up the portal items of reports ahead of their first job.
+
+        See `ReportingClient.prewarm`. Wait on the returned future to block until
+        it's done.
+        """
+
+        return self._submit(self.client.prewarm(*item_ids))
+
+    def download(self, result_url, dest: str, **kwargs) -> concurrent.futures.Future:
+        """Downloads a report artifact to a file and returns a future for its size.
+
+        See `download` for a description of the arguments.
+        """
+
+        return self._submit(self.client.download(result_url, dest, **kwargs))
+
+    def shutdown(self, wait=True):
+        """Stops the executor, closing its connections and background thread.
+
+        Args:
+            wait (bool, optional): When `True`, blocks until the submitted jobs finish.
+                When `False`, outstanding jobs are cancelled. Defaults to `True`.
+        """
+
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            futures = list(self._futures)
+
+        if wait:
+            concurrent.futures.wait(futures)
+        else:
+            for future in futures:
+                future.cancel()
+
+        self._loop.run(self.client.close())
+        self._loop.stop()
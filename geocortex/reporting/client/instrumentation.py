@@ -0,0 +1,289 @@
+import threading
+import time
+import weakref
+
+from .transport import StreamedResponse, Transport
+
+# Instrumented transports, keyed on the ids of the transport and instrumentation they
+# wrap. An entry only lives as long as its wrapper, which keeps both ids in use.
+_instrumented_transports = weakref.WeakValueDictionary()
+
+
+class Instrumentation:
+    """Receives timings and counts from the stages of report jobs.
+
+    Subclass it and override the methods of interest, then pass an instance to
+    `ReportingClient` or `run`. The stages are:
+
+    - `run`: the whole of `run`, from looking up the portal item to the job finishing.
+    - `portal_item`: looking up the portal item and the reporting service URL.
+    - `token`: exchanging the portal token for a reporting token, if one is needed.
+    - `queue`: waiting in a `SubmissionQueue` for the job's turn to be submitted.
+    - `start_job`: submitting the job to the reporting service.
+    - `wait`: waiting for the job to finish, including any time spent queued on the
+      service.
+    - `download`: downloading a report artifact.
+
+    Methods are called on the event loop, so they shouldn't block. When no
+    instrumentation is given none of these calls are made.
+    """
+
+    def stage_started(self, stage: str, attributes: dict):
+        """Called when a stage starts.
+
+        Args:
+            stage (str): The name of the stage.
+            attributes (dict): Details of the stage, such as the item ID or ticket.
+
+        Returns:
+            Any value, which is passed to `stage_finished` for the same stage.
+        """
+
+    def stage_finished(self, stage: str, duration: float, error: Exception, context):
+        """Called when a stage finishes.
+
+        Args:
+            stage (str): The name of the stage.
+            duration (float): The number of seconds the stage took.
+            error (Exception): The error that ended the stage, or `None` if it succeeded.
+            context: The value returned by `stage_started`.
+        """
+
+    def request_finished(self, method: str, url: str, duration: float, error):
+        """Called when an HTTP request made through the transport completes.
+
+        For streamed requests, `duration` is the time taken to receive the headers.
+        """
+
+    def bytes_received(self, url: str, count: int):
+        """Called with the number of bytes of each chunk of a streamed response."""
+
+    def retried(self, stage: str, attempt: int, error: Exception):
+        """Called before `stage` is retried after failing with `error`."""
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("_instrumentation", "_name", "_attributes", "_context", "_start")
+
+    def __init__(self, instrumentation: Instrumentation, name: str, attributes: dict):
+        self._instrumentation = instrumentation
+        self._name = name
+        self._attributes = attributes
+        self._context = None
+        self._start = 0
+
+    def __enter__(self):
+        self._context = self._instrumentation.stage_started(
+            self._name, self._attributes
+        )
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, error, traceback):
+        duration = time.perf_counter() - self._start
+        self._instrumentation.stage_finished(self._name, duration, error, self._context)
+        return False
+
+
+def track_stage(instrumentation: Instrumentation, name: str, **attributes):
+    """Return a context manager that reports a stage to `instrumentation`, if given."""
+
+    if instrumentation is None:
+        return _NULL_STAGE
+    return _Stage(instrumentation, name, attributes)
+
+
+class _InstrumentedStreamedResponse(StreamedResponse):
+    def __init__(self, response: StreamedResponse, url: str, instrumentation):
+        super().__init__(response.status, response.headers)
+        self._response = response
+        self._url = url
+        self._instrumentation = instrumentation
+
+    async def iter_chunks(self, chunk_size: int):
+        async for chunk in self._response.iter_chunks(chunk_size):
+            self._instrumentation.bytes_received(self._url, len(chunk))
+            yield chunk
+
+    async def close(self):
+        await self._response.close()
+
+
+class InstrumentedTransport(Transport):
+    """Wraps a transport to report each request to an `Instrumentation`.
+
+    Args:
+        transport (Transport): The transport that makes the requests.
+        instrumentation (Instrumentation): Receives the request timings and byte counts.
+    """
+
+    def __init__(self, transport: Transport, instrumentation: Instrumentation):
+        self.transport = transport
+        self.instrumentation = instrumentation
+
+    async def _request(self, method: str, url: str, request):
+        start = time.perf_counter()
+        error = None
+        try:
+            return await request
+        except Exception as request_error:
+            error = request_error
+            raise
+        finally:
+            self.instrumentation.request_finished(
+                method, url, time.perf_counter() - start, error
+            )
+
+    async def get_json(self, url: str, *, headers: dict = None) -> dict:
+        request = self.transport.get_json(url, headers=headers)
+        return await self._request("GET", url, request)
+
+    async def post_json(self, url: str, payload: dict, *, headers: dict = None) -> dict:
+        request = self.transport.post_json(url, payload, headers=headers)
+        return await self._request("POST", url, request)
+
+    async def stream(self, url: str, *, headers: dict = None) -> StreamedResponse:
+        request = self.transport.stream(url, headers=headers)
+        response = await self._request("GET", url, request)
+        return _InstrumentedStreamedResponse(response, url, self.instrumentation)
+
+    async def close(self):
+        await self.transport.close()
+
+
+def get_instrumented_transport(
+    transport: Transport, instrumentation: Instrumentation
+) -> InstrumentedTransport:
+    """Return the wrapper that reports `transport`'s requests to `instrumentation`.
+
+    Concurrent callers get the same wrapper, so they share the polling scheduler of
+    each reporting service rather than each starting a scheduler of their own.
+    """
+
+    key = (id(transport), id(instrumentation))
+    instrumented_transport = _instrumented_transports.get(key)
+    if instrumented_transport is None:
+        instrumented_transport = InstrumentedTransport(transport, instrumentation)
+        _instrumented_transports[key] = instrumented_transport
+    return instrumented_transport
+
+
+def _format_labels(labels: tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+class MetricsInstrumentation(Instrumentation):
+    """Counts stages, requests, bytes and retries, like Prometheus counters.
+
+    The counters are cumulative and thread-safe. `render` formats them in the
+    Prometheus text exposition format, ready to be served from a metrics endpoint.
+
+    Attributes:
+        counters (dict): The value of each counter, keyed on a tuple of the metric
+            name and a tuple of its `(label, value)` pairs.
+    """
+
+    def __init__(self, prefix="geocortex_reporting"):
+        self.prefix = prefix
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _increment(self, name: str, labels: tuple, amount=1):
+        key = (f"{self.prefix}_{name}", labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def get(self, name: str, **labels) -> float:
+        """Return the value of a counter, without the prefix, e.g. `get("retries_total")`."""
+
+        key = (f"{self.prefix}_{name}", tuple(sorted(labels.items())))
+        with self._lock:
+            return self.counters.get(key, 0)
+
+    def stage_finished(self, stage: str, duration: float, error: Exception, context):
+        labels = (("stage", stage),)
+        self._increment("stage_total", labels)
+        self._increment("stage_seconds_total", labels, duration)
+        if error is not None:
+            self._increment("stage_errors_total", labels)
+
+    def request_finished(self, method: str, url: str, duration: float, error):
+        labels = (("method", method),)
+        self._increment("requests_total", labels)
+        self._increment("request_seconds_total", labels, duration)
+        if error is not None:
+            self._increment("request_errors_total", labels)
+
+    def bytes_received(self, url: str, count: int):
+        self._increment("received_bytes_total", (), count)
+
+    def retried(self, stage: str, attempt: int, error: Exception):
+        self._increment("retries_total", (("stage", stage),))
+
+    def render(self) -> str:
+        """Return the counters in the Prometheus text exposition format."""
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+
+        lines = []
+        previous_name = None
+        for (name, labels), value in counters:
+            if name != previous_name:
+                lines.append(f"# TYPE {name} counter")
+                previous_name = name
+            labels = f"{{{_format_labels(labels)}}}" if labels else ""
+            lines.append(f"{name}{labels} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """Records each stage as an OpenTelemetry span.
+
+    Stages are nested under the span that is current when the job is run, and under
+    each other: the `wait` span is a child of the `run` span, for example.
+    Requires the `opentelemetry` extra: `pip install geocortex-reporting-client[opentelemetry]`.
+
+    Args:
+        tracer (opentelemetry.trace.Tracer, optional): The tracer to create spans with.
+            Defaults to the tracer for this package from the global tracer provider.
+    """
+
+    def __init__(self, tracer=None):
+        # Imported here rather than with the module, as it's slow to import.
+        try:
+            from opentelemetry import (  # pylint: disable=import-outside-toplevel
+                trace as otel_trace,
+            )
+        except ImportError as error:  # pragma: no cover - optional dependency
+            raise ImportError(
+                "OpenTelemetryInstrumentation requires the 'opentelemetry-api' package to be installed."  # pylint: disable=line-too-long
+            ) from error
+
+        self.tracer = tracer or otel_trace.get_tracer("geocortex.reporting.client")
+
+    def stage_started(self, stage: str, attributes: dict):
+        span = self.tracer.start_as_current_span(
+            f"reporting.{stage}",
+            attributes={k: v for k, v in attributes.items() if v is not None},
+        )
+        span.__enter__()  # pylint: disable=unnecessary-dunder-call
+        return span
+
+    def stage_finished(self, stage: str, duration: float, error: Exception, context):
+        if error is None:
+            context.__exit__(None, None, None)
+        else:
+            context.__exit__(type(error), error, error.__traceback__)
@@ -0,0 +1,89 @@
+from .json_codec import EncodedDict, dumps
+
+
+def _build_param(name: str, value) -> dict:
+    if type(value) in [list, tuple]:
+        return {"name": name, "containsMultipleValues": True, "values": value}
+    return {"name": name, "containsMultipleValues": False, "value": value}
+
+
+def _build_template_arg(item_id: str, portal_url: str, result_file_name: str) -> dict:
+    template = {"itemId": item_id, "portalUrl": portal_url}
+
+    if result_file_name:
+        template["title"] = result_file_name
+    return template
+
+
+class PreparedTemplate:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """A report template with the arguments its jobs share encoded ahead of time.
+
+    The template, culture, DPI and fixed parameters are encoded as JSON once, so
+    each job only encodes the parameters that vary. Pass it to `run`, `run_many` or
+    `run_chunked` in place of an item ID when running many jobs from one template.
+
+    ```py
+    template = PreparedTemplate("itemid", culture="en-US", Region="North")
+    async for result in run_many(template, ({"FeatureIds": [x]} for x in ids)):
+        ...
+    ```
+
+    A job's parameters replace any fixed parameters with the same name.
+
+    Args:
+        item_id (str): The portal item ID of the Reporting or Printing item.
+        portal_url (str, optional): The URL of the ArcGIS Portal instance the item is
+            in. Defaults to `https://www.arcgis.com`.
+        culture, dpi, result_file_name: See `run`.
+        **parameters: Parameters to pass to every job.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        item_id: str,
+        *,
+        portal_url="https://www.arcgis.com",
+        culture="",
+        dpi=0,
+        result_file_name="",
+        **parameters,
+    ):
+        self.item_id = item_id
+        self.portal_url = portal_url.strip("/")
+        self._template = _build_template_arg(item_id, self.portal_url, result_file_name)
+        self._parameters = [_build_param(k, v) for k, v in parameters.items()]
+        self._names = frozenset(parameters)
+        self._options = {}
+        if culture:
+            self._options["culture"] = culture
+        if dpi:
+            self._options["dpi"] = dpi
+
+        # A job's JSON is the prefix, its own parameters, then the suffix.
+        prefix = b'{"template":' + dumps(self._template) + b',"parameters":['
+        self._prefix = prefix + b",".join(dumps(x) for x in self._parameters)
+        self._suffix = b"]" + b"".join(
+            b',"' + k.encode() + b'":' + dumps(v) for k, v in self._options.items()
+        )
+        self._suffix += b"}"
+
+    def job_args(self, parameters: dict) -> dict:
+        """Return the arguments of a job with `parameters`, as sent to the service."""
+
+        varying = [_build_param(k, v) for k, v in parameters.items()]
+        if self._names.intersection(parameters):
+            # Only the fixed parameters that aren't replaced are kept.
+            fixed = [x for x in self._parameters if x["name"] not in parameters]
+            return dict(
+                {"template": self._template, "parameters": fixed + varying},
+                **self._options,
+            )
+
+        encoded = self._prefix
+        if varying:
+            separator = b"," if self._parameters else b""
+            encoded += separator + b",".join(dumps(x) for x in varying)
+
+        value = {"template": self._template, "parameters": self._parameters + varying}
+        value.update(self._options)
+        return EncodedDict(value, encoded + self._suffix)
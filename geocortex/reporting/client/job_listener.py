@@ -0,0 +1,222 @@
+import asyncio
+import ssl
+import weakref
+
+from websockets.exceptions import WebSocketException
+
+from .events import EventDispatcher
+from .job_status import JobResult, parse_job_result
+from .json_codec import loads
+from .transport import is_transient_error
+
+DEFAULT_MAX_CONNECTIONS = 32
+
+# The seconds to wait for a socket to open. Once open, the websockets keepalive ping
+# detects sockets that have stalled, however long a job goes without a message.
+DEFAULT_OPEN_TIMEOUT = 10.0
+
+# Listeners are bound to the event loop they were created in.
+_listeners = weakref.WeakKeyDictionary()
+
+
+def _websocket_connect(url: str, **kwargs):
+    # websockets.client is slow to import, so is only imported once a job is listened for.
+    from websockets.client import connect  # pylint: disable=import-outside-toplevel
+
+    return connect(url, **kwargs)
+
+
+class WebSocketUnavailableError(Exception):
+    """Raised when a job can't be listened for over a WebSocket, so it should be polled.
+
+    This happens when the socket can't be opened within the listener's `open_timeout`,
+    or keeps dropping. The underlying error is the cause.
+    """
+
+
+class _ListenedTicket:  # pylint: disable=too-few-public-methods
+    __slots__ = ("ticket", "task", "waiters", "events")
+
+    def __init__(self, ticket: str):
+        self.ticket = ticket
+        self.task = None
+        self.waiters = 0
+        self.events = EventDispatcher(ticket)
+
+
+class JobListener:  # pylint: disable=too-many-instance-attributes
+    """Listens for the results of many concurrent jobs on one reporting service.
+
+    The artifacts endpoint identifies the job by the ticket in its URL, so each ticket
+    needs a socket of its own. The listener bounds how many of those sockets are open
+    at once, shares one SSL context between them, and shares a single socket between
+    all callers waiting on the same ticket.
+
+    Progress messages are read until the job finishes. A dropped socket is reopened up
+    to `max_reconnects` times. A socket that can't be opened or keeps dropping raises
+    `WebSocketUnavailableError`, so its connection is freed for other tickets and the
+    caller can poll instead. An open socket is waited on for as long as the job runs,
+    since the service may send nothing until the job finishes. Sockets that stop
+    answering the keepalive ping are treated as dropped.
+
+    Args:
+        service_url (str): The URL of the reporting service.
+        max_connections (int, optional): The maximum number of WebSockets open at once.
+            Tickets beyond this limit wait for a connection to free up.
+        connect (callable, optional): The function used to open a WebSocket.
+            Defaults to `websockets.client.connect`.
+        open_timeout (float, optional): The seconds to wait for a socket to open
+            before giving up on it. Defaults to `10`.
+        max_reconnects (int, optional): The number of times a dropped socket is
+            reopened for a ticket. Defaults to `2`.
+        reconnect_delay (float, optional): The seconds to wait before reopening a
+            socket, doubled after each attempt. Defaults to `0.5`.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        service_url: str,
+        *,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        connect=None,
+        open_timeout=DEFAULT_OPEN_TIMEOUT,
+        max_reconnects=2,
+        reconnect_delay=0.5,
+    ):
+        # Note that a 'https' url will result in 'wss' after the string replace
+        # which is what we want.
+        self.service_url = service_url
+        self._ws_service_url = service_url.replace("http", "ws")
+        self._connect = connect or _websocket_connect
+        self._connections = asyncio.Semaphore(max_connections)
+        self.open_timeout = open_timeout
+        self.max_reconnects = max_reconnects
+        self.reconnect_delay = reconnect_delay
+        self._pending = {}
+        self._ssl_context = None
+
+    @property
+    def pending_tickets(self) -> int:
+        """The number of tickets currently being listened for."""
+        return len(self._pending)
+
+    def _get_ssl_context(self, url: str):
+        if not url.startswith("wss"):
+            return None
+
+        # Creating a context loads the CA certificates, so do it once per listener.
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    async def wait(self, ticket: str, progress=None) -> JobResult:
+        """Wait for a job to finish and return its `JobResult`.
+
+        Args:
+            ticket (str): The job's ticket.
+            progress (callable, optional): Called with a `JobEvent` for each new
+                record of the job's status.
+
+        Raises:
+            WebSocketUnavailableError: If the job's result couldn't be received over a
+                WebSocket.
+        """
+
+        listened_ticket = self._pending.get(ticket)
+        if listened_ticket is None:
+            listened_ticket = _ListenedTicket(ticket)
+            listened_ticket.task = asyncio.ensure_future(self._listen(listened_ticket))
+            self._pending[ticket] = listened_ticket
+            listened_ticket.task.add_done_callback(
+                lambda _: self._pending.pop(ticket, None)
+            )
+
+        listened_ticket.waiters += 1
+        if progress is not None:
+            listened_ticket.events.callbacks.append(progress)
+        try:
+            # Shield the shared task so one cancelled caller doesn't cancel the others.
+            return await asyncio.shield(listened_ticket.task)
+        finally:
+            listened_ticket.waiters -= 1
+            if progress is not None:
+                listened_ticket.events.callbacks.remove(progress)
+            if not listened_ticket.waiters and not listened_ticket.task.done():
+                # Nobody is waiting on the ticket any more, so free its socket.
+                listened_ticket.task.cancel()
+                self._pending.pop(ticket, None)
+
+    async def _listen(self, listened_ticket: _ListenedTicket) -> JobResult:
+        ticket = listened_ticket.ticket
+        url = f"{self._ws_service_url}/job/artifacts?ticket={ticket}"
+
+        async with self._connections:
+            for attempt in range(self.max_reconnects + 1):
+                try:
+                    return await self._receive(url, listened_ticket)
+                except asyncio.TimeoutError as error:
+                    raise WebSocketUnavailableError(
+                        f"The WebSocket didn't open within {self.open_timeout} seconds. Ticket: {ticket}"  # pylint: disable=line-too-long
+                    ) from error
+                except (OSError, WebSocketException, ValueError) as error:
+                    if attempt == self.max_reconnects or not is_transient_error(error):
+                        raise WebSocketUnavailableError(
+                            f"The WebSocket for ticket {ticket} failed: {error!r}"
+                        ) from error
+
+                await asyncio.sleep(self.reconnect_delay * 2**attempt)
+
+        return None
+
+    async def _open(self, url: str):
+        opening = asyncio.ensure_future(
+            self._connect(url, ssl=self._get_ssl_context(url))
+        )
+        try:
+            # Not asyncio.wait_for, which can lose a cancellation that arrives just as
+            # the socket opens, leaving it open with nobody waiting on it.
+            await asyncio.wait([opening], timeout=self.open_timeout)
+        except asyncio.CancelledError:
+            opening.add_done_callback(_close_opened)
+            opening.cancel()
+            raise
+
+        if not opening.done():
+            opening.add_done_callback(_close_opened)
+            opening.cancel()
+            raise asyncio.TimeoutError()
+        return opening.result()
+
+    async def _receive(self, url: str, listened_ticket: _ListenedTicket) -> JobResult:
+        websocket = await self._open(url)
+        try:
+            while True:
+                message = await websocket.recv()
+                job_status = loads(message)
+                listened_ticket.events.dispatch(job_status)
+                job_result = parse_job_result(
+                    self.service_url, listened_ticket.ticket, job_status
+                )
+                if job_result:
+                    return job_result
+        finally:
+            await websocket.close()
+
+
+def _close_opened(opening: asyncio.Future):
+    if not opening.cancelled() and opening.exception() is None:
+        asyncio.ensure_future(opening.result().close())
+
+
+def get_job_listener(
+    service_url: str, *, max_connections=DEFAULT_MAX_CONNECTIONS
+) -> JobListener:
+    """Return the shared listener for a reporting service in the running event loop."""
+
+    loop_listeners = _listeners.setdefault(asyncio.get_event_loop(), {})
+    listener = loop_listeners.get(service_url)
+    if listener is None:
+        listener = JobListener(service_url, max_connections=max_connections)
+        loop_listeners[service_url] = listener
+
+    return listener
@@ -0,0 +1,150 @@
+import time
+
+
+class JobResult:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """The outcome of a finished report job.
+
+    Instances are slotted so that many of them can be kept in memory, e.g. for an
+    audit log of a large batch. The artifact and log URLs are built when they're read,
+    rather than stored with each result.
+
+    Attributes:
+        service_url (str): The URL of the reporting service that ran the job.
+        ticket (str): The job's ticket.
+        tag (str): The tag of the job's artifact.
+        url (str): The URL to the report artifact.
+        content_type (str): The MIME type of the artifact, or `""` if not reported.
+        length (int): The size of the artifact in bytes, or `None` if not reported.
+        submitted (float): When the job was submitted, as a Unix timestamp. `None` if
+            the job wasn't submitted by this client.
+        started (float): When the service accepted the job and returned its ticket, as
+            a Unix timestamp. `None` if the job wasn't submitted by this client.
+        finished (float): When the job was seen to have finished, as a Unix timestamp.
+        logs_url (str): The URL to the job's logs.
+    """
+
+    __slots__ = (
+        "service_url",
+        "ticket",
+        "tag",
+        "content_type",
+        "length",
+        "submitted",
+        "started",
+        "finished",
+    )
+
+    def __init__(
+        self,
+        service_url: str,
+        ticket: str,
+        tag: str,
+        *,
+        content_type="",
+        length=None,
+        submitted=None,
+        started=None,
+        finished=None,
+    ):
+        self.service_url = service_url
+        self.ticket = ticket
+        self.tag = tag
+        self.content_type = content_type
+        self.length = length
+        self.submitted = submitted
+        self.started = started
+        self.finished = finished
+
+    @property
+    def url(self) -> str:
+        """The URL to the report artifact."""
+        return f"{self.service_url}/job/result?ticket={self.ticket}&tag={self.tag}"
+
+    @property
+    def logs_url(self) -> str:
+        """The URL to the job's logs."""
+        return _get_logs_url(self.service_url, self.ticket)
+
+    @property
+    def duration(self) -> float:
+        """The seconds from submitting the job to seeing it finish, or `None` if unknown."""
+
+        if self.submitted is None or self.finished is None:
+            return None
+        return self.finished - self.submitted
+
+    def to_dict(self) -> dict:
+        """Return the result as a JSON serializable dictionary."""
+
+        return {
+            "service_url": self.service_url,
+            "ticket": self.ticket,
+            "tag": self.tag,
+            "content_type": self.content_type,
+            "length": self.length,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "JobResult":
+        """Create a result from a dictionary returned by `to_dict`."""
+
+        return cls(
+            data["service_url"],
+            data["ticket"],
+            data["tag"],
+            content_type=data.get("content_type", ""),
+            length=data.get("length"),
+            submitted=data.get("submitted"),
+            started=data.get("started"),
+            finished=data.get("finished"),
+        )
+
+    def __repr__(self):
+        return f"JobResult(ticket={self.ticket!r}, url={self.url!r})"
+
+    def __str__(self):
+        return self.url
+
+
+def _get_logs_url(service_url: str, ticket: str) -> str:
+    return f"{service_url}/job/logs?ticket={ticket}"
+
+
+def find_job_result(job_status: dict) -> dict:
+    """Returns the job's 'JobResult' record, or `None` if there isn't one."""
+
+    job_results = job_status.get("results", None) or []
+    return next(filter(lambda x: x["$type"] == "JobResult", job_results), None)
+
+
+def parse_job_result(service_url: str, ticket: str, job_status: dict) -> JobResult:
+    """Returns the `JobResult` of a finished job, or `None` if the job hasn't finished."""
+
+    job_results = job_status.get("results", None)
+
+    # If there's a 'JobQuit' result we know the job is done
+    if job_results and any(x["$type"] == "JobQuit" for x in job_results):
+        job_result = find_job_result(job_status)
+
+        # The job finished but didn't produce any artifacts.
+        if not job_result:
+            logs_url = _get_logs_url(service_url, ticket)
+            raise Exception(
+                f"Report job failed to produce an artifact. See the logs for more details: {logs_url}"  # pylint: disable=line-too-long
+            )
+
+        # The job finished successfully.
+        return JobResult(
+            service_url,
+            ticket,
+            job_result["tag"],
+            content_type=job_result.get("contentType", ""),
+            length=job_result.get("length"),
+            finished=time.time(),
+        )
+
+    # Job not finished yet.
+    return None
@@ -0,0 +1,193 @@
+import asyncio
+import functools
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .job_status import JobResult
+
+# The states of a journaled job.
+SUBMITTED = "submitted"
+FINISHED = "finished"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    service_url TEXT NOT NULL,
+    job_args TEXT NOT NULL,
+    ticket TEXT NOT NULL,
+    status TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    updated REAL NOT NULL,
+    result TEXT,
+    error TEXT
+)
+"""
+
+_COLUMNS = "key, service_url, job_args, ticket, status, submitted, result, error"
+
+
+class JournalEntry:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """A job recorded in a `TicketJournal`.
+
+    Attributes:
+        key (str): The job's key, a hash of its service URL and arguments.
+        service_url (str): The URL of the reporting service the job was submitted to.
+        job_args (dict): The arguments the job was submitted with.
+        ticket (str): The job's ticket.
+        status (str): `"submitted"`, `"finished"` or `"failed"`.
+        submitted (float): When the ticket was issued, as a Unix timestamp.
+        result (JobResult): The job's result, if it finished.
+        error (str): The error the job failed with, if it failed.
+    """
+
+    __slots__ = (
+        "key",
+        "service_url",
+        "job_args",
+        "ticket",
+        "status",
+        "submitted",
+        "result",
+        "error",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, key, service_url, job_args, ticket, status, submitted, result, error
+    ):
+        self.key = key
+        self.service_url = service_url
+        self.job_args = json.loads(job_args)
+        self.ticket = ticket
+        self.status = status
+        self.submitted = submitted
+        self.result = JobResult.from_dict(json.loads(result)) if result else None
+        self.error = error
+
+    @property
+    def parameters(self) -> dict:
+        """The job's parameters, as they were passed to `run`."""
+
+        return {
+            x["name"]: x["values"] if x.get("containsMultipleValues") else x["value"]
+            for x in self.job_args.get("parameters", [])
+        }
+
+    def __repr__(self):
+        return f"JournalEntry(ticket={self.ticket!r}, status={self.status!r})"
+
+
+class TicketJournal:
+    """Records the tickets of submitted jobs in a SQLite database, so they survive restarts.
+
+    Pass a journal to `ReportingClient` or `run_many` and each job's ticket is written
+    as soon as the service issues it, along with its arguments. Running the same jobs
+    again with the same journal skips the ones that finished, returning their
+    recorded results, and waits on the tickets of the ones still running rather than
+    submitting them again. `ReportingClient.resume` waits on every outstanding ticket.
+
+    Jobs are matched on their service URL and arguments. Use a new journal, or
+    `clear` it, for each run whose results shouldn't be reused, since the service
+    only keeps artifacts for a limited time.
+
+    Clients call the journal on a thread of its own, through `run_in_executor`, so
+    the event loop isn't blocked while SQLite commits each write to disk.
+
+    Args:
+        path (str): The path of the database file. Created if needed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+        # A single thread, so calls made through it run in the order they're made.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="geocortex-reporting-journal"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database, once the calls made through `run_in_executor` are done."""
+
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._connection.close()
+
+    async def run_in_executor(self, func, *args):
+        """Call one of the journal's methods on its thread, returning its result.
+
+        Calls run one at a time, in the order they're made.
+        """
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
+
+    def _execute(self, sql: str, parameters=()) -> list:
+        with self._lock, self._connection:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def get(self, key: str) -> JournalEntry:
+        """Return the entry for the job with `key`, or `None`."""
+
+        rows = self._execute(f"SELECT {_COLUMNS} FROM jobs WHERE key = ?", (key,))
+        return JournalEntry(*rows[0]) if rows else None
+
+    def entries(self, status: str = None) -> list:
+        """Return every entry, or those with `status`, oldest first."""
+
+        if status is None:
+            rows = self._execute(f"SELECT {_COLUMNS} FROM jobs ORDER BY submitted")
+        else:
+            rows = self._execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE status = ? ORDER BY submitted",
+                (status,),
+            )
+        return [JournalEntry(*x) for x in rows]
+
+    def outstanding(self) -> list:
+        """Return the entries of jobs that were submitted but haven't finished."""
+        return self.entries(SUBMITTED)
+
+    def record_submitted(self, key: str, service_url: str, job_args: dict, ticket: str):
+        """Record the ticket of a job that was just submitted."""
+
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO jobs"
+            " (key, service_url, job_args, ticket, status, submitted, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, service_url, json.dumps(job_args), ticket, SUBMITTED, now, now),
+        )
+
+    def record_finished(self, key: str, job_result: JobResult):
+        """Record the result of a finished job."""
+
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, updated = ? WHERE key = ?",
+            (FINISHED, json.dumps(job_result.to_dict()), time.time(), key),
+        )
+
+    def record_failed(self, key: str, error: Exception):
+        """Record that a job failed. It will be submitted again if it's rerun."""
+
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE key = ?",
+            (FAILED, str(error), time.time(), key),
+        )
+
+    def clear(self):
+        """Remove every entry."""
+        self._execute("DELETE FROM jobs")
@@ -0,0 +1,46 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class EncodedDict(dict):
+    """A dict that carries its own JSON encoding, so it isn't encoded again when sent.
+
+    Don't change it once it's created, or the encoding will be out of date.
+
+    Args:
+        value (dict): The dict's items.
+        encoded (bytes): The dict encoded as JSON.
+    """
+
+    __slots__ = ("encoded",)
+
+    def __init__(self, value: dict, encoded: bytes):
+        super().__init__(value)
+        self.encoded = encoded
+
+
+def dumps(value) -> bytes:
+    """Encode `value` as compact JSON, with `orjson` if it's installed."""
+
+    if isinstance(value, EncodedDict):
+        return value.encoded
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)  # pylint: disable=no-member
+        except TypeError:
+            # e.g. an integer too large for orjson, which the json module handles.
+            pass
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def loads(data):
+    """Decode JSON from `bytes` or `str`, with `orjson` if it's installed."""
+
+    if orjson is not None:
+        return orjson.loads(data)  # pylint: disable=no-member
+    return json.loads(data)
@@ -0,0 +1,279 @@
+import asyncio
+import random
+import weakref
+
+from .events import EventDispatcher
+from .job_status import JobResult, parse_job_result
+from .transport import Transport
+
+# Schedulers are bound to the event loop they were created in.
+_schedulers = weakref.WeakKeyDictionary()
+
+
+class JobTimeoutError(TimeoutError):
+    """Raised when a job doesn't finish within the `timeout` of its `PollingStrategy`."""
+
+
+class PollingStrategy:  # pylint: disable=too-few-public-methods
+    """Controls how often the job service is polled for results.
+
+    The first poll is sent immediately. After that the interval starts at
+    `initial_interval` and grows by `multiplier` after every poll, up to `max_interval`.
+
+    Args:
+        initial_interval (float, optional): Seconds to wait before the second poll.
+            Defaults to `0.25`.
+        multiplier (float, optional): The factor the interval grows by after each poll.
+            Defaults to `1.5`.
+        max_interval (float, optional): The longest interval between polls, in seconds.
+            Defaults to `5`.
+        jitter (float, optional): The fraction each interval is randomly varied by, so
+            that many jobs submitted together don't poll in lockstep. Defaults to `0.1`.
+        timeout (float, optional): The number of seconds to wait for the job before
+            giving up with a `JobTimeoutError`. Defaults to `None`, which waits indefinitely.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_interval=0.25,
+        multiplier=1.5,
+        max_interval=5.0,
+        jitter=0.1,
+        timeout=None,
+    ):
+        if initial_interval <= 0 or max_interval < initial_interval:
+            raise ValueError(
+                "initial_interval must be positive and no more than max_interval."
+            )
+        if multiplier < 1:
+            raise ValueError("multiplier must be at least 1.")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be at least 0 and less than 1.")
+
+        self.initial_interval = initial_interval
+        self.multiplier = multiplier
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.timeout = timeout
+
+    def interval(self, attempt: int) -> float:
+        """Return the number of seconds to wait after the given (zero-based) poll."""
+
+        interval = min(
+            self.initial_interval * self.multiplier**attempt, self.max_interval
+        )
+        if self.jitter:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        return interval
+
+
+DEFAULT_POLLING_STRATEGY = PollingStrategy()
+
+
+class _PolledTicket:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    __slots__ = (
+        "ticket",
+        "future",
+        "attempt",
+        "next_poll",
+        "deadline",
+        "waiters",
+        "events",
+        "poll",
+    )
+
+    def __init__(self, ticket: str, future, now: float, timeout: float):
+        self.ticket = ticket
+        self.future = future
+        self.attempt = 0
+        self.next_poll = now
+        self.deadline = now + timeout if timeout is not None else None
+        self.waiters = 0
+        self.events = EventDispatcher(ticket)
+        # The task polling the ticket, while a poll is in flight.
+        self.poll = None
+
+
+class PollingScheduler:
+    """Polls a reporting service for the results of many jobs from a single loop.
+
+    Each ticket is polled according to the `PollingStrategy` by a single loop,
+    rather than from a sleeping loop per job. Every ticket that is due is polled in
+    the same pass, and each poll runs on its own, so a slow request for one ticket
+    doesn't hold up the others.
+
+    Args:
+        transport (Transport): The transport used to poll the service.
+        service_url (str): The URL of the reporting service.
+        strategy (PollingStrategy, optional): How often to poll.
+        on_idle (callable, optional): Called with the scheduler when it stops because
+            no tickets are left to poll.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        service_url: str,
+        strategy: PollingStrategy = DEFAULT_POLLING_STRATEGY,
+        on_idle=None,
+    ):
+        self.transport = transport
+        self.service_url = service_url
+        self.strategy = strategy
+        self._on_idle = on_idle
+        self._tickets = {}
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def pending_tickets(self) -> int:
+        """The number of tickets currently being polled."""
+        return len(self._tickets)
+
+    async def wait(self, ticket: str, progress=None) -> JobResult:
+        """Wait for a job to finish and return its `JobResult`.
+
+        Args:
+            ticket (str): The job's ticket.
+            progress (callable, optional): Called with a `JobEvent` for each new
+                record of the job's status.
+        """
+
+        polled_ticket = self._tickets.get(ticket)
+        if polled_ticket is None:
+            loop = asyncio.get_event_loop()
+            polled_ticket = _PolledTicket(
+                ticket, loop.create_future(), loop.time(), self.strategy.timeout
+            )
+            self._tickets[ticket] = polled_ticket
+            self._wakeup.set()
+            if self._task is None:
+                self._task = asyncio.ensure_future(self._run())
+
+        polled_ticket.waiters += 1
+        if progress is not None:
+            polled_ticket.events.callbacks.append(progress)
+        try:
+            # Shield the shared future so one cancelled caller doesn't cancel the others.
+            return await asyncio.shield(polled_ticket.future)
+        finally:
+            polled_ticket.waiters -= 1
+            if progress is not None:
+                polled_ticket.events.callbacks.remove(progress)
+            if not polled_ticket.waiters and not polled_ticket.future.done():
+                # Nobody is waiting on the ticket any more.
+                polled_ticket.future.cancel()
+                if polled_ticket.poll is not None:
+                    polled_ticket.poll.cancel()
+                self._tickets.pop(ticket, None)
+                # Wake the loop so it stops if that was the last ticket.
+                self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        try:
+            while self._tickets:
+                self._wakeup.clear()
+                now = loop.time()
+                idle = [x for x in self._tickets.values() if x.poll is None]
+                for polled_ticket in idle:
+                    if polled_ticket.next_poll <= now:
+                        polled_ticket.poll = asyncio.ensure_future(
+                            self._poll(polled_ticket)
+                        )
+
+                # Finished polls wake the loop, so only idle tickets set the timeout.
+                next_polls = [x.next_poll for x in self._tickets.values() if not x.poll]
+                timeout = min(next_polls) - now if next_polls else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._task = None
+            if not self._tickets and self._on_idle is not None:
+                self._on_idle(self)
+
+    def _finish(self, polled_ticket: _PolledTicket, result=None, error=None):
+        self._tickets.pop(polled_ticket.ticket, None)
+        if polled_ticket.future.done():
+            return
+
+        if error is not None:
+            polled_ticket.future.set_exception(error)
+        else:
+            polled_ticket.future.set_result(result)
+
+    def _timeout_error(self, ticket: str) -> JobTimeoutError:
+        return JobTimeoutError(
+            f"Report job did not finish within {self.strategy.timeout} seconds. Ticket: {ticket}"  # pylint: disable=line-too-long
+        )
+
+    async def _poll(self, polled_ticket: _PolledTicket):
+        try:
+            await self._poll_once(polled_ticket)
+        finally:
+            polled_ticket.poll = None
+            self._wakeup.set()
+
+    async def _poll_once(self, polled_ticket: _PolledTicket):
+        loop = asyncio.get_event_loop()
+        ticket = polled_ticket.ticket
+        deadline = polled_ticket.deadline
+        try:
+            request = self.transport.get_json(
+                f"{self.service_url}/job/artifacts?ticket={ticket}"
+            )
+            if deadline is not None:
+                # A slow request mustn't keep the job waiting past its deadline.
+                request = asyncio.wait_for(request, max(deadline - loop.time(), 0))
+            job_status = await request
+            polled_ticket.events.dispatch(job_status)
+            job_result = parse_job_result(self.service_url, ticket, job_status)
+        except asyncio.TimeoutError as error:
+            if deadline is not None and loop.time() >= deadline:
+                error = self._timeout_error(ticket)
+            self._finish(polled_ticket, error=error)
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            self._finish(polled_ticket, error=error)
+            return
+
+        if job_result:
+            self._finish(polled_ticket, result=job_result)
+            return
+
+        now = loop.time()
+        if deadline is not None and now >= deadline:
+            self._finish(polled_ticket, error=self._timeout_error(ticket))
+            return
+
+        next_poll = now + self.strategy.interval(polled_ticket.attempt)
+        if deadline is not None:
+            next_poll = min(next_poll, deadline)
+        polled_ticket.next_poll = next_poll
+        polled_ticket.attempt += 1
+
+
+def get_polling_scheduler(
+    transport: Transport,
+    service_url: str,
+    strategy: PollingStrategy = DEFAULT_POLLING_STRATEGY,
+) -> PollingScheduler:
+    """Return the shared scheduler for a service and strategy in the running event loop."""
+
+    loop_schedulers = _schedulers.setdefault(asyncio.get_event_loop(), {})
+    key = (transport, service_url, strategy)
+
+    def forget(idle_scheduler: PollingScheduler):
+        # Idle schedulers are dropped so they don't keep their transport alive.
+        if loop_schedulers.get(key) is idle_scheduler:
+            del loop_schedulers[key]
+
+    scheduler = loop_schedulers.get(key)
+    if scheduler is None:
+        scheduler = PollingScheduler(transport, service_url, strategy, forget)
+        loop_schedulers[key] = scheduler
+
+    return scheduler
@@ -1,4 +1,10 @@
-import requests
+import hashlib
+
+from .cache import TTLCache
+from .transport import Transport, get_default_transport
+
+# Portal items rarely change between reports, so avoid fetching them for every job.
+portal_item_cache = TTLCache(max_size=256, ttl=300)
 
 
 def _get_portal_rest_url(portal_url: str) -> str:
@@ -14,17 +20,52 @@ def _get_portal_item_url(item_id: str, portal_url: str, token: str) -> str:
     return url
 
 
-def get_portal_item(item_id: str, portal_url: str, token: str):
-    """Retrieve a portal item by id."""
+def _get_cache_key(item_id: str, portal_url: str, token: str) -> tuple:
+    # Items are cached per token as access to them depends on the user.
+    token_hash = hashlib.sha256(token.encode()).hexdigest() if token else ""
+    return (item_id, portal_url, token_hash)
+
 
-    item_url = _get_portal_item_url(item_id, portal_url, token)
-    response = requests.get(item_url)
-    response.raise_for_status()
-    portal_item = response.json()
+def invalidate_portal_item(item_id: str, portal_url="https://www.arcgis.com"):
+    """Remove a portal item from the cache, for every token it was retrieved with."""
 
+    portal_url = portal_url.strip("/")
+    portal_item_cache.invalidate_where(lambda x: x[:2] == (item_id, portal_url))
+
+
+def _check_portal_item(portal_item: dict) -> dict:
     if "error" in portal_item:
         message = portal_item["error"]["message"]
         raise Exception(f"Error retrieving portal item: {message}")
 
     return portal_item
 
+
+def get_portal_item(item_id: str, portal_url: str, token: str):
+    """Retrieve a portal item by id."""
+
+    cache_key = _get_cache_key(item_id, portal_url, token)
+    portal_item = portal_item_cache.get(cache_key)
+    if portal_item is None:
+        item_url = _get_portal_item_url(item_id, portal_url, token)
+        portal_item = _check_portal_item(
+            get_default_transport().request_json("GET", item_url)
+        )
+        portal_item_cache.set(cache_key, portal_item)
+
+    return portal_item
+
+
+async def get_portal_item_async(
+    item_id: str, portal_url: str, token: str, transport: Transport
+):
+    """Retrieve a portal item by id without blocking the event loop."""
+
+    cache_key = _get_cache_key(item_id, portal_url, token)
+    portal_item = portal_item_cache.get(cache_key)
+    if portal_item is None:
+        item_url = _get_portal_item_url(item_id, portal_url, token)
+        portal_item = _check_portal_item(await transport.get_json(item_url))
+        portal_item_cache.set(cache_key, portal_item)
+
+    return portal_item
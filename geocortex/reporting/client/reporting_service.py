@@ -1,33 +1,45 @@
-import json
+# pylint: disable=too-many-lines
+import asyncio
 import time
-import requests
-from websockets.client import connect
 
-from .portal_utils import get_portal_item
-
-
-def _check_job_status(service_url: str, ticket: str, job_status: dict) -> str:
-    job_results = job_status.get("results", None)
-
-    # If there's a 'JobQuit' result we know the job is done
-    if job_results and any(x["$type"] == "JobQuit" for x in job_results):
-        job_result = next(
-            filter(lambda x: x["$type"] == "JobResult", job_results), None
-        )
-
-        # The job finished but didn't produce any artifacts.
-        if not job_result:
-            logs_url = f"{service_url}/job/logs?ticket={ticket}"
-            raise Exception(
-                f"Report job failed to produce an artifact. See the logs for more details: {logs_url}"  # pylint: disable=line-too-long
-            )
-
-        tag = job_result["tag"]
-        # The job finished successfully.
-        return f"{service_url}/job/result?ticket={ticket}&tag={tag}"
-
-    # Job not finished yet.
-    return ""
+from .auth import get_reporting_token, invalidate_reporting_token
+from .balancing import EndpointPool
+from .concurrency import map_unordered
+from .download import download, download_many, download_merged, stream_result
+from .events import JobEventStream
+from .instrumentation import (
+    Instrumentation,
+    get_instrumented_transport,
+    track_stage,
+)
+from .job_args import PreparedTemplate
+from .job_listener import WebSocketUnavailableError, get_job_listener
+from .job_status import JobResult
+from .journal import FINISHED, SUBMITTED, TicketJournal
+from .polling import (
+    DEFAULT_POLLING_STRATEGY,
+    JobTimeoutError,
+    PollingStrategy,
+    get_polling_scheduler,
+)
+from .portal_utils import get_portal_item_async
+from .result_cache import ResultCache, get_or_run, get_result_key
+from .retry import (
+    DEFAULT_RETRY_POLICY,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    call_with_retry,
+)
+from .submission_queue import BATCH, INTERACTIVE, SubmissionQueue
+from .transport import (
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    HTTPStatusError,
+    RequestsTransport,
+    Transport,
+    get_default_transport,
+)
 
 
 def _get_service_url_from_portal_item(portal_item: dict) -> str:
@@ -41,110 +53,858 @@ def _get_service_url_from_portal_item(portal_item: dict) -> str:
     return service_url.strip("/") + "/service"
 
 
-def _get_reporting_token_if_needed(
-    token: str, portal_item: dict, service_url: str, portal_url: str
+async def _get_reporting_token_if_needed(  # pylint: disable=too-many-arguments
+    transport: Transport,
+    token: str,
+    portal_item: dict,
+    service_url: str,
+    portal_url: str,
+    instrumentation: Instrumentation = None,
 ) -> str:
     if token and portal_item["access"] != "public":
-        token_args = {"accessToken": token, "portalUrl": portal_url}
-        response = requests.post(service_url + "/auth/token/run", json=token_args)
-        response.raise_for_status()
-        response_json = response.json()
-        return response_json["response"]["token"]
+        with track_stage(instrumentation, "token", service_url=service_url):
+            return await get_reporting_token(transport, service_url, portal_url, token)
 
     return ""
 
 
-def _build_job_args(template_arg: dict, args: dict, culture: str, dpi: int) -> dict:
-    job_args = {
-        "template": template_arg,
-        "parameters": [],
-    }
+def _split_parameter(parameters: dict, name: str, chunk_size: int):
+    """Yields copies of `parameters` with the values of `name` split into chunks."""
 
-    for key, value in args.items():
-        param = {"name": key}
+    values = parameters.get(name)
+    if type(values) not in [list, tuple]:
+        raise ValueError(f"The {name} parameter must be a list or tuple to be chunked.")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
 
-        if type(value) in [list, tuple]:
-            param["containsMultipleValues"] = True
-            param["values"] = value
-        else:
-            param["containsMultipleValues"] = False
-            param["value"] = value
+    # An empty list still runs one job.
+    for start in range(0, max(len(values), 1), chunk_size):
+        yield dict(parameters, **{name: values[start : start + chunk_size]})
 
-        job_args["parameters"].append(param)
 
-    if culture:
-        job_args["culture"] = culture
-    if dpi:
-        job_args["dpi"] = dpi
-    return job_args
+async def _start_job(
+    transport: Transport, service_url: str, job_args: dict, token: str
+) -> str:
+    headers = {}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
 
+    run_result = await transport.post_json(
+        f"{service_url}/job/run", job_args, headers=headers
+    )
+    ticket = run_result["response"]["ticket"]
+    return ticket
 
-def _build_template_arg(item_id: str, portal_url: str, result_file_name: str) -> dict:
-    template = {"itemId": item_id, "portalUrl": portal_url}
 
-    if result_file_name:
-        template["title"] = result_file_name
-    return template
+async def _wait_for_job_result_http(
+    transport: Transport,
+    service_url: str,
+    ticket: str,
+    polling_strategy: PollingStrategy = None,
+    progress=None,
+) -> JobResult:
+    scheduler = get_polling_scheduler(
+        transport, service_url, polling_strategy or DEFAULT_POLLING_STRATEGY
+    )
+    return await scheduler.wait(ticket, progress)
 
 
-def _start_job(service_url: str, job_args: dict, token: str) -> str:
-    headers = {}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+async def _wait_for_job_result_ws(
+    transport: Transport,
+    service_url: str,
+    ticket: str,
+    polling_strategy: PollingStrategy = None,
+    progress=None,
+) -> JobResult:
+    async def wait() -> JobResult:
+        try:
+            return await get_job_listener(service_url).wait(ticket, progress)
+        except WebSocketUnavailableError:
+            # e.g. a proxy blocks WebSockets, or the socket stalled.
+            return await _wait_for_job_result_http(
+                transport, service_url, ticket, polling_strategy, progress
+            )
 
-    response = requests.post(f"{service_url}/job/run", headers=headers, json=job_args)
-    response.raise_for_status()
+    timeout = (polling_strategy or DEFAULT_POLLING_STRATEGY).timeout
+    if timeout is None:
+        return await wait()
 
-    run_result = response.json()
-    ticket = run_result["response"]["ticket"]
-    return ticket
+    # The deadline covers both the socket and any polling that replaces it.
+    task = asyncio.ensure_future(wait())
+    try:
+        done, _ = await asyncio.wait([task], timeout=timeout)
+    finally:
+        if not task.done():
+            task.cancel()
+    if not done:
+        raise JobTimeoutError(
+            f"Report job did not finish within {timeout} seconds. Ticket: {ticket}"
+        )
+    return task.result()
+
+
+async def _resolve_service(
+    transport: Transport, item_id: str, portal_url: str, token: str
+) -> tuple:
+    """Returns the portal item and the URL of the service to run its jobs on."""
+
+    portal_item = await get_portal_item_async(item_id, portal_url, token, transport)
+    return portal_item, _get_service_url_from_portal_item(portal_item)
+
+
+async def _submit_job(
+    transport: Transport,
+    service_url: str,
+    job_args: dict,
+    *,
+    token: str,
+    portal_item: dict,
+    portal_url: str,
+    instrumentation: Instrumentation = None,
+) -> str:
+    """Starts a job, exchanging the token again if the reporting token is rejected."""
+
+    reporting_token = await _get_reporting_token_if_needed(
+        transport, token, portal_item, service_url, portal_url, instrumentation
+    )
+    try:
+        with track_stage(instrumentation, "start_job", service_url=service_url):
+            return await _start_job(transport, service_url, job_args, reporting_token)
+    except HTTPStatusError as error:
+        if error.status != 401 or not reporting_token:
+            raise
+        if instrumentation is not None:
+            instrumentation.retried("start_job", 1, error)
+
+    invalidate_reporting_token(service_url, portal_url, token, reporting_token)
+    reporting_token = await _get_reporting_token_if_needed(
+        transport, token, portal_item, service_url, portal_url, instrumentation
+    )
+    with track_stage(instrumentation, "start_job", service_url=service_url):
+        return await _start_job(transport, service_url, job_args, reporting_token)
+
+
+async def _wait_for_job_result(  # pylint: disable=too-many-arguments
+    transport: Transport,
+    service_url: str,
+    ticket: str,
+    use_polling: bool,
+    polling_strategy: PollingStrategy = None,
+    progress=None,
+) -> JobResult:
+    if use_polling:
+        return await _wait_for_job_result_http(
+            transport, service_url, ticket, polling_strategy, progress
+        )
+
+    return await _wait_for_job_result_ws(
+        transport, service_url, ticket, polling_strategy, progress
+    )
+
+
+class BatchResult:  # pylint: disable=too-few-public-methods
+    """The outcome of one job run by `run_many`.
+
+    Attributes:
+        index (int): The position of the job's parameters in `param_sets`.
+        parameters (dict): The parameters the job was run with.
+        result (JobResult): The job's result, or `None` if the job failed.
+        error (Exception): The error raised by the job, or `None` if it succeeded.
+    """
+
+    __slots__ = ("index", "parameters", "result", "error")
+
+    def __init__(self, index: int, parameters: dict, result=None, error=None):
+        self.index = index
+        self.parameters = parameters
+        self.result = result
+        self.error = error
+
+    @property
+    def url(self) -> str:
+        """The URL to the report artifact, or `""` if the job failed."""
+        return self.result.url if self.result else ""
+
+    def __repr__(self):
+        outcome = f"error={self.error!r}" if self.error else f"url={self.url!r}"
+        return f"BatchResult(index={self.index}, {outcome})"
+
+
+class ReportingClient:  # pylint: disable=too-many-instance-attributes
+    """Runs report jobs, reusing connections between them.
+
+    The client owns a transport whose HTTP sessions keep connections to the portal
+    and the reporting service alive, so many jobs don't each pay for a new handshake.
+    Close the client when done with it, or use it as an async context manager.
+
+    Args:
+        portal_url (str, optional): The URL of the ArcGIS Portal instance to use.
+            Defaults to `https://www.arcgis.com`.
+        token (str, optional): The Portal access token to be used to access secured resources.
+            If not provided requests to secured resources will fail.
+        transport (Transport, optional): The transport used to make HTTP requests.
+            Defaults to a `RequestsTransport` created with `pool_size` and `timeout`.
+            A transport that is passed in isn't closed by the client.
+        pool_size (int, optional): The number of connections kept open to each host.
+            Defaults to `10`.
+        timeout (float, optional): The number of seconds to wait for each HTTP response.
+            Defaults to `60`.
+        instrumentation (Instrumentation, optional): Receives the timings of each stage
+            of a job, and counts of requests, bytes and retries.
+        result_cache (ResultCache, optional): Caches the results of jobs, so identical
+            jobs reuse an earlier artifact instead of running again. Defaults to `None`,
+            which runs every job.
+        retry_policy (RetryPolicy, optional): How calls that fail transiently are
+            retried. Defaults to three attempts with exponential backoff.
+        circuit_breaker (CircuitBreaker, optional): Fails jobs fast while their
+            reporting service is down. Defaults to `None`, which always calls it.
+        journal (TicketJournal, optional): Records the ticket of each job, so jobs
+            can be resumed after a restart instead of being submitted again.
+        endpoints (EndpointPool, optional): Spreads jobs across several instances of
+            the reporting service. Defaults to `None`, which runs each job on the
+            service named by its portal item.
+        submission_queue (SubmissionQueue, optional): Holds jobs back from each
+            reporting service, submitting them in priority order at a limited rate.
+            Defaults to `None`, which submits every job straight away.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        portal_url="https://www.arcgis.com",
+        token="",
+        transport: Transport = None,
+        pool_size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        instrumentation: Instrumentation = None,
+        result_cache: ResultCache = None,
+        retry_policy: RetryPolicy = None,
+        circuit_breaker: CircuitBreaker = None,
+        journal: TicketJournal = None,
+        endpoints: EndpointPool = None,
+        submission_queue: SubmissionQueue = None,
+    ):
+        self.portal_url = portal_url.strip("/")
+        self.token = token
+        self.instrumentation = instrumentation
+        self.result_cache = result_cache
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self.circuit_breaker = circuit_breaker
+        self.journal = journal
+        self.endpoints = endpoints
+        self.submission_queue = submission_queue
+        self._owns_transport = transport is None
+        self.transport = transport or RequestsTransport(
+            pool_size=pool_size, timeout=timeout
+        )
+        if instrumentation is not None:
+            self.transport = get_instrumented_transport(self.transport, instrumentation)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the client's transport, if it created it."""
+
+        if self._owns_transport:
+            await self.transport.close()
+
+    async def prewarm(self, *item_ids: str):
+        """Looks up the portal items of reports ahead of their first job.
+
+        Each item's reporting service is resolved and, if the item isn't public, a
+        reporting token is exchanged for it, so the first job run for each item
+        doesn't wait on those round trips. The connections they open are kept for
+        later jobs. Call it when a short-lived process starts, such as in the
+        initialization of a serverless function.
+
+        Args:
+            *item_ids (str): The portal item IDs of the Reporting or Printing items.
+        """
+
+        async def prewarm_item(item_id: str):
+            portal_item, service_url = await self._resolve_service(item_id)
+            service_urls = (
+                [service_url] if self.endpoints is None else self.endpoints.service_urls
+            )
+            await asyncio.gather(
+                *(
+                    _get_reporting_token_if_needed(
+                        self.transport,
+                        self.token,
+                        portal_item,
+                        x,
+                        self.portal_url,
+                        self.instrumentation,
+                    )
+                    for x in service_urls
+                )
+            )
+
+        await asyncio.gather(*(prewarm_item(x) for x in item_ids))
+
+    def prepare(self, item_id: str, **kwargs) -> PreparedTemplate:
+        """Prepares a template for the client's portal, to run many jobs from.
+
+        See `PreparedTemplate` for a description of the arguments.
+        """
+
+        return PreparedTemplate(item_id, portal_url=self.portal_url, **kwargs)
+
+    def _prepare(
+        self, item_id, culture: str, dpi: int, result_file_name=""
+    ) -> PreparedTemplate:
+        if not isinstance(item_id, PreparedTemplate):
+            return PreparedTemplate(
+                item_id,
+                portal_url=self.portal_url,
+                culture=culture,
+                dpi=dpi,
+                result_file_name=result_file_name,
+            )
+
+        if culture or dpi or result_file_name:
+            raise ValueError(
+                "Pass culture, dpi and result_file_name to the PreparedTemplate instead."
+            )
+        if item_id.portal_url != self.portal_url:
+            raise ValueError(
+                f"The template was prepared for {item_id.portal_url}, not {self.portal_url}."
+            )
+        return item_id
+
+    async def download(self, result_url: str, dest: str, **kwargs) -> int:
+        """Downloads a report artifact to a file over the client's connections.
+
+        See `download` for a description of the arguments.
+        """
+
+        with track_stage(self.instrumentation, "download", url=str(result_url)):
+            return await download(result_url, dest, transport=self.transport, **kwargs)
+
+    def download_many(self, items, dest_dir: str, **kwargs):
+        """Downloads many report artifacts concurrently over the client's connections.
+
+        See `download_many` for a description of the arguments.
+        """
+
+        return download_many(
+            items,
+            dest_dir,
+            transport=self.transport,
+            instrumentation=self.instrumentation,
+            **kwargs,
+        )
+
+    def stream_result(self, result_url: str, **kwargs):
+        """Streams a report artifact over the client's connections.
+
+        See `stream_result` for a description of the arguments.
+        """
+
+        return stream_result(result_url, transport=self.transport, **kwargs)
+
+    async def _submit_job(
+        self, portal_item: dict, service_url: str, job_args: dict
+    ) -> str:
+        return await _submit_job(
+            self.transport,
+            service_url,
+            job_args,
+            token=self.token,
+            portal_item=portal_item,
+            portal_url=self.portal_url,
+            instrumentation=self.instrumentation,
+        )
+
+    def _call_with_retry(self, call, stage: str, service_url=""):
+        return call_with_retry(
+            call,
+            self.retry_policy,
+            stage=stage,
+            service_url=service_url,
+            # The breaker tracks reporting services, not the portal.
+            circuit_breaker=self.circuit_breaker if service_url else None,
+            instrumentation=self.instrumentation,
+        )
+
+    async def _resolve_service(self, item_id: str) -> tuple:
+        with track_stage(self.instrumentation, "portal_item", item_id=item_id):
+            return await self._call_with_retry(
+                lambda: _resolve_service(
+                    self.transport, item_id, self.portal_url, self.token
+                ),
+                "portal_item",
+            )
+
+    def _is_job_failure(self, error: Exception) -> bool:
+        # The job may still finish after a timeout, an outage or a cancellation, so
+        # its ticket is kept to be resumed rather than the job being run again.
+        if isinstance(
+            error, (JobTimeoutError, CircuitOpenError, asyncio.CancelledError)
+        ):
+            return False
+        return not self.retry_policy.is_service_failure(error)
+
+    async def _wait_for_ticket(  # pylint: disable=too-many-arguments
+        self,
+        service_url: str,
+        ticket: str,
+        use_polling: bool,
+        polling_strategy: PollingStrategy,
+        submitted: float,
+        started: float,
+        key: str = None,
+        progress=None,
+    ) -> JobResult:
+        # Retries wait on the same ticket, so a dropped connection doesn't rerun the job.
+        try:
+            with track_stage(self.instrumentation, "wait", ticket=ticket):
+                job_result = await self._call_with_retry(
+                    lambda: _wait_for_job_result(
+                        self.transport,
+                        service_url,
+                        ticket,
+                        use_polling,
+                        polling_strategy,
+                        progress,
+                    ),
+                    "wait",
+                    service_url,
+                )
+        except Exception as error:
+            if key is not None and self._is_job_failure(error):
+                await self.journal.run_in_executor(
+                    self.journal.record_failed, key, error
+                )
+            raise
+
+        if job_result is not None:
+            job_result.submitted = submitted
+            job_result.started = started
+            if key is not None:
+                await self.journal.run_in_executor(
+                    self.journal.record_finished, key, job_result
+                )
+        return job_result
+
+    async def _submit_and_wait(  # pylint: disable=too-many-arguments
+        self,
+        portal_item: dict,
+        service_url: str,
+        job_args: dict,
+        use_polling: bool,
+        polling_strategy: PollingStrategy,
+        key: str = None,
+        progress=None,
+        priority=INTERACTIVE,
+    ) -> JobResult:
+        if self.submission_queue is not None:
+            with track_stage(self.instrumentation, "queue", service_url=service_url):
+                await self.submission_queue.acquire(service_url, priority)
+
+        try:
+            submitted = time.time()
+            ticket = await self._call_with_retry(
+                lambda: self._submit_job(portal_item, service_url, job_args),
+                "start_job",
+                service_url,
+            )
+            started = time.time()
+            if key is not None:
+                await self.journal.run_in_executor(
+                    self.journal.record_submitted, key, service_url, job_args, ticket
+                )
+
+            return await self._wait_for_ticket(
+                service_url,
+                ticket,
+                use_polling,
+                polling_strategy,
+                submitted,
+                started,
+                key,
+                progress,
+            )
+        finally:
+            if self.submission_queue is not None:
+                self.submission_queue.release(service_url)
+
+    async def _run_job(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        portal_item: dict,
+        service_url: str,
+        job_args: dict,
+        use_polling: bool,
+        polling_strategy: PollingStrategy,
+        progress=None,
+        priority=INTERACTIVE,
+    ) -> JobResult:
+        key = entry = None
+        if self.journal is not None:
+            # Keyed on the portal item's service, so any endpoint's result is reused.
+            key = get_result_key(service_url, job_args)
+            entry = await self.journal.run_in_executor(self.journal.get, key)
+
+        if entry is not None and entry.status == FINISHED:
+            return entry.result
+
+        if entry is not None and entry.status == SUBMITTED:
+            # Reattach to the job rather than submitting it again.
+            return await self._wait_for_ticket(
+                entry.service_url,
+                entry.ticket,
+                use_polling,
+                polling_strategy,
+                entry.submitted,
+                entry.submitted,
+                key,
+                progress,
+            )
+
+        if self.endpoints is None:
+            return await self._submit_and_wait(
+                portal_item,
+                service_url,
+                job_args,
+                use_polling,
+                polling_strategy,
+                key,
+                progress,
+                priority,
+            )
+
+        await self.endpoints.check_health(self.transport)
+        endpoint = self.endpoints.acquire()
+        start = time.monotonic()
+        duration = None
+        failed = False
+        try:
+            job_result = await self._submit_and_wait(
+                portal_item,
+                endpoint,
+                job_args,
+                use_polling,
+                polling_strategy,
+                key,
+                progress,
+                priority,
+            )
+            duration = time.monotonic() - start
+            return job_result
+        except Exception as error:
+            # A job that never finishes counts against the endpoint, or a stuck
+            # endpoint would keep drawing new jobs.
+            failed = self.retry_policy.is_service_failure(error) or isinstance(
+                error, JobTimeoutError
+            )
+            raise
+        finally:
+            self.endpoints.release(endpoint, duration, failed)
+
+    async def _run_job_cached(  # pylint: disable=too-many-arguments
+        self,
+        portal_item: dict,
+        service_url: str,
+        job_args: dict,
+        use_polling: bool,
+        polling_strategy: PollingStrategy,
+        progress=None,
+        priority=INTERACTIVE,
+    ) -> JobResult:
+        def run_job():
+            return self._run_job(
+                portal_item,
+                service_url,
+                job_args,
+                use_polling,
+                polling_strategy,
+                progress,
+                priority,
+            )
+
+        if self.result_cache is None:
+            return await run_job()
+
+        key = get_result_key(service_url, job_args, self.token)
+        return await get_or_run(self.result_cache, key, run_job)
+
+    async def run(  # pylint: disable=too-many-locals
+        self,
+        item_id,
+        *,
+        culture="",
+        dpi=0,
+        use_polling=False,
+        polling_strategy: PollingStrategy = None,
+        result_file_name="",
+        return_job_result=False,
+        progress=None,
+        priority=INTERACTIVE,
+        **kwargs,
+    ):
+        """Runs a report job and returns a URL to the report artifact.
+
+        See the module level `run` for a description of the arguments.
+        """
 
+        template = self._prepare(item_id, culture, dpi, result_file_name)
+        with track_stage(self.instrumentation, "run", item_id=template.item_id):
+            portal_item, service_url = await self._resolve_service(template.item_id)
+            job_args = template.job_args(kwargs)
+            job_result = await self._run_job_cached(
+                portal_item,
+                service_url,
+                job_args,
+                use_polling,
+                polling_strategy,
+                progress,
+                priority,
+            )
+
+        if return_job_result or job_result is None:
+            return job_result
+        return job_result.url
+
+    def stream_events(self, item_id: str, **kwargs) -> JobEventStream:
+        """Runs a report job, returning an async iterator of its events as they arrive.
+
+        The job starts when iteration starts. Once iteration ends, the job's
+        `JobResult` is available as the stream's `result`.
+
+        ```py
+        events = client.stream_events("itemid", FeatureIds=[1])
+        async for event in events:
+            print(event.type, event.data)
+        url = events.result.url
+        ```
+
+        Args:
+            item_id (str): The portal item ID of the Reporting or Printing item.
+            **kwargs: The other arguments accepted by `run`, except `progress` and
+                `return_job_result`.
+        """
+
+        return JobEventStream(
+            lambda progress: self.run(
+                item_id, progress=progress, return_job_result=True, **kwargs
+            )
+        )
+
+    async def run_many(  # pylint: disable=too-many-locals
+        self,
+        item_id,
+        param_sets,
+        *,
+        max_concurrency=4,
+        culture="",
+        dpi=0,
+        use_polling=False,
+        polling_strategy: PollingStrategy = None,
+        progress=None,
+        priority=BATCH,
+    ):
+        """Runs a report job for each set of parameters, yielding results as they complete.
+
+        See the module level `run_many` for a description of the arguments.
+        """
+
+        template = self._prepare(item_id, culture, dpi)
+        portal_item, service_url = await self._resolve_service(template.item_id)
 
-def _wait_for_job_result_http(service_url: str, ticket: str) -> str:
-    artifact_url = ""
+        async def run_job(job: tuple) -> BatchResult:
+            index, parameters = job
+            try:
+                job_args = template.job_args(parameters)
+                with track_stage(self.instrumentation, "run", item_id=template.item_id):
+                    job_result = await self._run_job_cached(
+                        portal_item,
+                        service_url,
+                        job_args,
+                        use_polling,
+                        polling_strategy,
+                        progress,
+                        priority,
+                    )
+                return BatchResult(index, parameters, result=job_result)
+            except Exception as error:  # pylint: disable=broad-except
+                return BatchResult(index, parameters, error=error)
 
-    while not artifact_url:
-        response = requests.get(f"{service_url}/job/artifacts?ticket={ticket}")
-        response.raise_for_status()
-        job_status = response.json()
-        artifact_url = _check_job_status(service_url, ticket, job_status)
+        results = map_unordered(run_job, enumerate(param_sets), max_concurrency)
+        try:
+            async for result in results:
+                yield result
+        finally:
+            await results.aclose()
 
-        # TODO: Do we want to bail after retrying a certain number of times?
-        if not artifact_url:
-            time.sleep(1)
+    async def resume(
+        self, *, max_concurrency=4, use_polling=False, polling_strategy=None
+    ):
+        """Waits for the jobs in the journal that haven't finished, yielding their results.
 
-    return artifact_url
+        Use it after a restart to collect the jobs that were running when the previous
+        process stopped, without submitting them again. Finished jobs are skipped.
 
+        Args:
+            max_concurrency (int, optional): The maximum number of tickets waited on at
+                the same time. Defaults to `4`.
+            use_polling, polling_strategy: See `run`.
 
-async def _wait_for_job_result_ws(service_url: str, ticket: str) -> str:
-    # Note that a 'https' url will result in 'wss' after the string replace
-    # which is what we want.
-    ws_service_url = service_url.replace("http", "ws")
-    artifacts_service_url = f"{ws_service_url}/job/artifacts?ticket={ticket}"
+        Yields:
+            A `BatchResult` for each outstanding job, in the order the jobs complete.
+            Its `parameters` are those the job was submitted with.
+        """
 
-    async with connect(artifacts_service_url, ssl=True) as websocket:
-        message = await websocket.recv()
-        job_status = json.loads(message)
-        artifact_url = _check_job_status(service_url, ticket, job_status)
-        if artifact_url:
-            return artifact_url
+        if self.journal is None:
+            raise ValueError("A journal is required to resume jobs.")
+
+        async def wait_for_entry(job: tuple) -> BatchResult:
+            index, entry = job
+            try:
+                job_result = await self._wait_for_ticket(
+                    entry.service_url,
+                    entry.ticket,
+                    use_polling,
+                    polling_strategy,
+                    entry.submitted,
+                    entry.submitted,
+                    entry.key,
+                )
+                return BatchResult(index, entry.parameters, result=job_result)
+            except Exception as error:  # pylint: disable=broad-except
+                return BatchResult(index, entry.parameters, error=error)
+
+        outstanding = await self.journal.run_in_executor(self.journal.outstanding)
+        entries = enumerate(outstanding)
+        results = map_unordered(wait_for_entry, entries, max_concurrency)
+        try:
+            async for result in results:
+                yield result
+        finally:
+            await results.aclose()
+
+    async def run_chunked(  # pylint: disable=too-many-locals
+        self,
+        item_id,
+        chunk_parameter: str,
+        *,
+        chunk_size=1000,
+        max_concurrency=4,
+        culture="",
+        dpi=0,
+        use_polling=False,
+        polling_strategy: PollingStrategy = None,
+        return_job_result=False,
+        progress=None,
+        priority=BATCH,
+        **kwargs,
+    ) -> list:
+        """Splits a large multi-value parameter into chunks, running a job for each.
+
+        See the module level `run_chunked` for a description of the arguments.
+        """
+
+        param_sets = list(_split_parameter(kwargs, chunk_parameter, chunk_size))
+        results = [None] * len(param_sets)
+
+        batch = self.run_many(
+            item_id,
+            param_sets,
+            max_concurrency=max_concurrency,
+            culture=culture,
+            dpi=dpi,
+            use_polling=use_polling,
+            polling_strategy=polling_strategy,
+            progress=progress,
+            priority=priority,
+        )
+        try:
+            async for batch_result in batch:
+                if batch_result.error is not None:
+                    raise batch_result.error
+                job_result = batch_result.result
+                results[batch_result.index] = (
+                    job_result
+                    if return_job_result or job_result is None
+                    else job_result.url
+                )
+        finally:
+            # Cancel the other chunks if one of them failed.
+            await batch.aclose()
+
+        return results
+
+    async def download_merged(self, results, dest: str, **kwargs) -> int:
+        """Downloads the artifacts of chunked jobs and merges them into one PDF.
+
+        See `download_merged` for a description of the arguments.
+        """
+
+        with track_stage(self.instrumentation, "download", url=str(dest)):
+            return await download_merged(
+                results, dest, transport=self.transport, **kwargs
+            )
 
 
-async def run(
-    item_id: str,
+def _get_client(  # pylint: disable=too-many-arguments
+    portal_url: str,
+    token: str,
+    transport: Transport,
+    instrumentation: Instrumentation = None,
+    result_cache: ResultCache = None,
+    retry_policy: RetryPolicy = None,
+    circuit_breaker: CircuitBreaker = None,
+    journal: TicketJournal = None,
+    endpoints: EndpointPool = None,
+    submission_queue: SubmissionQueue = None,
+) -> ReportingClient:
+    # The module level functions share a transport, and with it their connections.
+    return ReportingClient(
+        portal_url=portal_url,
+        token=token,
+        transport=transport or get_default_transport(),
+        instrumentation=instrumentation,
+        result_cache=result_cache,
+        retry_policy=retry_policy,
+        circuit_breaker=circuit_breaker,
+        journal=journal,
+        endpoints=endpoints,
+        submission_queue=submission_queue,
+    )
+
+
+async def run(  # pylint: disable=too-many-locals
+    item_id,
     *,
     portal_url="https://www.arcgis.com",
     token="",
     culture="",
     dpi=0,
     use_polling=False,
+    polling_strategy: PollingStrategy = None,
     result_file_name="",
+    return_job_result=False,
+    progress=None,
+    priority=INTERACTIVE,
+    transport: Transport = None,
+    instrumentation: Instrumentation = None,
+    result_cache: ResultCache = None,
+    retry_policy: RetryPolicy = None,
+    circuit_breaker: CircuitBreaker = None,
+    journal: TicketJournal = None,
+    endpoints: EndpointPool = None,
+    submission_queue: SubmissionQueue = None,
     **kwargs,
 ):
     """Runs a report job and returns a URL to the report artifact.
 
     Args:
-        item_id (str): The portal item ID of the Reporting or Printing item.
+        item_id (str or PreparedTemplate): The portal item ID of the Reporting or
+            Printing item, or a `PreparedTemplate` for one. Pass `culture`, `dpi` and
+            `result_file_name` to the template rather than here if it's prepared.
         portal_url (str, optional): The URL of the ArcGIS Portal instance to use.
             Defaults to `https://www.arcgis.com`.
         token (str, optional): The Portal access token to be used to access secured resources.
@@ -153,27 +913,251 @@ async def run(
         dpi (int, optional): The DPI to use when rendering a map print. Defaults to `96`.
         use_polling (bool, optional): When `True`, the job service will be polled periodically
             for results. When `False`, connect to the job service using WebSockets to listen
-            for results. It's recommended to use WebSockets if possible. Defaults to `False`.
+            for results, falling back to polling if a WebSocket can't be used. It's
+            recommended to use WebSockets if possible. Defaults to `False`.
+        polling_strategy (PollingStrategy, optional): Controls how often the job service is
+            polled, and how long to wait for the job whether polling or not.
         result_file_name (str, optional): The desired name of the output file.
+        return_job_result (bool, optional): When `True`, a `JobResult` describing the
+            artifact is returned instead of its URL. Defaults to `False`.
+        progress (callable, optional): Called with a `JobEvent` for each status record
+            the service reports while the job runs, as it arrives. It's called on the
+            event loop, so it shouldn't block.
+        priority (int, optional): The job's place in `submission_queue`. Lower
+            priorities are submitted first. Defaults to `INTERACTIVE`.
+        transport (Transport, optional): The transport used to make HTTP requests.
+            Defaults to a `RequestsTransport` shared by all calls. Pass an
+            `AiohttpTransport` for natively asynchronous requests.
+        instrumentation (Instrumentation, optional): Receives the timings of each stage
+            of the job, and counts of requests, bytes and retries.
+        result_cache (ResultCache, optional): Caches the results of jobs, so an
+            identical job reuses an earlier artifact instead of running again.
+        retry_policy (RetryPolicy, optional): How calls that fail transiently, such as
+            with a server error or a dropped connection, are retried. Defaults to
+            three attempts with exponential backoff.
+        circuit_breaker (CircuitBreaker, optional): Fails the job fast while the
+            reporting service is down, instead of retrying it.
+        journal (TicketJournal, optional): Records the job's ticket. If the journal
+            already has the job, its result is returned, or its ticket waited on,
+            instead of the job being submitted again.
+        endpoints (EndpointPool, optional): Runs the job on one of several instances
+            of the reporting service, instead of the one named by the portal item.
+        submission_queue (SubmissionQueue, optional): Holds the job back from the
+            reporting service until its turn, by `priority` and rate limit.
         **kwargs: Other parameters to pass to the job.
             These are commonly used to parameterize your template.
 
     Returns:
-        A string of the URL to the report artifact.
+        A string of the URL to the report artifact, or a `JobResult` if
+        `return_job_result` is `True`.
     """
 
-    portal_url = portal_url.strip("/")
-    portal_item = get_portal_item(item_id, portal_url, token)
-    service_url = _get_service_url_from_portal_item(portal_item)
+    client = _get_client(
+        portal_url,
+        token,
+        transport,
+        instrumentation,
+        result_cache,
+        retry_policy,
+        circuit_breaker,
+        journal,
+        endpoints,
+        submission_queue,
+    )
+    return await client.run(
+        item_id,
+        culture=culture,
+        dpi=dpi,
+        use_polling=use_polling,
+        polling_strategy=polling_strategy,
+        result_file_name=result_file_name,
+        return_job_result=return_job_result,
+        progress=progress,
+        priority=priority,
+        **kwargs,
+    )
+
+
+async def run_many(  # pylint: disable=too-many-locals
+    item_id,
+    param_sets,
+    *,
+    max_concurrency=4,
+    portal_url="https://www.arcgis.com",
+    token="",
+    culture="",
+    dpi=0,
+    use_polling=False,
+    polling_strategy: PollingStrategy = None,
+    progress=None,
+    priority=BATCH,
+    transport: Transport = None,
+    instrumentation: Instrumentation = None,
+    result_cache: ResultCache = None,
+    retry_policy: RetryPolicy = None,
+    circuit_breaker: CircuitBreaker = None,
+    journal: TicketJournal = None,
+    endpoints: EndpointPool = None,
+    submission_queue: SubmissionQueue = None,
+):
+    """Runs a report job for each set of parameters, yielding results as they complete.
+
+    The portal item is resolved once and shared by every job, as is the reporting
+    token, which is cached until shortly before it expires.
+
+    Args:
+        item_id (str or PreparedTemplate): The portal item ID of the Reporting or
+            Printing item, or a `PreparedTemplate` for one. Preparing a template saves
+            encoding the arguments every job shares once for each job.
+        param_sets (Iterable[dict]): The parameters for each job. These are passed to
+            the job in the same way as the `**kwargs` of `run`. The iterable is consumed
+            lazily, so it can be a generator.
+        max_concurrency (int, optional): The maximum number of jobs that are submitted
+            or awaited at the same time. Defaults to `4`.
+        priority (int, optional): The place of the jobs in `submission_queue`.
+            Defaults to `BATCH`, so jobs from `run` go first.
+        portal_url, token, culture, dpi, use_polling, polling_strategy, progress,
+        transport, instrumentation, result_cache, retry_policy, circuit_breaker,
+        journal, endpoints, submission_queue: See `run`. When polling, every job in
+        the batch is polled from one loop.
+
+    Yields:
+        A `BatchResult` for each job, in the order the jobs complete. A failing job
+        doesn't stop the batch; its error is captured on the result instead.
+    """
 
-    reporting_token = _get_reporting_token_if_needed(
-        token, portal_item, service_url, portal_url
+    client = _get_client(
+        portal_url,
+        token,
+        transport,
+        instrumentation,
+        result_cache,
+        retry_policy,
+        circuit_breaker,
+        journal,
+        endpoints,
+        submission_queue,
+    )
+    results = client.run_many(
+        item_id,
+        param_sets,
+        max_concurrency=max_concurrency,
+        culture=culture,
+        dpi=dpi,
+        use_polling=use_polling,
+        polling_strategy=polling_strategy,
+        progress=progress,
+        priority=priority,
     )
-    template_arg = _build_template_arg(item_id, portal_url, result_file_name)
-    job_args = _build_job_args(template_arg, kwargs, culture, dpi)
-    ticket = _start_job(service_url, job_args, reporting_token)
+    try:
+        async for result in results:
+            yield result
+    finally:
+        # Cancel the batch's outstanding jobs if the caller stops iterating early.
+        await results.aclose()
 
-    if use_polling:
-        return _wait_for_job_result_http(service_url, ticket)
 
-    return await _wait_for_job_result_ws(service_url, ticket)
+async def run_chunked(  # pylint: disable=too-many-locals
+    item_id,
+    chunk_parameter: str,
+    *,
+    chunk_size=1000,
+    max_concurrency=4,
+    portal_url="https://www.arcgis.com",
+    token="",
+    culture="",
+    dpi=0,
+    use_polling=False,
+    polling_strategy: PollingStrategy = None,
+    return_job_result=False,
+    progress=None,
+    priority=BATCH,
+    transport: Transport = None,
+    instrumentation: Instrumentation = None,
+    result_cache: ResultCache = None,
+    retry_policy: RetryPolicy = None,
+    circuit_breaker: CircuitBreaker = None,
+    journal: TicketJournal = None,
+    endpoints: EndpointPool = None,
+    submission_queue: SubmissionQueue = None,
+    **kwargs,
+) -> list:
+    """Runs a report whose multi-value parameter is too large for one job.
+
+    The values of `chunk_parameter` are split into chunks of `chunk_size`, and a job is
+    run for each chunk, `max_concurrency` at a time. Every job gets the same other
+    parameters. Wall-clock time then scales with the number of chunks divided by
+    `max_concurrency`, rather than with the number of values.
+
+    Args:
+        item_id (str or PreparedTemplate): The portal item ID of the Reporting or
+            Printing item, or a `PreparedTemplate` for one.
+        chunk_parameter (str): The name of the parameter in `kwargs` to split. Its value
+            must be a list or tuple.
+        chunk_size (int, optional): The maximum number of values in each job.
+            Defaults to `1000`.
+        max_concurrency (int, optional): The maximum number of jobs that are submitted
+            or awaited at the same time. Defaults to `4`.
+        priority (int, optional): The place of the jobs in `submission_queue`.
+            Defaults to `BATCH`.
+        portal_url, token, culture, dpi, use_polling, polling_strategy,
+        return_job_result, progress, transport, instrumentation, result_cache,
+        retry_policy, circuit_breaker, journal, endpoints, submission_queue:
+            See `run`.
+        **kwargs: Other parameters to pass to every job, including `chunk_parameter`.
+
+    Returns:
+        A list of the URLs to each chunk's artifact, or their `JobResult` objects if
+        `return_job_result` is `True`, in the order of the values. Pass it to
+        `download_merged` to combine PDF artifacts into one file. If a chunk fails,
+        the other chunks are cancelled and its error is raised.
+    """
+
+    client = _get_client(
+        portal_url,
+        token,
+        transport,
+        instrumentation,
+        result_cache,
+        retry_policy,
+        circuit_breaker,
+        journal,
+        endpoints,
+        submission_queue,
+    )
+    return await client.run_chunked(
+        item_id,
+        chunk_parameter,
+        chunk_size=chunk_size,
+        max_concurrency=max_concurrency,
+        culture=culture,
+        dpi=dpi,
+        use_polling=use_polling,
+        polling_strategy=polling_strategy,
+        return_job_result=return_job_result,
+        progress=progress,
+        priority=priority,
+        **kwargs,
+    )
+
+
+async def prewarm(
+    *item_ids: str,
+    portal_url="https://www.arcgis.com",
+    token="",
+    transport: Transport = None,
+    endpoints: EndpointPool = None,
+):
+    """Looks up the portal items of reports ahead of their first job.
+
+    Later calls to `run`, `run_many` and `run_chunked` with the same `portal_url`,
+    `token` and `transport` reuse the portal items and reporting tokens, and the
+    connections opened for them. See `ReportingClient.prewarm`.
+
+    Args:
+        *item_ids (str): The portal item IDs of the Reporting or Printing items.
+        portal_url, token, transport, endpoints: See `run`.
+    """
+
+    client = _get_client(portal_url, token, transport, endpoints=endpoints)
+    await client.prewarm(*item_ids)
@@ -0,0 +1,274 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from .cache import TTLCache
+from .job_status import JobResult
+
+# In-flight jobs started through a result cache, per event loop.
+_in_flight = weakref.WeakKeyDictionary()
+
+
+def get_result_key(service_url: str, job_args: dict, token="") -> str:
+    """Return a canonical hash of a job's arguments, to cache its result under.
+
+    Parameters are sorted by name, so the order they were passed in doesn't matter.
+    The portal token is included because the artifact may depend on who can see what.
+    """
+
+    job_args = dict(
+        job_args,
+        parameters=sorted(job_args.get("parameters", []), key=lambda x: x["name"]),
+    )
+    canonical = json.dumps(
+        [service_url, job_args, hashlib.sha256(token.encode()).hexdigest()],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """The interface used to cache the results of report jobs.
+
+    Identical jobs are served from the cache rather than being rerun. Pass a cache
+    to `ReportingClient` or `run` to opt in. Concurrent identical jobs also share a
+    single job on the service while it runs.
+
+    Attributes:
+        hits (int): The number of lookups that found a result.
+        misses (int): The number of lookups that found no result, or an expired one.
+    """
+
+    hits = 0
+    misses = 0
+
+    def get(self, key: str) -> JobResult:
+        """Return the result cached for `key`, or `None`."""
+        raise NotImplementedError()
+
+    def set(self, key: str, job_result: JobResult):
+        """Cache the result of a job."""
+        raise NotImplementedError()
+
+    def clear(self):
+        """Remove every result."""
+        raise NotImplementedError()
+
+    async def run_in_executor(self, func, *args):
+        """Call one of the cache's methods, returning its result.
+
+        Caches that read or write files override this to make the call on a thread,
+        so the event loop isn't blocked.
+        """
+
+        return func(*args)
+
+
+class MemoryResultCache(ResultCache):
+    """Caches the results of report jobs in memory.
+
+    Args:
+        max_size (int, optional): The maximum number of results. Defaults to `256`.
+        ttl (float, optional): The number of seconds results are reused for. Keep this
+            shorter than the time the service keeps artifacts for. Defaults to `300`.
+    """
+
+    def __init__(self, *, max_size=256, ttl=300.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    @property
+    def hits(self) -> int:
+        """The number of lookups that found a result."""
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        """The number of lookups that found no result, or an expired one."""
+        return self._cache.misses
+
+    def get(self, key: str) -> JobResult:
+        return self._cache.get(key)
+
+    def set(self, key: str, job_result: JobResult):
+        self._cache.set(key, job_result)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DiskResultCache(ResultCache):  # pylint: disable=too-many-instance-attributes
+    """Caches the results of report jobs as files, so they're shared between processes.
+
+    Each result is a small JSON file in `directory`. Once there are more than
+    `max_size` of them, the least recently written files are removed until a tenth of
+    the space is free again, so the directory is only scanned once in a while.
+    Clients read and write the files on a thread, through `run_in_executor`.
+
+    Args:
+        directory (str): The directory to keep the results in. Created if needed.
+        max_size (int, optional): The maximum number of results. Defaults to `1024`.
+        ttl (float, optional): The number of seconds results are reused for.
+            Defaults to `300`.
+    """
+
+    def __init__(self, directory: str, *, max_size=1024, ttl=300.0):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # The number of results in the directory, as far as this instance knows.
+        # It's corrected each time results are evicted.
+        self._size = len(self._scan())
+
+    @property
+    def hits(self) -> int:
+        """The number of lookups that found a result."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """The number of lookups that found no result, or an expired one."""
+        return self._misses
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _scan(self) -> list:
+        return [x for x in os.scandir(self.directory) if x.name.endswith(".json")]
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._size -= 1
+
+    def _read(self, key: str) -> JobResult:
+        path = self._get_path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                entry = json.load(file)
+            if entry["expires"] > time.time():
+                return JobResult.from_dict(entry["result"])
+        except FileNotFoundError:
+            return None
+        except (KeyError, TypeError, ValueError):
+            # A corrupt entry is treated as expired.
+            pass
+
+        self._remove(path)
+        return None
+
+    def get(self, key: str) -> JobResult:
+        job_result = self._read(key)
+        with self._lock:
+            if job_result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return job_result
+
+    def set(self, key: str, job_result: JobResult):
+        if self.ttl <= 0:
+            return
+
+        entry = {"expires": time.time() + self.ttl, "result": job_result.to_dict()}
+        # Write to a temporary file first so readers never see a partial entry.
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        path = self._get_path(key)
+        is_new = not os.path.exists(path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._size += is_new
+            is_full = self._size > self.max_size
+        if is_full:
+            self._evict()
+
+    def _evict(self):
+        entries = self._scan()
+        with self._lock:
+            self._size = len(entries)
+        if len(entries) <= self.max_size:
+            # Other processes have removed results since the last scan.
+            return
+
+        entries.sort(key=lambda x: x.stat().st_mtime)
+        for entry in entries[: len(entries) - self.max_size + self.max_size // 10]:
+            self._remove(entry.path)
+
+    def clear(self):
+        for entry in self._scan():
+            self._remove(entry.path)
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+
+    async def run_in_executor(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+class _SharedJob:  # pylint: disable=too-few-public-methods
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+async def _run_and_cache(cache: ResultCache, key: str, run_job) -> JobResult:
+    job_result = await run_job()
+    if job_result:
+        await cache.run_in_executor(cache.set, key, job_result)
+    return job_result
+
+
+async def get_or_run(cache: ResultCache, key: str, run_job) -> JobResult:
+    """Return the cached result for `key`, or run the job if there isn't one.
+
+    A job that is already running for `key` is shared rather than started again. It's
+    cancelled once every caller waiting on it has been cancelled.
+
+    Args:
+        cache (ResultCache): The cache to use.
+        key (str): The key returned by `get_result_key`.
+        run_job (callable): Returns a coroutine that runs the job.
+    """
+
+    job_result = await cache.run_in_executor(cache.get, key)
+    if job_result is not None:
+        return job_result
+
+    loop_jobs = _in_flight.setdefault(asyncio.get_event_loop(), {})
+    shared_job = loop_jobs.get((cache, key))
+    if shared_job is None:
+        shared_job = _SharedJob(
+            asyncio.ensure_future(_run_and_cache(cache, key, run_job))
+        )
+        loop_jobs[(cache, key)] = shared_job
+        shared_job.future.add_done_callback(lambda _: loop_jobs.pop((cache, key), None))
+
+    shared_job.waiters += 1
+    try:
+        # Shield the shared job so one cancelled caller doesn't cancel the others.
+        return await asyncio.shield(shared_job.future)
+    finally:
+        shared_job.waiters -= 1
+        if not shared_job.waiters and not shared_job.future.done():
+            # Nobody is waiting on the job any more, so stop it.
+            shared_job.future.cancel()
+            loop_jobs.pop((cache, key), None)
@@ -0,0 +1,239 @@
+import asyncio
+import random
+import threading
+import time
+
+from .instrumentation import Instrumentation
+from .polling import JobTimeoutError
+from .transport import is_transient_error
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a reporting service whose circuit breaker is open.
+
+    Attributes:
+        service_url (str): The URL of the failing reporting service.
+        retry_after (float): The number of seconds until a call is let through again.
+    """
+
+    def __init__(self, service_url: str, retry_after: float):
+        super().__init__(
+            f"The reporting service at {service_url} is failing. Calls resume in {retry_after:.1f} seconds."  # pylint: disable=line-too-long
+        )
+        self.service_url = service_url
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """Controls how calls to the reporting service that fail transiently are retried.
+
+    Server errors, rate limiting, connection resets and dropped WebSockets are
+    retried, waiting `initial_delay` before the first retry and growing by
+    `multiplier` after each, up to `max_delay`. Errors that won't go away on their
+    own, such as a rejected request or a failed job, are raised immediately.
+
+    Submitting a job is retried by sending it again. Once the service has issued a
+    ticket, waiting for the job is retried by waiting on the same ticket, so the
+    job is never run twice because the connection dropped while waiting.
+
+    Args:
+        max_attempts (int, optional): The number of times a call is tried, including
+            the first. Pass `1` to disable retries. Defaults to `3`.
+        initial_delay (float, optional): Seconds to wait before the first retry.
+            Defaults to `0.5`.
+        multiplier (float, optional): The factor the delay grows by after each retry.
+            Defaults to `2`.
+        max_delay (float, optional): The longest delay between retries, in seconds.
+            Defaults to `10`.
+        jitter (float, optional): The fraction each delay is randomly varied by, so
+            that a batch of jobs doesn't retry in lockstep. Defaults to `0.1`.
+        retry_on (callable, optional): Returns whether an error may succeed if
+            retried. Defaults to `is_transient_error`.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        max_attempts=3,
+        initial_delay=0.5,
+        multiplier=2.0,
+        max_delay=10.0,
+        jitter=0.1,
+        retry_on=is_transient_error,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1.")
+        if initial_delay < 0 or max_delay < initial_delay:
+            raise ValueError(
+                "initial_delay must not be negative or more than max_delay."
+            )
+        if multiplier < 1:
+            raise ValueError("multiplier must be at least 1.")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be at least 0 and less than 1.")
+
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def delay(self, attempt: int) -> float:
+        """Return the number of seconds to wait after the given (one-based) attempt."""
+
+        delay = min(
+            self.initial_delay * self.multiplier ** (attempt - 1), self.max_delay
+        )
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return delay
+
+    def is_service_failure(self, error: Exception) -> bool:
+        """Return whether `error` means the service failed, rather than the request."""
+
+        # A job that runs too long won't finish any sooner for being waited on again.
+        if isinstance(error, (CircuitOpenError, JobTimeoutError)):
+            return False
+        return self.retry_on(error)
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """Return whether to retry a call that failed with `error` on `attempt`."""
+        return attempt < self.max_attempts and self.is_service_failure(error)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class _Circuit:  # pylint: disable=too-few-public-methods
+    __slots__ = ("failures", "opened_at")
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+
+
+class CircuitBreaker:
+    """Fails fast while a reporting service is down, rather than waiting on each call.
+
+    Failures are counted for each service. Once `failure_threshold` calls to a
+    service fail in a row, its circuit opens, and calls to it raise
+    `CircuitOpenError` without being sent. After `reset_timeout` seconds one call is
+    let through as a trial. If it succeeds the circuit closes, otherwise it stays
+    open for another `reset_timeout`.
+
+    Only the failures a `RetryPolicy` would retry are counted. Share a breaker
+    between clients for them to share its state; it's safe to use from many threads.
+
+    Args:
+        failure_threshold (int, optional): The number of consecutive failures that
+            open the circuit. Defaults to `5`.
+        reset_timeout (float, optional): The number of seconds the circuit stays
+            open before a trial call. Defaults to `30`.
+    """
+
+    def __init__(self, *, failure_threshold=5, reset_timeout=30.0):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1.")
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def is_open(self, service_url: str) -> bool:
+        """Return whether calls to `service_url` are currently failing fast."""
+
+        with self._lock:
+            circuit = self._circuits.get(service_url)
+            return circuit is not None and circuit.opened_at is not None
+
+    def before_call(self, service_url: str):
+        """Raise `CircuitOpenError` if calls to `service_url` should fail fast."""
+
+        with self._lock:
+            circuit = self._circuits.get(service_url)
+            if circuit is None or circuit.opened_at is None:
+                return
+
+            now = time.monotonic()
+            retry_after = circuit.opened_at + self.reset_timeout - now
+            if retry_after > 0:
+                raise CircuitOpenError(service_url, retry_after)
+
+            # Let this call through as the trial, and keep failing the others fast.
+            # A trial that never finishes is replaced after another reset_timeout.
+            circuit.opened_at = now
+
+    def record_success(self, service_url: str):
+        """Close the circuit for `service_url`."""
+
+        with self._lock:
+            self._circuits.pop(service_url, None)
+
+    def record_failure(self, service_url: str):
+        """Count a failed call to `service_url`, opening its circuit if needed."""
+
+        with self._lock:
+            circuit = self._circuits.setdefault(service_url, _Circuit())
+            circuit.failures += 1
+            if (
+                circuit.opened_at is not None
+                or circuit.failures >= self.failure_threshold
+            ):
+                circuit.opened_at = time.monotonic()
+
+    def reset(self):
+        """Close every circuit."""
+
+        with self._lock:
+            self._circuits.clear()
+
+
+async def call_with_retry(  # pylint: disable=too-many-arguments
+    call,
+    policy: RetryPolicy,
+    *,
+    stage: str,
+    service_url: str = "",
+    circuit_breaker: CircuitBreaker = None,
+    instrumentation: Instrumentation = None,
+):
+    """Await `call()` until it succeeds, retrying transient failures with backoff.
+
+    Args:
+        call (callable): Returns a new awaitable for each attempt.
+        policy (RetryPolicy): How to retry.
+        stage (str): The stage reported to `instrumentation` when retrying.
+        service_url (str, optional): The service the call is made to, which
+            `circuit_breaker` tracks.
+        circuit_breaker (CircuitBreaker, optional): Fails fast while the service is down.
+        instrumentation (Instrumentation, optional): Told about each retry.
+    """
+
+    attempt = 1
+    while True:
+        if circuit_breaker is not None:
+            circuit_breaker.before_call(service_url)
+
+        try:
+            result = await call()
+        except Exception as error:  # pylint: disable=broad-except
+            if circuit_breaker is not None:
+                if policy.is_service_failure(error):
+                    circuit_breaker.record_failure(service_url)
+                elif not isinstance(error, CircuitOpenError):
+                    # The service answered, even if it was to reject the call.
+                    circuit_breaker.record_success(service_url)
+
+            if not policy.should_retry(error, attempt):
+                raise
+            if instrumentation is not None:
+                instrumentation.retried(stage, attempt, error)
+        else:
+            if circuit_breaker is not None:
+                circuit_breaker.record_success(service_url)
+            return result
+
+        await asyncio.sleep(policy.delay(attempt))
+        attempt += 1
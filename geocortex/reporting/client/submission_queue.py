@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import itertools
+
+# Priority classes. Jobs with a lower priority are submitted first.
+INTERACTIVE = 0
+BATCH = 10
+
+
+class _ServiceQueue:  # pylint: disable=too-few-public-methods
+    __slots__ = ("waiters", "outstanding", "tokens", "updated", "timer")
+
+    def __init__(self, tokens: float, now: float):
+        # A heap of (priority, sequence, future), so ties are first come, first served.
+        self.waiters = []
+        self.outstanding = 0
+        self.tokens = tokens
+        self.updated = now
+        self.timer = None
+
+
+class SubmissionQueue:
+    """Holds jobs back from a reporting service, submitting them in priority order.
+
+    Each reporting service gets a queue of its own. A job leaves the queue once no
+    job with a lower priority is waiting ahead of it, the service has fewer than
+    `max_outstanding` jobs in flight, and the service's token bucket has a token.
+    The bucket fills at `rate` tokens a second, up to `burst` tokens. A job stays in
+    flight until it finishes, fails or is cancelled.
+
+    Jobs with a lower priority always go first, so interactive jobs skip ahead of a
+    batch, which gets the capacity left over. `run` defaults to `INTERACTIVE` and
+    `run_many` and `run_chunked` to `BATCH`. Any integer can be used as a priority.
+
+    Share a queue between the clients that use the same services. Its state is bound
+    to the event loop it's first used on.
+
+    Args:
+        rate (float, optional): The number of jobs submitted to each service per second.
+            Defaults to `None`, which doesn't limit the rate.
+        burst (int, optional): The number of jobs that may be submitted to a service at
+            once after it has been idle. Defaults to `1`.
+        max_outstanding (int, optional): The maximum number of jobs in flight on each
+            service. Defaults to `None`, which doesn't limit them.
+    """
+
+    def __init__(self, *, rate: float = None, burst=1, max_outstanding: int = None):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        if max_outstanding is not None and max_outstanding < 1:
+            raise ValueError("max_outstanding must be at least 1.")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_outstanding = max_outstanding
+        self._queues = {}
+        self._sequence = itertools.count()
+
+    def _get_queue(self, service_url: str) -> _ServiceQueue:
+        queue = self._queues.get(service_url)
+        if queue is None:
+            now = asyncio.get_event_loop().time()
+            queue = self._queues[service_url] = _ServiceQueue(self.burst, now)
+        return queue
+
+    def queued(self, service_url: str) -> int:
+        """Return the number of jobs waiting to be submitted to `service_url`."""
+
+        queue = self._queues.get(service_url)
+        return 0 if queue is None else sum(not x[2].done() for x in queue.waiters)
+
+    def outstanding(self, service_url: str) -> int:
+        """Return the number of jobs in flight on `service_url`."""
+
+        queue = self._queues.get(service_url)
+        return 0 if queue is None else queue.outstanding
+
+    async def acquire(self, service_url: str, priority=INTERACTIVE):
+        """Wait until a job may be submitted to `service_url`.
+
+        Call `release` once the job is done, whether or not it succeeded.
+        """
+
+        queue = self._get_queue(service_url)
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(queue.waiters, (priority, next(self._sequence), future))
+        self._dispatch(service_url)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The job was let through just as it was cancelled.
+                self.release(service_url)
+            else:
+                future.cancel()
+                self._dispatch(service_url)
+            raise
+
+    def release(self, service_url: str):
+        """Count a job on `service_url` as done, letting the next one through."""
+
+        queue = self._queues[service_url]
+        queue.outstanding -= 1
+        self._dispatch(service_url)
+
+    def _refill(self, queue: _ServiceQueue, now: float):
+        if self.rate is not None:
+            elapsed = now - queue.updated
+            queue.tokens = min(self.burst, queue.tokens + elapsed * self.rate)
+        queue.updated = now
+
+    def _dispatch(self, service_url: str):
+        queue = self._queues[service_url]
+        loop = asyncio.get_event_loop()
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        self._refill(queue, loop.time())
+
+        while queue.waiters:
+            future = queue.waiters[0][2]
+            if future.done():
+                # Its caller was cancelled.
+                heapq.heappop(queue.waiters)
+                continue
+
+            if (
+                self.max_outstanding is not None
+                and queue.outstanding >= self.max_outstanding
+            ):
+                # Released jobs dispatch again.
+                return
+
+            if self.rate is not None and queue.tokens < 1:
+                delay = (1 - queue.tokens) / self.rate
+                queue.timer = loop.call_later(delay, self._dispatch, service_url)
+                return
+
+            heapq.heappop(queue.waiters)
+            if self.rate is not None:
+                queue.tokens -= 1
+            queue.outstanding += 1
+            future.set_result(None)
@@ -0,0 +1,350 @@
+import asyncio
+import functools
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from websockets.exceptions import ConnectionClosed, InvalidStatusCode
+
+from .json_codec import dumps, loads
+
+# The number of connections kept open to each host.
+DEFAULT_POOL_SIZE = 10
+
+# The number of seconds to wait for a response.
+DEFAULT_TIMEOUT = 60
+
+
+class HTTPStatusError(Exception):
+    """Raised by a transport when a request returns an error status code."""
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"{status} Error for url: {url}")
+        self.status = status
+        self.url = url
+
+
+def _raise_for_status(status: int, url: str):
+    if status >= 400:
+        raise HTTPStatusError(status, url)
+
+
+def _json_headers(headers: dict) -> dict:
+    return {"Content-Type": "application/json", **(headers or {})}
+
+
+# The HTTP libraries are slow to import, so each is only imported by the transport
+# that uses it, when the transport is created.
+
+
+def _import_requests():
+    # pylint: disable=import-outside-toplevel
+    import requests
+    import requests.adapters
+
+    return requests
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp  # pylint: disable=import-outside-toplevel
+    except ImportError as error:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "AiohttpTransport requires the 'aiohttp' package to be installed."
+        ) from error
+    return aiohttp
+
+
+# Statuses that indicate the request may succeed if it's tried again.
+TRANSIENT_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Return whether a request that failed with `error` may succeed if retried."""
+
+    if isinstance(error, HTTPStatusError):
+        return error.status in TRANSIENT_STATUSES
+
+    # An error can't come from a library that hasn't been imported.
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(error, requests.RequestException):
+        return isinstance(
+            error,
+            (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ),
+        )
+
+    if isinstance(error, InvalidStatusCode):
+        return error.status_code in TRANSIENT_STATUSES
+
+    # A WebSocket dropped before the job's result arrived.
+    if isinstance(error, ConnectionClosed):
+        return True
+
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+
+    aiohttp = sys.modules.get("aiohttp")
+    return aiohttp is not None and isinstance(
+        error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+    )
+
+
+class StreamedResponse:
+    """A response whose body is read incrementally rather than all at once.
+
+    Use it as an async context manager to make sure the connection is released.
+
+    Attributes:
+        status (int): The response's status code.
+        headers (Mapping[str, str]): The response's headers. Lookups are case-insensitive.
+    """
+
+    def __init__(self, status: int, headers):
+        self.status = status
+        self.headers = headers
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def iter_chunks(self, chunk_size: int):
+        """Iterate asynchronously over the body, in chunks of at most `chunk_size` bytes."""
+        raise NotImplementedError()
+
+    async def close(self):
+        """Release the connection used by the response."""
+
+
+class Transport:
+    """The interface used to make the HTTP requests needed to run a job.
+
+    Implementations must not block the event loop while waiting on the network.
+    """
+
+    async def get_json(self, url: str, *, headers: dict = None) -> dict:
+        """Send a GET request and return the decoded JSON response."""
+        raise NotImplementedError()
+
+    async def post_json(self, url: str, payload: dict, *, headers: dict = None) -> dict:
+        """Send a POST request with a JSON body and return the decoded JSON response."""
+        raise NotImplementedError()
+
+    async def stream(self, url: str, *, headers: dict = None) -> StreamedResponse:
+        """Send a GET request and return the response without reading its body."""
+        raise NotImplementedError()
+
+    async def close(self):
+        """Release any resources held by the transport."""
+
+
+class _RequestsStreamedResponse(StreamedResponse):
+    def __init__(self, response, run_in_executor):
+        super().__init__(response.status_code, response.headers)
+        self._response = response
+        self._run_in_executor = run_in_executor
+
+    async def iter_chunks(self, chunk_size: int):
+        chunks = self._response.iter_content(chunk_size)
+        while True:
+            # Each read blocks, so is run in the transport's executor.
+            chunk = await self._run_in_executor(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def close(self):
+        self._response.close()
+
+
+class RequestsTransport(Transport):
+    """A transport built on `requests`.
+
+    Requests share a session, so connections to each host are kept alive and reused.
+    The blocking calls are run in an executor so they don't stall the event loop.
+    The synchronous `request_json` method can be used directly from non-async code.
+
+    Args:
+        pool_size (int, optional): The number of connections kept open to each host.
+            This is also the number of threads used to make requests when `executor`
+            isn't provided. Defaults to `10`.
+        timeout (float or tuple, optional): The number of seconds to wait for a response,
+            or a `(connect, read)` tuple. Defaults to `60`.
+        executor (concurrent.futures.Executor, optional): The executor to run requests in.
+    """
+
+    def __init__(
+        self, *, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, executor=None
+    ):
+        self.timeout = timeout
+        self._pool_size = pool_size
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = threading.Lock()
+
+        requests = _import_requests()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._pool_size,
+                    thread_name_prefix="geocortex-reporting",
+                )
+            return self._executor
+
+    def request_json(
+        self, method: str, url: str, *, headers: dict = None, payload: dict = None
+    ) -> dict:
+        """Send a request, blocking until the JSON response has been decoded."""
+
+        if payload is not None:
+            # Encoded here rather than by requests, to use the faster encoder.
+            headers = _json_headers(headers)
+            payload = dumps(payload)
+
+        response = self._session.request(
+            method, url, headers=headers, data=payload, timeout=self.timeout
+        )
+        _raise_for_status(response.status_code, url)
+        return loads(response.content)
+
+    async def _run_in_executor(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        call = functools.partial(func, *args, **kwargs)
+        return await loop.run_in_executor(self._get_executor(), call)
+
+    async def _run(self, method: str, url: str, headers: dict, payload: dict) -> dict:
+        return await self._run_in_executor(
+            self.request_json, method, url, headers=headers, payload=payload
+        )
+
+    async def get_json(self, url: str, *, headers: dict = None) -> dict:
+        return await self._run("GET", url, headers, None)
+
+    async def post_json(self, url: str, payload: dict, *, headers: dict = None) -> dict:
+        return await self._run("POST", url, headers, payload)
+
+    async def stream(self, url: str, *, headers: dict = None) -> StreamedResponse:
+        response = await self._run_in_executor(
+            self._session.get, url, headers=headers, stream=True, timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            response.close()
+            _raise_for_status(response.status_code, url)
+
+        return _RequestsStreamedResponse(response, self._run_in_executor)
+
+    def close_sync(self):
+        """Close the session's connections, blocking until done."""
+
+        self._session.close()
+        with self._executor_lock:
+            if self._owns_executor and self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    async def close(self):
+        self.close_sync()
+
+
+class _AiohttpStreamedResponse(StreamedResponse):
+    def __init__(self, response):
+        super().__init__(response.status, response.headers)
+        self._response = response
+
+    async def iter_chunks(self, chunk_size: int):
+        async for chunk in self._response.content.iter_chunked(chunk_size):
+            yield chunk
+
+    async def close(self):
+        self._response.release()
+
+
+class AiohttpTransport(Transport):
+    """A natively asynchronous transport built on `aiohttp`.
+
+    Requires the `aiohttp` extra: `pip install geocortex-reporting-client[aiohttp]`.
+
+    Args:
+        session (aiohttp.ClientSession, optional): An existing session to use. When not
+            provided a session is created on first use and closed by `close()`.
+        pool_size (int, optional): The number of connections kept open to each host.
+            Ignored if `session` is provided. Defaults to `10`.
+        timeout (float, optional): The number of seconds to wait for a response.
+            Ignored if `session` is provided. Defaults to `60`.
+    """
+
+    def __init__(
+        self, session=None, *, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT
+    ):
+        self._aiohttp = _import_aiohttp()
+        self.timeout = timeout
+        self._pool_size = pool_size
+        self._session = session
+        self._owns_session = session is None
+
+    def _get_session(self):
+        if self._session is None:
+            # Sessions are bound to an event loop, so are created on first use.
+            aiohttp = self._aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=self._pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        async with self._get_session().request(method, url, **kwargs) as response:
+            _raise_for_status(response.status, url)
+            return loads(await response.read())
+
+    async def get_json(self, url: str, *, headers: dict = None) -> dict:
+        return await self._request("GET", url, headers=headers)
+
+    async def post_json(self, url: str, payload: dict, *, headers: dict = None) -> dict:
+        return await self._request(
+            "POST", url, headers=_json_headers(headers), data=dumps(payload)
+        )
+
+    async def stream(self, url: str, *, headers: dict = None) -> StreamedResponse:
+        # The timeout applies to reading the whole body, so isn't used for streams.
+        response = await self._get_session().get(
+            url, headers=headers, timeout=self._aiohttp.ClientTimeout(total=None)
+        )
+        if response.status >= 400:
+            response.release()
+            _raise_for_status(response.status, url)
+
+        return _AiohttpStreamedResponse(response)
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_default_transport = None  # pylint: disable=invalid-name
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> RequestsTransport:
+    """Return the transport shared by calls that don't provide one."""
+
+    global _default_transport  # pylint: disable=global-statement
+
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = RequestsTransport()
+        return _default_transport
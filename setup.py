@@ -22,7 +22,11 @@ VERSION = "2.0.0"
 REQUIRED = ["requests>=2.24.0,<3", "websockets>=9.1,<10"]
 
 # These packages are optional
-DEV_EXTRAS = ["aiounittest>=1.4.0,<2", "black>=19.10b", "pylint>=2.5.3,<3", "responses>=0.10.16,<0.11"]
+AIOHTTP_EXTRAS = ["aiohttp>=3.7,<4"]
+OPENTELEMETRY_EXTRAS = ["opentelemetry-api>=1.0,<2"]
+PDF_EXTRAS = ["pypdf>=3.1,<6"]
+JSON_EXTRAS = ["orjson>=3.4,<4"]
+DEV_EXTRAS = ["aiounittest>=1.4.0,<2", "black>=19.10b", "pylint>=2.5.3,<3", "responses>=0.10.16,<0.11"] + AIOHTTP_EXTRAS
 
 here = os.path.abspath(os.path.dirname(__file__))
 
@@ -56,8 +60,17 @@ setup(
     python_requires=REQUIRES_PYTHON,
     url=URL,
     packages=["geocortex.reporting.client"],
+    entry_points={
+        "console_scripts": ["vertigis-report=geocortex.reporting.client.cli:main"],
+    },
     install_requires=REQUIRED,
-    extras_require={"dev": DEV_EXTRAS},
+    extras_require={
+        "aiohttp": AIOHTTP_EXTRAS,
+        "opentelemetry": OPENTELEMETRY_EXTRAS,
+        "pdf": PDF_EXTRAS,
+        "json": JSON_EXTRAS,
+        "dev": DEV_EXTRAS,
+    },
     include_package_data=True,
     classifiers=[
         # Trove classifiers
@@ -0,0 +1,139 @@
+# pylint: disable=line-too-long,missing-class-docstring,abstract-method,too-many-instance-attributes,unused-argument
+
+import asyncio
+
+from geocortex.reporting.client import StreamedResponse, Transport
+from geocortex.reporting.client.json_codec import dumps, loads
+
+REPORTING_URL = "https://fake/reporting"
+FINISHED = [{"$type": "JobResult", "tag": "tag"}, {"$type": "JobQuit", "kind": "Run"}]
+FAILED = [{"$type": "JobQuit", "kind": "Run"}]
+
+
+class FakeResponse(StreamedResponse):
+    def __init__(self, status, headers, body):
+        super().__init__(status, headers)
+        self.body = body
+
+    async def iter_chunks(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start : start + chunk_size]
+
+
+class FakeTransport(Transport):
+    """Answers as a portal and its reporting service would, recording what was asked.
+
+    Jobs are issued numbered tickets and finish with an artifact on their
+    `polls_needed`th poll. Override `get_ticket` and `get_results` to change how
+    jobs run, `get_poll_delay` to change how long polls take, or the request methods to change how the services answer.
+
+    Args:
+        access: The access of the portal item. The portal token of a private item is
+            exchanged for a reporting token.
+        reporting_url: The reporting service the portal item points to.
+        polls_needed: How many times a job is polled before it finishes, or None for
+            jobs that never finish.
+        poll_delay: The seconds each poll of a job takes.
+        failing_tickets: The tickets of the jobs that finish without an artifact.
+        result: Fields added to the `JobResult` record of finished jobs.
+        submit_errors: Errors raised by the first job submissions, in order.
+        poll_errors: Errors raised by the first polls, in order.
+        token_expires_in: The `expiresIn` of the reporting tokens, if any.
+        artifact: The body of each downloaded artifact.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        access="public",
+        reporting_url=REPORTING_URL,
+        polls_needed=1,
+        poll_delay=0,
+        failing_tickets=(),
+        result=None,
+        submit_errors=(),
+        poll_errors=(),
+        token_expires_in=None,
+        artifact=b"",
+    ):
+        self.access = access
+        self.reporting_url = reporting_url
+        self.polls_needed = polls_needed
+        self.poll_delay = poll_delay
+        self.failing_tickets = set(failing_tickets)
+        self.result = result or {}
+        self.submit_errors = list(submit_errors)
+        self.poll_errors = list(poll_errors)
+        self.token_expires_in = token_expires_in
+        self.artifact = artifact
+        # The method and URL of each request, in order.
+        self.requests = []
+        # The JSON payload and the parameters of each submitted job.
+        self.payloads = []
+        self.submitted = []
+        # The tickets polled, in order, and the number of polls of each.
+        self.polled_tickets = []
+        self.polls = {}
+        self.running = 0
+        self.max_running = 0
+        self.token_exchanges = 0
+        self.closed = False
+
+    def get_ticket(self, parameters: dict) -> str:
+        """Return the ticket of a newly submitted job."""
+
+        return f"ticket{len(self.submitted)}"
+
+    def get_results(self, ticket: str, polls: int) -> list:
+        """Return the records of a job that has been polled `polls` times."""
+
+        if self.polls_needed is None or polls < self.polls_needed:
+            return []
+        if ticket in self.failing_tickets:
+            return FAILED
+        return [{**FINISHED[0], **self.result}, FINISHED[1]]
+
+    def get_poll_delay(self, ticket: str) -> float:
+        """Return the seconds a poll of a job takes."""
+
+        return self.poll_delay
+
+    async def get_json(self, url, *, headers=None):
+        self.requests.append(("GET", url))
+        if "/content/items/" in url:
+            return {"access": self.access, "url": self.reporting_url}
+
+        ticket = url.split("ticket=")[1].split("&")[0]
+        self.polled_tickets.append(ticket)
+        self.polls[ticket] = self.polls.get(ticket, 0) + 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.get_poll_delay(ticket))
+        finally:
+            self.running -= 1
+        if self.poll_errors:
+            raise self.poll_errors.pop(0)
+        return {"results": self.get_results(ticket, self.polls[ticket])}
+
+    async def post_json(self, url, payload, *, headers=None):
+        self.requests.append(("POST", url))
+        if url.endswith("/auth/token/run"):
+            self.token_exchanges += 1
+            response = {"token": f"reporting-token-{self.token_exchanges}"}
+            if self.token_expires_in is not None:
+                response["expiresIn"] = self.token_expires_in
+            return {"response": response}
+
+        if self.submit_errors:
+            raise self.submit_errors.pop(0)
+        self.payloads.append(loads(dumps(payload)))
+        self.submitted.append({x["name"]: x.get("value", x.get("values")) for x in payload["parameters"]})
+        return {"response": {"ticket": self.get_ticket(self.submitted[-1])}}
+
+    async def stream(self, url, *, headers=None):
+        self.requests.append(("GET", url))
+        return FakeResponse(200, {}, self.artifact)
+
+    async def close(self):
+        self.closed = True
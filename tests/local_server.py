@@ -0,0 +1,25 @@
+# pylint: disable=missing-class-docstring
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+
+class LocalServer:
+    def __init__(self, routes):
+        self.routes = routes
+        self.runner = None
+        self.base_url = ""
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.add_routes(self.routes)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        self.base_url = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
@@ -0,0 +1,120 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import base64
+import json
+import time
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import HTTPStatusError, run
+from geocortex.reporting.client.auth import (
+    _get_token_lifetime,
+    get_reporting_token,
+    reporting_token_cache,
+)
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeTransport
+
+SERVICE_URL = "https://apps.vertigisstudio.com/reporting/service"
+PORTAL_URL = "https://www.arcgis.com"
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+MOCK_PORTAL_TOKEN = "mock-portal-token"
+
+
+class AuthTransport(FakeTransport):
+    """Takes a moment to exchange tokens, and rejects the reporting tokens in `rejected_tokens`."""
+
+    def __init__(self, expires_in=None):
+        super().__init__(access="private", reporting_url="https://apps.vertigisstudio.com/reporting", token_expires_in=expires_in)
+        self.rejected_tokens = set()
+        self.job_run_tokens = []
+
+    async def post_json(self, url, payload, *, headers=None):
+        if url.endswith("/auth/token/run"):
+            await asyncio.sleep(0.01)
+        else:
+            token = headers["Authorization"].split(" ")[1]
+            self.job_run_tokens.append(token)
+            if token in self.rejected_tokens:
+                raise HTTPStatusError(401, url)
+        return await super().post_json(url, payload, headers=headers)
+
+
+class TestReportingTokenCache(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        reporting_token_cache.clear()
+
+    async def test_reuses_token(self):
+        transport = AuthTransport()
+
+        await run(MOCK_PORTAL_ITEM_ID, use_polling=True, token=MOCK_PORTAL_TOKEN, transport=transport)
+        await run(MOCK_PORTAL_ITEM_ID, use_polling=True, token=MOCK_PORTAL_TOKEN, transport=transport)
+
+        self.assertEqual(transport.token_exchanges, 1)
+        self.assertEqual(transport.job_run_tokens, ["reporting-token-1", "reporting-token-1"])
+
+    async def test_shares_concurrent_exchange(self):
+        transport = AuthTransport()
+
+        tokens = await asyncio.gather(
+            *(get_reporting_token(transport, SERVICE_URL, PORTAL_URL, MOCK_PORTAL_TOKEN) for _ in range(10))
+        )
+
+        self.assertEqual(set(tokens), {"reporting-token-1"})
+        self.assertEqual(transport.token_exchanges, 1)
+
+    async def test_refreshes_token_before_expiry(self):
+        # The first token expires within the refresh margin, so is refreshed as soon as it is reused.
+        transport = AuthTransport(expires_in=30)
+
+        first = await get_reporting_token(transport, SERVICE_URL, PORTAL_URL, MOCK_PORTAL_TOKEN)
+        second = await get_reporting_token(transport, SERVICE_URL, PORTAL_URL, MOCK_PORTAL_TOKEN)
+        transport.token_expires_in = None
+        await asyncio.sleep(0.05)
+        third = await get_reporting_token(transport, SERVICE_URL, PORTAL_URL, MOCK_PORTAL_TOKEN)
+
+        self.assertEqual((first, second), ("reporting-token-1", "reporting-token-1"))
+        self.assertEqual(third, "reporting-token-2")
+
+    async def test_exchanges_token_again_when_rejected(self):
+        transport = AuthTransport()
+        await get_reporting_token(transport, SERVICE_URL, PORTAL_URL, MOCK_PORTAL_TOKEN)
+        transport.rejected_tokens.add("reporting-token-1")
+
+        report = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, token=MOCK_PORTAL_TOKEN, transport=transport)
+
+        self.assertEqual(report, f"{SERVICE_URL}/job/result?ticket=ticket1&tag=tag")
+        self.assertEqual(transport.job_run_tokens, ["reporting-token-1", "reporting-token-2"])
+        self.assertEqual(transport.token_exchanges, 2)
+
+    async def test_raises_when_new_token_is_rejected(self):
+        transport = AuthTransport()
+        transport.rejected_tokens.update(["reporting-token-1", "reporting-token-2"])
+
+        with self.assertRaises(HTTPStatusError):
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True, token=MOCK_PORTAL_TOKEN, transport=transport)
+
+        self.assertEqual(transport.token_exchanges, 2)
+
+
+class TestTokenLifetime(unittest.TestCase):
+    def test_reads_jwt_expiry(self):
+        claims = base64.urlsafe_b64encode(json.dumps({"exp": time.time() + 600}).encode()).decode().rstrip("=")
+
+        lifetime = _get_token_lifetime({"token": f"header.{claims}.signature"})
+
+        self.assertAlmostEqual(lifetime, 600, delta=5)
+
+    def test_reads_expires_timestamp(self):
+        lifetime = _get_token_lifetime({"token": "token", "expires": (time.time() + 120) * 1000})
+
+        self.assertAlmostEqual(lifetime, 120, delta=5)
+
+    def test_defaults_lifetime(self):
+        self.assertEqual(_get_token_lifetime({"token": "token"}), 30 * 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method,protected-access
+
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import EndpointPool, HTTPStatusError, JobTimeoutError, PollingStrategy, ReportingClient, RetryPolicy, run_many
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+SERVER1 = "https://server1/reporting/service"
+SERVER2 = "https://server2/reporting/service"
+
+
+class EndpointTransport(FakeTransport):
+    """Runs jobs on any server, except those in `down`, which answer with a 503, and
+    those in `stuck`, which never finish them."""
+
+    def __init__(self, down=(), stuck=()):
+        super().__init__()
+        self.down = set(down)
+        self.stuck = set(stuck)
+
+    def servers(self, method):
+        """Return the server of each job request made with `method`."""
+
+        return [url.split("/job/")[0] for x, url in self.requests if x == method and "/job/" in url]
+
+    async def get_json(self, url, *, headers=None):
+        server = url.split("/job/")[0]
+        if server in self.down:
+            raise HTTPStatusError(503, url)
+        if "ticket=health-check" in url:
+            raise HTTPStatusError(404, url)
+        status = await super().get_json(url, headers=headers)
+        return {"results": []} if server in self.stuck else status
+
+    async def post_json(self, url, payload, *, headers=None):
+        if url.split("/job/")[0] in self.down:
+            raise HTTPStatusError(503, url)
+        return await super().post_json(url, payload, headers=headers)
+
+
+class TestEndpointPool(unittest.TestCase):
+    def test_picks_the_least_outstanding_endpoint(self):
+        pool = EndpointPool(["https://server1/reporting", SERVER2])
+
+        first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+        pool.release(first, duration=1)
+        fourth = pool.acquire()
+
+        self.assertEqual(pool.service_urls, [SERVER1, SERVER2])
+        self.assertNotEqual(first, second)
+        self.assertEqual(third, first)
+        # Both endpoints now have one job in flight, so ties take turns.
+        self.assertEqual(fourth, second)
+        self.assertEqual(pool.outstanding(first), 1)
+        self.assertEqual(pool.outstanding(second), 2)
+
+    def test_prefers_the_fastest_endpoint(self):
+        pool = EndpointPool([SERVER1, SERVER2], strategy="latency")
+
+        pool.release(pool.acquire(), duration=3.5)
+        pool.release(pool.acquire(), duration=1)
+
+        self.assertEqual([pool.acquire() for _ in range(3)], [SERVER2, SERVER2, SERVER2])
+        # Once it has enough jobs in flight the slower endpoint is used.
+        self.assertEqual(pool.acquire(), SERVER1)
+
+    def test_does_not_pile_jobs_onto_an_endpoint_that_never_finishes_them(self):
+        pool = EndpointPool([SERVER1, SERVER2], strategy="latency")
+
+        picks = []
+        for _ in range(20):
+            picks.append(pool.acquire())
+            if picks[-1] == SERVER1:
+                pool.release(SERVER1, duration=0.1)
+
+        self.assertLessEqual(picks.count(SERVER2), 1)
+
+    def test_drains_failing_endpoints(self):
+        pool = EndpointPool([SERVER1, SERVER2], unhealthy_threshold=2)
+
+        for _ in range(2):
+            pool.acquire()
+            pool.release(SERVER1, failed=True)
+
+        self.assertFalse(pool.is_healthy(SERVER1))
+        self.assertEqual({pool.acquire() for _ in range(4)}, {SERVER2})
+
+    def test_uses_every_endpoint_when_all_are_drained(self):
+        pool = EndpointPool([SERVER1], unhealthy_threshold=1)
+
+        pool.release(pool.acquire(), failed=True)
+
+        self.assertEqual(pool.acquire(), SERVER1)
+
+    def test_rejects_invalid_options(self):
+        with self.assertRaises(ValueError):
+            EndpointPool([])
+        with self.assertRaises(ValueError):
+            EndpointPool([SERVER1], strategy="random")
+
+
+class TestHealthChecks(aiounittest.AsyncTestCase):
+    async def test_restores_endpoints_that_answer(self):
+        pool = EndpointPool([SERVER1, SERVER2], unhealthy_threshold=1, health_check_interval=60)
+        pool.release(pool.acquire(), failed=True)
+
+        # Not due yet.
+        await pool.check_health(EndpointTransport())
+        self.assertFalse(pool.is_healthy(SERVER1))
+
+        pool._by_url[SERVER1].next_check -= 60
+        await pool.check_health(EndpointTransport(down=[SERVER1]))
+        self.assertFalse(pool.is_healthy(SERVER1))
+
+        pool._by_url[SERVER1].next_check -= 60
+        await pool.check_health(EndpointTransport())
+        self.assertTrue(pool.is_healthy(SERVER1))
+
+
+class TestBalancingJobs(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_spreads_jobs_across_endpoints(self):
+        transport = EndpointTransport()
+        pool = EndpointPool([SERVER1, SERVER2])
+
+        results = [x async for x in run_many(MOCK_PORTAL_ITEM_ID, ({"A": x} for x in range(6)), use_polling=True, transport=transport, endpoints=pool)]
+
+        self.assertTrue(all(x.error is None for x in results))
+        self.assertEqual(set(transport.servers("POST")), {SERVER1, SERVER2})
+        # Each job is waited on at the endpoint that ran it.
+        self.assertEqual(sorted(transport.servers("GET")), sorted(transport.servers("POST")))
+        self.assertEqual(pool.outstanding(SERVER1) + pool.outstanding(SERVER2), 0)
+
+    async def test_routes_around_a_failing_endpoint(self):
+        transport = EndpointTransport(down=[SERVER1])
+        pool = EndpointPool([SERVER1, SERVER2], unhealthy_threshold=1)
+
+        async with ReportingClient(transport=transport, endpoints=pool, retry_policy=RetryPolicy(max_attempts=1)) as client:
+            results = [x async for x in client.run_many(MOCK_PORTAL_ITEM_ID, ({"A": x} for x in range(4)), max_concurrency=1, use_polling=True)]
+
+        self.assertLessEqual(sum(1 for x in results if x.error is not None), 1)
+        self.assertFalse(pool.is_healthy(SERVER1))
+        self.assertEqual(set(transport.servers("POST")), {SERVER2})
+
+    async def test_drains_endpoints_whose_jobs_time_out(self):
+        transport = EndpointTransport(stuck=[SERVER1])
+        pool = EndpointPool([SERVER1, SERVER2], unhealthy_threshold=1)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01, timeout=0.05)
+
+        results = [x async for x in run_many(MOCK_PORTAL_ITEM_ID, ({"A": x} for x in range(4)), max_concurrency=1, use_polling=True, polling_strategy=strategy, transport=transport, endpoints=pool)]
+
+        self.assertEqual([type(x.error) for x in results if x.error], [JobTimeoutError])
+        self.assertFalse(pool.is_healthy(SERVER1))
+        self.assertEqual(pool.outstanding(SERVER1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
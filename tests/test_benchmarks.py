@@ -0,0 +1,36 @@
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+import unittest
+import aiounittest
+
+try:
+    from benchmarks.mock_service import MockReportingService
+    from benchmarks.run import percentile, run_scenario
+except ImportError:
+    MockReportingService = None
+
+
+@unittest.skipIf(MockReportingService is None, "aiohttp is not installed")
+class TestBenchmarks(aiounittest.AsyncTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([3], 0.99), 3)
+
+    async def test_measures_polling_batch(self):
+        async with MockReportingService(job_duration=0.02, secured=True) as service:
+            result = await run_scenario(
+                service, use_polling=True, batch=True, jobs=10, concurrency=5
+            )
+
+        self.assertEqual(result.name, "polling/batch")
+        self.assertEqual((result.jobs, result.errors), (10, []))
+        self.assertEqual(len(result.latencies), 10)
+        self.assertTrue(all(x >= 0.02 for x in result.latencies))
+        self.assertGreater(result.jobs_per_second, 0)
+        self.assertLessEqual(result.http_connections, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,too-few-public-methods
+
+import unittest
+import aiounittest
+import responses
+
+from geocortex.reporting.client import run
+from geocortex.reporting.client.cache import TTLCache
+from geocortex.reporting.client.portal_utils import (
+    invalidate_portal_item,
+    portal_item_cache,
+)
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+MOCK_PORTAL_TOKEN = "mock-portal-token"
+DEFAULT_PORTAL_URL = "https://www.arcgis.com"
+
+
+def add_job_responses(rsps, reporting_url, ticket):
+    rsps.add(
+        responses.POST,
+        f"{reporting_url}/service/job/run",
+        json={"response": {"ticket": ticket}},
+        status=200,
+    )
+    rsps.add(
+        responses.GET,
+        f"{reporting_url}/service/job/artifacts?ticket={ticket}",
+        json={"results": [{"$type": "JobResult", "tag": "tag"}, {"$type": "JobQuit"}]},
+        status=200,
+    )
+
+
+def setup_default_responses(rsps):
+    rsps.add(
+        responses.GET,
+        f"{DEFAULT_PORTAL_URL}/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json",
+        json={"access": "public", "url": "https://apps.vertigisstudio.com/reporting/"},
+        status=200,
+    )
+    add_job_responses(rsps, "https://apps.vertigisstudio.com/reporting", "ticket")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_expires_entries(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set("key", "value")
+
+        clock.now = 9
+        self.assertEqual(cache.get("key"), "value")
+        clock.now = 10
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_invalidates_entries(self):
+        cache = TTLCache()
+        cache.set(("a", 1), 1)
+        cache.set(("a", 2), 2)
+        cache.set(("b", 1), 3)
+
+        cache.invalidate(("b", 1))
+        self.assertIsNone(cache.get(("b", 1)))
+        cache.invalidate_where(lambda x: x[0] == "a")
+        self.assertEqual(len(cache), 0)
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TTLCache(ttl=0)
+        cache.set("key", "value")
+
+        self.assertIsNone(cache.get("key"))
+
+
+class TestPortalItemCache(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    def tearDown(self):
+        portal_item_cache.clear()
+
+    async def test_reuses_portal_item(self):
+        item_url = f"{DEFAULT_PORTAL_URL}/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json"
+        with responses.RequestsMock() as rsps:
+            setup_default_responses(rsps)
+
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+            item_requests = [x for x in rsps.calls if x.request.url == item_url]
+            self.assertEqual(len(item_requests), 1)
+            self.assertEqual((portal_item_cache.hits, portal_item_cache.misses), (1, 1))
+
+            invalidate_portal_item(MOCK_PORTAL_ITEM_ID)
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+            item_requests = [x for x in rsps.calls if x.request.url == item_url]
+            self.assertEqual(len(item_requests), 2)
+
+    async def test_caches_per_token(self):
+        with responses.RequestsMock() as rsps:
+            setup_default_responses(rsps)
+            rsps.add(
+                responses.GET,
+                f"{DEFAULT_PORTAL_URL}/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json&token={MOCK_PORTAL_TOKEN}",
+                json={"access": "public", "url": "https://other/reporting"},
+                status=200,
+            )
+            add_job_responses(rsps, "https://other/reporting", "other-ticket")
+
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+            report = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, token=MOCK_PORTAL_TOKEN)
+
+            self.assertEqual(report, "https://other/reporting/service/job/result?ticket=other-ticket&tag=tag")
+            self.assertEqual(portal_item_cache.misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
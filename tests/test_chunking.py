@@ -0,0 +1,120 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import (
+    ReportingClient,
+    download_merged,
+    run_chunked,
+)
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import REPORTING_URL, FakeTransport
+from tests.local_server import LocalServer, web
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+
+
+class ChunkTransport(FakeTransport):
+    """Runs each job for a short time, numbering the tickets from 0."""
+
+    def get_ticket(self, parameters):
+        return str(len(self.submitted) - 1)
+
+    def get_poll_delay(self, ticket):
+        # Later chunks finish first, to check the results are put back in order.
+        return 0.05 / (int(ticket) + 1)
+
+
+def result_url(ticket):
+    return f"{REPORTING_URL}/service/job/result?ticket={ticket}&tag=tag"
+
+
+class TestRunChunked(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_runs_a_job_per_chunk(self):
+        transport = ChunkTransport()
+
+        results = await run_chunked(
+            MOCK_PORTAL_ITEM_ID,
+            "FeatureIds",
+            chunk_size=3,
+            max_concurrency=2,
+            use_polling=True,
+            transport=transport,
+            FeatureIds=list(range(10)),
+            Title="Parcels",
+        )
+
+        self.assertEqual(len(results), 4)
+        chunks = [transport.submitted[int(x.split("ticket=")[1].split("&")[0])] for x in results]
+        self.assertEqual([x["FeatureIds"] for x in chunks], [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]])
+        self.assertTrue(all(x["Title"] == "Parcels" for x in chunks))
+        self.assertEqual(transport.max_running, 2)
+
+    async def test_returns_job_results(self):
+        async with ReportingClient(transport=ChunkTransport()) as client:
+            results = await client.run_chunked(
+                MOCK_PORTAL_ITEM_ID, "FeatureIds", chunk_size=5, use_polling=True, return_job_result=True, FeatureIds=list(range(5))
+            )
+
+        self.assertEqual([x.url for x in results], [result_url(0)])
+
+    async def test_raises_when_a_chunk_fails(self):
+        transport = ChunkTransport(failing_tickets={"1"})
+
+        with self.assertRaises(Exception) as context_manager:
+            await run_chunked(
+                MOCK_PORTAL_ITEM_ID, "FeatureIds", chunk_size=1, use_polling=True, transport=transport, FeatureIds=[1, 2, 3]
+            )
+
+        self.assertIn("failed to produce an artifact", str(context_manager.exception))
+        # Let the polls of the cancelled chunks finish before the loop is closed.
+        await asyncio.sleep(0.1)
+
+    async def test_rejects_invalid_chunking(self):
+        with self.assertRaises(ValueError):
+            await run_chunked(MOCK_PORTAL_ITEM_ID, "FeatureIds", transport=ChunkTransport(), FeatureIds=1)
+        with self.assertRaises(ValueError):
+            await run_chunked(MOCK_PORTAL_ITEM_ID, "FeatureIds", chunk_size=0, transport=ChunkTransport(), FeatureIds=[1])
+
+
+def make_pdf(pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=72, height=72)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@unittest.skipIf(web is None or pypdf is None, "aiohttp or pypdf is not installed")
+class TestDownloadMerged(aiounittest.AsyncTestCase):
+    async def test_merges_artifacts_in_order(self):
+        async def get_result(request):
+            return web.Response(body=make_pdf(int(request.query["ticket"])), content_type="application/pdf")
+
+        async with LocalServer([web.get("/service/job/result", get_result)]) as server:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                dest = os.path.join(temp_dir, "merged.pdf")
+                pages = await download_merged(
+                    [f"{server.base_url}/service/job/result?ticket={x}&tag=tag" for x in (1, 2, 3)], dest
+                )
+
+                self.assertEqual(pages, 6)
+                self.assertEqual(len(pypdf.PdfReader(dest).pages), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
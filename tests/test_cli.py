@@ -0,0 +1,155 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import io
+import json
+import os
+import tempfile
+import unittest
+import aiounittest
+
+from geocortex.reporting.client.cli import parse_args, read_log, read_param_sets, run_batch
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeResponse, FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+ARTIFACT = b"%PDF artifact"
+
+
+class BatchTransport(FakeTransport):
+    """Fails the jobs whose Name parameter is "fail"."""
+
+    def __init__(self):
+        super().__init__(failing_tickets={"fail"}, result={"contentType": "application/pdf", "length": len(ARTIFACT)})
+        self.ranges = []
+
+    def get_ticket(self, parameters):
+        return "fail" if parameters.get("Name") == "fail" else super().get_ticket(parameters)
+
+    async def stream(self, url, *, headers=None):
+        self.ranges.append(headers.get("Range"))
+        if headers.get("If-Range") == '"v1"':
+            offset = int(headers["Range"][len("bytes="):-1])
+            return FakeResponse(206, {"ETag": '"v1"'}, ARTIFACT[offset:])
+        return FakeResponse(200, {"ETag": '"v1"'}, ARTIFACT)
+
+
+class TestReadingParameters(unittest.TestCase):
+    def test_reads_csv_cells_as_json_where_possible(self):
+        file = io.StringIO('Name,FeatureIds,Count\nNorth,"[1, 2]",3\n007,,\n')
+
+        self.assertEqual(list(read_param_sets(file, "csv")), [{"Name": "North", "FeatureIds": [1, 2], "Count": 3}, {"Name": "007"}])
+
+    def test_reads_json_lines(self):
+        file = io.StringIO('{"FeatureIds": [1]}\n\n{"FeatureIds": [2]}\n')
+
+        self.assertEqual(list(read_param_sets(file, "jsonl")), [{"FeatureIds": [1]}, {"FeatureIds": [2]}])
+        with self.assertRaises(ValueError):
+            list(read_param_sets(io.StringIO("[1]\n"), "jsonl"))
+
+    def test_parses_fixed_parameters(self):
+        args = parse_args(["batch", "item", "params.csv", "--param", "Region=North", "--param", "Layers=[1,2]"])
+
+        self.assertEqual(args.param, [("Region", "North"), ("Layers", [1, 2])])
+        with self.assertRaises(SystemExit):
+            parse_args(["batch", "item", "params.csv", "--resume"])
+
+
+class TestBatchCommand(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.temp_dir.cleanup)
+        self.input_path = self.path("params.jsonl")
+        self.output_path = self.path("results.jsonl")
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def write_input(self, names):
+        with open(self.input_path, "w", encoding="utf-8") as file:
+            for name in names:
+                file.write(json.dumps({"Name": name}) + "\n")
+
+    def read_output(self):
+        with open(self.output_path, encoding="utf-8") as file:
+            return sorted((json.loads(x) for x in file), key=lambda x: x["index"])
+
+    async def run_batch(self, transport, *extra_args):
+        args = parse_args(["batch", MOCK_PORTAL_ITEM_ID, self.input_path, "-o", self.output_path, "--polling", "--param", "Region=North", *extra_args])
+        return await run_batch(args, transport=transport)
+
+    async def test_writes_a_record_for_each_job(self):
+        self.write_input(["a", "fail", "c"])
+        transport = BatchTransport()
+
+        status = await self.run_batch(transport)
+
+        records = self.read_output()
+        self.assertEqual(status, 1)
+        self.assertEqual([x["index"] for x in records], [0, 1, 2])
+        self.assertEqual(records[0]["parameters"], {"Name": "a"})
+        self.assertIn("ticket=", records[0]["url"])
+        self.assertEqual(records[0]["result"]["length"], len(ARTIFACT))
+        self.assertIsNone(records[0]["error"])
+        self.assertIsNone(records[1]["url"])
+        self.assertIn("failed to produce an artifact", records[1]["error"])
+        self.assertTrue(all(x["Region"] == "North" for x in transport.submitted))
+
+    async def test_resumes_from_the_log(self):
+        self.write_input(["a", "fail", "c"])
+        await self.run_batch(BatchTransport())
+        with open(self.output_path, "a", encoding="utf-8") as file:
+            # The previous run stopped while writing a record.
+            file.write('{"index": 2, "para')
+
+        self.write_input(["a", "b", "c", "d"])
+        transport = BatchTransport()
+        status = await self.run_batch(transport, "--resume")
+
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(x["Name"] for x in transport.submitted), ["b", "d"])
+        succeeded, partial_line = read_log(self.output_path)
+        self.assertEqual(succeeded, {0, 1, 2, 3})
+        self.assertFalse(partial_line)
+
+    async def test_downloads_artifacts(self):
+        self.write_input(["a", "b"])
+        download_dir = self.path("reports")
+
+        status = await self.run_batch(BatchTransport(), "--download-dir", download_dir)
+
+        records = self.read_output()
+        self.assertEqual(status, 0)
+        self.assertEqual([x["path"] for x in records], [os.path.join(download_dir, "0.pdf"), os.path.join(download_dir, "1.pdf")])
+        with open(records[1]["path"], "rb") as file:
+            self.assertEqual(file.read(), ARTIFACT)
+
+    async def test_overwrites_artifacts_unless_resuming(self):
+        self.write_input(["a"])
+        download_dir = self.path("reports")
+        os.makedirs(download_dir)
+        with open(os.path.join(download_dir, "0.pdf"), "wb") as file:
+            file.write(b"%PDF left over from another run")
+
+        await self.run_batch(BatchTransport(), "--download-dir", download_dir)
+
+        with open(os.path.join(download_dir, "0.pdf"), "rb") as file:
+            self.assertEqual(file.read(), ARTIFACT)
+
+        # A download that was interrupted part way through.
+        with open(os.path.join(download_dir, "1.pdf"), "wb") as file:
+            file.write(ARTIFACT[:5])
+        with open(os.path.join(download_dir, "1.pdf.validator"), "w", encoding="utf-8") as file:
+            file.write('"v1"')
+        self.write_input(["a", "b"])
+        transport = BatchTransport()
+
+        await self.run_batch(transport, "--download-dir", download_dir, "--resume")
+
+        self.assertEqual(transport.ranges, ["bytes=5-"])
+        with open(os.path.join(download_dir, "1.pdf"), "rb") as file:
+            self.assertEqual(file.read(), ARTIFACT)
+
+
+if __name__ == "__main__":
+    unittest.main()
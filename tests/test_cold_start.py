@@ -0,0 +1,63 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import json
+import subprocess
+import sys
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import EndpointPool, ReportingClient, prewarm, run
+from geocortex.reporting.client.auth import reporting_token_cache
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import REPORTING_URL, FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+MOCK_PORTAL_TOKEN = "mock-portal-token"
+
+LAZY_MODULES = ["requests", "aiohttp", "websockets.client", "pypdf", "opentelemetry"]
+
+IMPORT_SCRIPT = f"""
+import json, sys
+import geocortex.reporting.client
+print(json.dumps([x for x in {LAZY_MODULES!r} if x in sys.modules]))
+"""
+
+
+def imported_modules() -> list:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output)
+
+
+class TestImport(unittest.TestCase):
+    def test_does_not_import_transport_libraries(self):
+        self.assertEqual(imported_modules(), [])
+
+
+class TestPrewarm(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        reporting_token_cache.clear()
+
+    async def test_first_run_skips_lookups(self):
+        transport = FakeTransport(access="private")
+
+        await prewarm(MOCK_PORTAL_ITEM_ID, token=MOCK_PORTAL_TOKEN, transport=transport)
+        self.assertEqual(len(transport.requests), 2)
+        transport.requests.clear()
+
+        await run(MOCK_PORTAL_ITEM_ID, use_polling=True, token=MOCK_PORTAL_TOKEN, transport=transport)
+
+        self.assertEqual(transport.requests, [("POST", f"{REPORTING_URL}/service/job/run"), ("GET", f"{REPORTING_URL}/service/job/artifacts?ticket=ticket1")])
+
+    async def test_exchanges_tokens_for_each_endpoint(self):
+        transport = FakeTransport(access="private")
+        pool = EndpointPool(["https://server1/reporting", "https://server2/reporting"])
+
+        async with ReportingClient(token=MOCK_PORTAL_TOKEN, transport=transport, endpoints=pool) as client:
+            await client.prewarm(MOCK_PORTAL_ITEM_ID)
+
+        self.assertEqual(sorted(x for _, x in transport.requests if x.endswith("/auth/token/run")), ["https://server1/reporting/service/auth/token/run", "https://server2/reporting/service/auth/token/run"])
+
+
+if __name__ == "__main__":
+    unittest.main()
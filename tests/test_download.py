@@ -0,0 +1,345 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring
+
+import asyncio
+import os
+import tempfile
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import (
+    AiohttpTransport,
+    IncompleteDownloadError,
+    JobNotFinishedError,
+    JobResult,
+    ReportingClient,
+    RequestsTransport,
+    download,
+    download_many,
+    stream_result,
+)
+from tests.local_server import LocalServer, web
+
+ARTIFACT = bytes(range(256)) * 1000
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class TestDownload(aiounittest.AsyncTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.temp_dir.cleanup)
+        self.artifact_path = os.path.join(self.temp_dir.name, "artifact.pdf")
+        with open(self.artifact_path, "wb") as file:
+            file.write(ARTIFACT)
+        self.range_headers = []
+        self.etag = '"v1"'
+
+    def routes(self):
+        async def get_result(request):
+            self.range_headers.append(request.headers.get("Range"))
+            # FileResponse supports range requests.
+            return web.FileResponse(self.artifact_path)
+
+        async def get_result_without_ranges(_request):
+            return web.Response(body=ARTIFACT, content_type="application/pdf")
+
+        async def get_versioned_result(request):
+            # Only honours the range while If-Range matches the artifact's ETag.
+            range_header = request.headers.get("Range")
+            self.range_headers.append(range_header)
+            headers = {"ETag": self.etag}
+            if range_header and request.headers.get("If-Range") == self.etag:
+                start = int(range_header[len("bytes=") : -1])
+                if start >= len(ARTIFACT):
+                    return web.Response(status=416, headers=headers)
+                return web.Response(status=206, body=ARTIFACT[start:], headers=headers)
+            return web.Response(body=ARTIFACT, headers=headers)
+
+        return [
+            web.get("/service/job/result", get_result),
+            web.get("/no-ranges/job/result", get_result_without_ranges),
+            web.get("/versioned/job/result", get_versioned_result),
+        ]
+
+    def write_partial(self, dest, content, validator):
+        with open(dest, "wb") as file:
+            file.write(content)
+        with open(f"{dest}.validator", "w", encoding="utf-8") as file:
+            file.write(validator)
+
+    def assert_file(self, dest, content):
+        with open(dest, "rb") as file:
+            self.assertEqual(file.read(), content)
+        self.assertFalse(os.path.exists(f"{dest}.validator"))
+
+    async def test_streams_in_chunks(self):
+        async with LocalServer(self.routes()) as server:
+            chunks = [
+                chunk
+                async for chunk in stream_result(
+                    f"{server.base_url}/service/job/result?ticket=t&tag=a", chunk_size=1024
+                )
+            ]
+
+        self.assertEqual(b"".join(chunks), ARTIFACT)
+        self.assertTrue(all(len(x) <= 1024 for x in chunks))
+
+    async def test_streams_from_offset(self):
+        transport = AiohttpTransport()
+        try:
+            async with LocalServer(self.routes()) as server:
+                async with ReportingClient(transport=transport) as client:
+                    with_ranges = [
+                        chunk
+                        async for chunk in client.stream_result(
+                            f"{server.base_url}/service/job/result?ticket=t&tag=a", offset=1000
+                        )
+                    ]
+                    without_ranges = [
+                        chunk
+                        async for chunk in client.stream_result(
+                            f"{server.base_url}/no-ranges/job/result?ticket=t&tag=a", offset=1000
+                        )
+                    ]
+        finally:
+            await transport.close()
+
+        self.assertEqual(b"".join(with_ranges), ARTIFACT[1000:])
+        self.assertEqual(b"".join(without_ranges), ARTIFACT[1000:])
+        self.assertEqual(self.range_headers, ["bytes=1000-"])
+
+    async def assert_downloads(self, transport):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        async with LocalServer(self.routes()) as server:
+            length = await download(
+                f"{server.base_url}/service/job/result?ticket=t&tag=a",
+                dest,
+                expected_length=len(ARTIFACT),
+                transport=transport,
+            )
+
+        self.assertEqual(length, len(ARTIFACT))
+        with open(dest, "rb") as file:
+            self.assertEqual(file.read(), ARTIFACT)
+
+    async def test_downloads_with_requests(self):
+        transport = RequestsTransport()
+        try:
+            await self.assert_downloads(transport)
+        finally:
+            await transport.close()
+
+    async def test_downloads_with_aiohttp(self):
+        transport = AiohttpTransport()
+        try:
+            await self.assert_downloads(transport)
+        finally:
+            await transport.close()
+
+    async def test_resumes_partial_download(self):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        self.write_partial(dest, ARTIFACT[:5000], self.etag)
+
+        async with LocalServer(self.routes()) as server:
+            result_url = f"{server.base_url}/versioned/job/result?ticket=t&tag=a"
+            length = await download(result_url, dest, resume=True)
+
+            # The file is already complete.
+            self.write_partial(dest, ARTIFACT, self.etag)
+            await download(result_url, dest, expected_length=len(ARTIFACT), resume=True)
+
+        self.assertEqual(length, len(ARTIFACT))
+        self.assertEqual(self.range_headers, ["bytes=5000-", f"bytes={len(ARTIFACT)}-"])
+        self.assert_file(dest, ARTIFACT)
+
+    async def test_restarts_download_of_changed_artifact(self):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        self.write_partial(dest, b"A" * 5000, '"v0"')
+
+        async with LocalServer(self.routes()) as server:
+            await download(f"{server.base_url}/versioned/job/result?ticket=t&tag=a", dest, resume=True)
+
+        self.assertEqual(self.range_headers, ["bytes=5000-"])
+        self.assert_file(dest, ARTIFACT)
+
+    async def test_restarts_download_that_cannot_be_checked(self):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        async with LocalServer(self.routes()) as server:
+            result_url = f"{server.base_url}/versioned/job/result?ticket=t&tag=a"
+
+            # Longer than the artifact.
+            self.write_partial(dest, b"A" * (len(ARTIFACT) + 10), self.etag)
+            await download(result_url, dest, expected_length=len(ARTIFACT), resume=True)
+            self.assert_file(dest, ARTIFACT)
+
+            # Complete, but the length isn't known.
+            self.write_partial(dest, b"A" * len(ARTIFACT), self.etag)
+            await download(result_url, dest, resume=True)
+            self.assert_file(dest, ARTIFACT)
+
+            # No validator.
+            with open(dest, "wb") as file:
+                file.write(b"A" * 5000)
+            await download(result_url, dest, resume=True)
+            self.assert_file(dest, ARTIFACT)
+
+        self.assertEqual(self.range_headers, [None, f"bytes={len(ARTIFACT)}-", None, None])
+
+    async def test_overwrites_existing_file_by_default(self):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        self.write_partial(dest, ARTIFACT[:5000], self.etag)
+
+        async with LocalServer(self.routes()) as server:
+            await download(f"{server.base_url}/versioned/job/result?ticket=t&tag=a", dest)
+
+        self.assertEqual(self.range_headers, [None])
+        self.assert_file(dest, ARTIFACT)
+
+    async def test_downloads_job_result(self):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        async with LocalServer(self.routes()) as server:
+            job_result = JobResult(f"{server.base_url}/service", "t", "a", length=10)
+            with self.assertRaises(IncompleteDownloadError):
+                await download(job_result, dest, resume=False)
+
+            job_result.length = len(ARTIFACT)
+            length = await download(job_result, dest, resume=False)
+
+        self.assertEqual(length, len(ARTIFACT))
+
+    async def test_raises_on_length_mismatch(self):
+        dest = os.path.join(self.temp_dir.name, "report.pdf")
+        async with LocalServer(self.routes()) as server:
+            with self.assertRaises(Exception) as context_manager:
+                await download(
+                    f"{server.base_url}/service/job/result?ticket=t&tag=a",
+                    dest,
+                    expected_length=10,
+                    resume=False,
+                )
+
+        self.assertIn(f"Downloaded {len(ARTIFACT)} bytes", str(context_manager.exception))
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class TestDownloadMany(aiounittest.AsyncTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.temp_dir.cleanup)
+        self.failures = {}
+        self.lengths = {}
+        self.unfinished = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def routes(self):
+        async def get_artifacts(request):
+            ticket = request.query["ticket"]
+            if ticket in self.unfinished:
+                return web.json_response({"results": []})
+            return web.json_response(
+                {
+                    "results": [
+                        {
+                            "$type": "JobResult",
+                            "tag": "tag",
+                            "contentType": "application/pdf",
+                            "length": self.lengths.get(ticket, len(ticket) * 1000),
+                        },
+                        {"$type": "JobQuit"},
+                    ]
+                }
+            )
+
+        async def get_result(request):
+            ticket = request.query["ticket"]
+            if self.failures.get(ticket):
+                self.failures[ticket] -= 1
+                return web.Response(status=503)
+
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(0.01)
+                return web.Response(body=ticket.encode() * 1000)
+            finally:
+                self.in_flight -= 1
+
+        return [
+            web.get("/service/job/artifacts", get_artifacts),
+            web.get("/service/job/result", get_result),
+        ]
+
+    async def test_downloads_urls_and_tickets(self):
+        progress = []
+        async with LocalServer(self.routes()) as server:
+            service_url = f"{server.base_url}/service"
+            items = [f"{service_url}/job/result?ticket=url{x}&tag=tag" for x in range(5)]
+            items += [f"ticket{x}" for x in range(5)]
+            items += [JobResult(service_url, f"result{x}", "tag", content_type="application/pdf", length=7000) for x in range(2)]
+            results = [
+                result
+                async for result in download_many(
+                    items,
+                    self.temp_dir.name,
+                    service_url=service_url,
+                    max_per_host=2,
+                    progress=lambda *args: progress.append(args),
+                )
+            ]
+
+        self.assertEqual(len(results), 12)
+        for result in results:
+            self.assertIsNone(result.error)
+            ticket = os.path.basename(result.path)[: -len(".pdf")]
+            self.assertEqual(result.path, os.path.join(self.temp_dir.name, f"{ticket}.pdf"))
+            with open(result.path, "rb") as file:
+                self.assertEqual(file.read(), ticket.encode() * 1000)
+        self.assertEqual(self.max_in_flight, 2, "Limits downloads per host")
+        self.assertIn((f"{service_url}/job/result?ticket=url0&tag=tag", 4000, 4000), progress)
+
+    async def test_retries_transient_failures(self):
+        self.failures = {"a": 2, "b": 5}
+        async with LocalServer(self.routes()) as server:
+            results = {
+                os.path.basename(result.path): result
+                async for result in download_many(
+                    ["a", "b"],
+                    self.temp_dir.name,
+                    service_url=f"{server.base_url}/service",
+                    retries=2,
+                    retry_delay=0.01,
+                )
+            }
+
+        self.assertIsNone(results["a.pdf"].error)
+        self.assertEqual(results["b.pdf"].error.status, 503)
+
+    async def test_reports_length_mismatch(self):
+        self.lengths = {"a": 1}
+        async with LocalServer(self.routes()) as server:
+            async with ReportingClient() as client:
+                results = [
+                    result
+                    async for result in client.download_many(
+                        ["a", f"{server.base_url}/service/job/result?tag=tag"],
+                        self.temp_dir.name,
+                        service_url=f"{server.base_url}/service",
+                        retries=1,
+                        retry_delay=0.01,
+                    )
+                ]
+
+        errors = sorted(type(x.error).__name__ for x in results)
+        self.assertEqual(errors, ["IncompleteDownloadError", "ValueError"])
+
+
+    async def test_reports_unfinished_jobs(self):
+        self.unfinished = {"a"}
+        async with LocalServer(self.routes()) as server:
+            results = [result async for result in download_many(["a"], self.temp_dir.name, service_url=f"{server.base_url}/service", retries=1, retry_delay=0.01)]
+
+        self.assertIsInstance(results[0].error, JobNotFinishedError)
+
+
+if __name__ == "__main__":
+    unittest.main()
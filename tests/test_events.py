@@ -0,0 +1,94 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import PollingStrategy, ReportingClient, RetryPolicy, run
+from geocortex.reporting.client.events import EventDispatcher
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+
+FAST_POLLING = PollingStrategy(initial_interval=0.001, max_interval=0.001)
+
+RECORDS = [
+    {"$type": "JobStarted"},
+    {"$type": "JobProgress", "percent": 50},
+    {"$type": "JobResult", "tag": "tag"},
+    {"$type": "JobQuit", "kind": "Run"},
+]
+
+
+class EventTransport(FakeTransport):
+    """Reports one more record of the job on each poll."""
+
+    def __init__(self, records=None):
+        super().__init__()
+        self.records = RECORDS if records is None else records
+
+    def get_results(self, ticket, polls):
+        return self.records[:polls]
+
+
+class TestEventDispatcher(unittest.TestCase):
+    def test_dispatches_new_records_only(self):
+        events = []
+        dispatcher = EventDispatcher("ticket1")
+        dispatcher.callbacks.append(events.append)
+
+        dispatcher.dispatch({"results": RECORDS[:2]})
+        dispatcher.dispatch({"results": RECORDS[:2]})
+        dispatcher.dispatch({"results": RECORDS})
+
+        self.assertEqual([x.type for x in events], ["JobStarted", "JobProgress", "JobResult", "JobQuit"])
+        self.assertEqual(events[1].data["percent"], 50)
+        self.assertTrue(all(x.ticket == "ticket1" for x in events))
+
+    def test_starts_over_when_the_status_does(self):
+        events = []
+        dispatcher = EventDispatcher("ticket1")
+        dispatcher.callbacks.append(events.append)
+
+        dispatcher.dispatch({"results": RECORDS[:2]})
+        dispatcher.dispatch({"results": RECORDS[:1]})
+
+        self.assertEqual([x.type for x in events], ["JobStarted", "JobProgress", "JobStarted"])
+
+
+class TestProgressEvents(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_calls_progress_as_records_arrive(self):
+        events = []
+
+        url = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, polling_strategy=FAST_POLLING, progress=events.append, transport=EventTransport())
+
+        self.assertIn("ticket=ticket1", url)
+        self.assertEqual([x.type for x in events], ["JobStarted", "JobProgress", "JobResult", "JobQuit"])
+
+    async def test_streams_events(self):
+        async with ReportingClient(transport=EventTransport()) as client:
+            events = client.stream_events(MOCK_PORTAL_ITEM_ID, use_polling=True, polling_strategy=FAST_POLLING)
+            types = [x.type async for x in events]
+
+        self.assertEqual(types, ["JobStarted", "JobProgress", "JobResult", "JobQuit"])
+        self.assertEqual(events.result.tag, "tag")
+
+    async def test_raises_job_failures_from_the_stream(self):
+        transport = EventTransport(records=[{"$type": "JobStarted"}, {"$type": "JobQuit", "kind": "Run"}])
+        types = []
+
+        async with ReportingClient(transport=transport, retry_policy=RetryPolicy(max_attempts=1)) as client:
+            events = client.stream_events(MOCK_PORTAL_ITEM_ID, use_polling=True, polling_strategy=FAST_POLLING)
+            with self.assertRaises(Exception):
+                async for event in events:
+                    types.append(event.type)
+
+        self.assertEqual(types, ["JobStarted", "JobQuit"])
+        self.assertIsNone(events.result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import threading
+import unittest
+
+from geocortex.reporting.client import ReportExecutor, run_sync
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import REPORTING_URL, FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+
+
+class ThreadTransport(FakeTransport):
+    """Finishes each job after a delay, using the FeatureId parameter as its ticket."""
+
+    def __init__(self, delay=0.05):
+        super().__init__(poll_delay=delay, failing_tickets={"fail"})
+        self.loop_threads = set()
+
+    def get_ticket(self, parameters):
+        return str(parameters["FeatureId"])
+
+    async def get_json(self, url, *, headers=None):
+        self.loop_threads.add(threading.current_thread())
+        return await super().get_json(url, headers=headers)
+
+
+def result_url(ticket):
+    return f"{REPORTING_URL}/service/job/result?ticket={ticket}&tag=tag"
+
+
+class TestRunSync(unittest.TestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    def test_runs_report_without_an_event_loop(self):
+        transport = ThreadTransport(delay=0)
+
+        report = run_sync(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, FeatureId=1)
+
+        self.assertEqual(report, result_url(1))
+        self.assertNotIn(threading.current_thread(), transport.loop_threads)
+
+    def test_runs_calls_from_many_threads_concurrently(self):
+        transport = ThreadTransport()
+        results = {}
+
+        def run_report(feature_id):
+            results[feature_id] = run_sync(
+                MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, FeatureId=feature_id
+            )
+
+        threads = [threading.Thread(target=run_report, args=(x,)) for x in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {x: result_url(x) for x in range(5)})
+        self.assertGreater(transport.max_running, 1)
+        self.assertEqual(len(transport.loop_threads), 1, "Shares one background loop")
+
+
+class TestReportExecutor(unittest.TestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    def test_returns_futures(self):
+        transport = ThreadTransport()
+        with ReportExecutor(transport=transport) as executor:
+            futures = [executor.submit(MOCK_PORTAL_ITEM_ID, use_polling=True, FeatureId=x) for x in range(10)]
+
+            self.assertEqual([x.result() for x in futures], [result_url(x) for x in range(10)])
+
+        self.assertEqual(transport.max_running, 10)
+        self.assertFalse(transport.closed, "Doesn't close a transport it was given")
+
+    def test_maps_param_sets_in_order(self):
+        with ReportExecutor(transport=ThreadTransport()) as executor:
+            results = executor.map(
+                MOCK_PORTAL_ITEM_ID,
+                [{"FeatureId": x} for x in range(3)],
+                use_polling=True,
+            )
+
+            self.assertEqual(list(results), [result_url(x) for x in range(3)])
+
+    def test_raises_job_errors_from_future(self):
+        with ReportExecutor(transport=ThreadTransport()) as executor:
+            future = executor.submit(MOCK_PORTAL_ITEM_ID, use_polling=True, FeatureId="fail")
+
+            with self.assertRaises(Exception) as context_manager:
+                future.result()
+
+        self.assertIn("failed to produce an artifact", str(context_manager.exception))
+
+    def test_waits_for_jobs_on_shutdown(self):
+        executor = ReportExecutor(transport=ThreadTransport())
+        future = executor.submit(MOCK_PORTAL_ITEM_ID, use_polling=True, FeatureId=1)
+
+        executor.shutdown()
+
+        self.assertEqual(future.result(0), result_url(1))
+        with self.assertRaises(RuntimeError):
+            executor.submit(MOCK_PORTAL_ITEM_ID, use_polling=True, FeatureId=2)
+
+    def test_cancels_jobs_on_shutdown_without_wait(self):
+        executor = ReportExecutor(transport=ThreadTransport(delay=10))
+        future = executor.submit(MOCK_PORTAL_ITEM_ID, use_polling=True, FeatureId=1)
+
+        executor.shutdown(wait=False)
+
+        self.assertTrue(future.cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
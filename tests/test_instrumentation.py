@@ -0,0 +1,184 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import os
+import tempfile
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import (
+    HTTPStatusError,
+    Instrumentation,
+    MetricsInstrumentation,
+    OpenTelemetryInstrumentation,
+    ReportingClient,
+    run,
+)
+from geocortex.reporting.client.auth import reporting_token_cache
+from geocortex.reporting.client.polling import _schedulers
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import REPORTING_URL, FakeTransport
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+RESULT_URL = f"{REPORTING_URL}/service/job/result?ticket=ticket1&tag=tag"
+
+
+class TokenTransport(FakeTransport):
+    """Rejects the reporting token of the first `rejected_tokens` jobs."""
+
+    def __init__(self, rejected_tokens=0, **kwargs):
+        super().__init__(access="private", artifact=b"x" * 300, **kwargs)
+        self.rejected_tokens = rejected_tokens
+
+    async def post_json(self, url, payload, *, headers=None):
+        if self.rejected_tokens and not url.endswith("/auth/token/run"):
+            self.rejected_tokens -= 1
+            raise HTTPStatusError(401, url)
+        return await super().post_json(url, payload, headers=headers)
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        self.events = []
+        self.contexts = []
+
+    def stage_started(self, stage, attributes):
+        self.events.append(("started", stage))
+        return stage
+
+    def stage_finished(self, stage, duration, error, context):
+        self.contexts.append((context, duration >= 0))
+        self.events.append(("finished", stage, type(error).__name__ if error else None))
+
+
+class TestInstrumentation(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        reporting_token_cache.clear()
+
+    async def test_reports_each_stage(self):
+        instrumentation = RecordingInstrumentation()
+
+        report = await run(
+            MOCK_PORTAL_ITEM_ID,
+            token="portal-token",
+            use_polling=True,
+            transport=TokenTransport(),
+            instrumentation=instrumentation,
+        )
+
+        self.assertEqual(report, RESULT_URL)
+        self.assertEqual(
+            instrumentation.events,
+            [
+                ("started", "run"),
+                ("started", "portal_item"),
+                ("finished", "portal_item", None),
+                ("started", "token"),
+                ("finished", "token", None),
+                ("started", "start_job"),
+                ("finished", "start_job", None),
+                ("started", "wait"),
+                ("finished", "wait", None),
+                ("finished", "run", None),
+            ],
+        )
+        self.assertEqual(
+            instrumentation.contexts,
+            [(x, True) for x in ["portal_item", "token", "start_job", "wait", "run"]],
+            "Passes the context and duration",
+        )
+
+    async def test_reports_failed_stages(self):
+        instrumentation = RecordingInstrumentation()
+
+        with self.assertRaises(Exception):
+            await run(
+                MOCK_PORTAL_ITEM_ID,
+                use_polling=True,
+                transport=TokenTransport(failing_tickets={"ticket1"}),
+                instrumentation=instrumentation,
+            )
+
+        self.assertEqual(
+            instrumentation.events[-2:],
+            [("finished", "wait", "Exception"), ("finished", "run", "Exception")],
+        )
+
+    async def test_counts_requests_bytes_and_retries(self):
+        metrics = MetricsInstrumentation()
+        async with ReportingClient(
+            token="portal-token", transport=TokenTransport(rejected_tokens=1), instrumentation=metrics
+        ) as client:
+            report = await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+            with tempfile.TemporaryDirectory() as temp_dir:
+                await client.download(report, os.path.join(temp_dir, "report.pdf"))
+
+        self.assertEqual(metrics.get("stage_total", stage="run"), 1)
+        self.assertEqual(metrics.get("stage_total", stage="start_job"), 2)
+        self.assertEqual(metrics.get("stage_errors_total", stage="start_job"), 1)
+        self.assertEqual(metrics.get("stage_total", stage="download"), 1)
+        self.assertEqual(metrics.get("retries_total", stage="start_job"), 1)
+        # The portal item, two token exchanges, two job starts, one poll and the download.
+        self.assertEqual(metrics.get("requests_total", method="GET"), 3)
+        self.assertEqual(metrics.get("requests_total", method="POST"), 4)
+        self.assertEqual(metrics.get("request_errors_total", method="POST"), 1)
+        self.assertEqual(metrics.get("received_bytes_total"), 300)
+
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE geocortex_reporting_received_bytes_total counter", lines)
+        self.assertIn("geocortex_reporting_received_bytes_total 300", lines)
+        self.assertIn('geocortex_reporting_requests_total{method="GET"} 3', lines)
+        self.assertEqual(
+            lines.count("# TYPE geocortex_reporting_stage_total counter"), 1
+        )
+
+    async def test_concurrent_runs_share_a_polling_scheduler(self):
+        transport = TokenTransport(polls_needed=2)
+        metrics = MetricsInstrumentation()
+
+        runs = [asyncio.ensure_future(run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, instrumentation=metrics, A=x)) for x in range(3)]
+        while len(transport.polled_tickets) < 3:
+            await asyncio.sleep(0.001)
+        schedulers = list(_schedulers.get(asyncio.get_event_loop(), {}).values())
+        await asyncio.gather(*runs)
+
+        self.assertEqual(len(schedulers), 1)
+        self.assertEqual(metrics.get("stage_total", stage="run"), 3)
+
+    async def test_does_not_wrap_transport_without_instrumentation(self):
+        transport = TokenTransport()
+        async with ReportingClient(transport=transport) as client:
+            self.assertIs(client.transport, transport)
+
+    @unittest.skipIf(TracerProvider is None, "opentelemetry-sdk is not installed")
+    async def test_records_nested_spans(self):
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        instrumentation = OpenTelemetryInstrumentation(provider.get_tracer("test"))
+
+        await run(
+            MOCK_PORTAL_ITEM_ID,
+            use_polling=True,
+            transport=TokenTransport(),
+            instrumentation=instrumentation,
+        )
+
+        spans = {x.name: x for x in exporter.get_finished_spans()}
+        self.assertEqual(
+            set(spans), {"reporting.run", "reporting.portal_item", "reporting.start_job", "reporting.wait"}
+        )
+        self.assertEqual(spans["reporting.wait"].parent.span_id, spans["reporting.run"].context.span_id)
+        self.assertEqual(spans["reporting.wait"].attributes["ticket"], "ticket1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import json
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import PreparedTemplate, ReportingClient, run_many
+from geocortex.reporting.client.json_codec import EncodedDict, dumps, loads
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+
+
+class TestPreparedTemplate(unittest.TestCase):
+    def assert_encodes_as_dict(self, job_args):
+        self.assertEqual(loads(dumps(job_args)), json.loads(json.dumps(dict(job_args))))
+
+    def test_encodes_shared_and_job_arguments(self):
+        template = PreparedTemplate("item", culture="fr-CA", dpi=150, result_file_name="Report", Region="North", Layers=["a", "b"])
+
+        job_args = template.job_args({"FeatureIds": [1, 2], "Title": "é"})
+
+        self.assertIsInstance(job_args, EncodedDict)
+        self.assert_encodes_as_dict(job_args)
+        self.assertEqual(job_args["template"], {"itemId": "item", "portalUrl": "https://www.arcgis.com", "title": "Report"})
+        self.assertEqual([x["name"] for x in job_args["parameters"]], ["Region", "Layers", "FeatureIds", "Title"])
+        self.assertEqual((job_args["culture"], job_args["dpi"]), ("fr-CA", 150))
+
+    def test_encodes_jobs_without_fixed_or_varying_parameters(self):
+        self.assert_encodes_as_dict(PreparedTemplate("item").job_args({}))
+        self.assert_encodes_as_dict(PreparedTemplate("item").job_args({"A": 1}))
+        self.assert_encodes_as_dict(PreparedTemplate("item", A=1).job_args({}))
+
+    def test_replaces_fixed_parameters(self):
+        job_args = PreparedTemplate("item", A=1, B=2).job_args({"A": [3]})
+
+        self.assertEqual(job_args["parameters"], [{"name": "B", "containsMultipleValues": False, "value": 2}, {"name": "A", "containsMultipleValues": True, "values": [3]}])
+        self.assert_encodes_as_dict(job_args)
+
+    def test_encodes_values_orjson_cannot(self):
+        self.assertEqual(loads(dumps({"id": 2**70})), {"id": 2**70})
+
+
+class TestRunningPreparedTemplates(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_runs_jobs_from_a_prepared_template(self):
+        transport = FakeTransport()
+        template = PreparedTemplate(MOCK_PORTAL_ITEM_ID, culture="en-US", Region="North")
+
+        results = [x async for x in run_many(template, ({"FeatureIds": [x]} for x in range(3)), use_polling=True, transport=transport)]
+
+        self.assertTrue(all(x.error is None for x in results))
+        self.assertEqual(sorted(x["parameters"][1]["values"] for x in transport.payloads), [[0], [1], [2]])
+        self.assertTrue(all(x["parameters"][0]["value"] == "North" and x["culture"] == "en-US" for x in transport.payloads))
+
+    async def test_rejects_arguments_that_belong_to_the_template(self):
+        async with ReportingClient(transport=FakeTransport(), portal_url="https://portal") as client:
+            with self.assertRaises(ValueError):
+                await client.run(client.prepare(MOCK_PORTAL_ITEM_ID), culture="en-US", use_polling=True)
+            with self.assertRaises(ValueError):
+                await client.run(PreparedTemplate(MOCK_PORTAL_ITEM_ID), use_polling=True)
+
+            url = await client.run(client.prepare(MOCK_PORTAL_ITEM_ID, dpi=300), use_polling=True)
+
+        self.assertIn("ticket=ticket1", url)
+
+
+if __name__ == "__main__":
+    unittest.main()
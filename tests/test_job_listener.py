@@ -0,0 +1,261 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,too-few-public-methods,abstract-method
+
+import asyncio
+import json
+import ssl
+import time
+import unittest
+import aiounittest
+
+from websockets.exceptions import ConnectionClosed, InvalidStatusCode
+
+from geocortex.reporting.client import JobTimeoutError, PollingStrategy
+from geocortex.reporting.client.job_listener import (
+    JobListener,
+    WebSocketUnavailableError,
+    get_job_listener,
+)
+from geocortex.reporting.client.reporting_service import _wait_for_job_result_ws
+from tests.fake_transport import FakeTransport
+
+SERVICE_URL = "https://apps.vertigisstudio.com/reporting/service"
+
+
+def job_finished_message(tag):
+    return json.dumps(
+        {
+            "results": [
+                {"$type": "JobResult", "tag": tag},
+                {"$type": "JobQuit", "kind": "Run"},
+            ]
+        }
+    )
+
+
+PROGRESS_MESSAGE = json.dumps({"results": [{"$type": "JobProgress", "progress": 0.5}]})
+
+
+class FakeConnections:
+    """Opens fake sockets that send `messages` in turn, each after `delay` seconds.
+
+    A message that is an exception is raised from `recv` instead.
+    """
+
+    def __init__(self, delay=0.01, messages=None, connect_errors=(), open_delay=0):
+        self.delay = delay
+        self.open_delay = open_delay
+        self.messages = messages
+        self.connect_errors = list(connect_errors)
+        self.opened = []
+        self.open_count = 0
+        self.max_open_count = 0
+
+    def __call__(self, url, ssl=None):  # pylint: disable=redefined-outer-name
+        self.opened.append((url, ssl))
+        return FakeWebSocket(self, url)
+
+
+class FakeWebSocket:
+    def __init__(self, connections, url):
+        self.connections = connections
+        self.ticket = url.split("ticket=")[1]
+
+    def __await__(self):
+        return self.open().__await__()
+
+    async def open(self):
+        await asyncio.sleep(self.connections.open_delay)
+        if self.connections.connect_errors:
+            raise self.connections.connect_errors.pop(0)
+        self.connections.open_count += 1
+        self.connections.max_open_count = max(
+            self.connections.max_open_count, self.connections.open_count
+        )
+        return self
+
+    async def close(self):
+        self.connections.open_count -= 1
+
+    async def recv(self):
+        await asyncio.sleep(self.connections.delay)
+        if self.connections.messages is None:
+            return job_finished_message(f"tag-{self.ticket}")
+
+        message = self.connections.messages.pop(0)
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+class TestJobListener(aiounittest.AsyncTestCase):
+    async def test_returns_artifact_url(self):
+        connections = FakeConnections()
+        listener = JobListener(SERVICE_URL, connect=connections)
+
+        job_result = await listener.wait("1")
+
+        self.assertEqual(job_result.url, f"{SERVICE_URL}/job/result?ticket=1&tag=tag-1")
+        self.assertEqual(job_result.ticket, "1")
+        url, ssl_context = connections.opened[0]
+        self.assertEqual(url, "wss://apps.vertigisstudio.com/reporting/service/job/artifacts?ticket=1")
+        self.assertIsInstance(ssl_context, ssl.SSLContext)
+
+    async def test_bounds_open_connections(self):
+        connections = FakeConnections()
+        listener = JobListener(SERVICE_URL, max_connections=3, connect=connections)
+
+        job_results = await asyncio.gather(*(listener.wait(str(x)) for x in range(10)))
+
+        self.assertEqual(len({x.url for x in job_results}), 10)
+        self.assertEqual(connections.max_open_count, 3)
+        self.assertEqual(listener.pending_tickets, 0)
+        self.assertEqual(
+            len({id(ssl_context) for _, ssl_context in connections.opened}), 1,
+            "Shares one SSL context",
+        )
+
+    async def test_shares_connection_for_same_ticket(self):
+        connections = FakeConnections()
+        listener = JobListener(SERVICE_URL, connect=connections)
+
+        job_results = await asyncio.gather(*(listener.wait("1") for _ in range(5)))
+
+        self.assertEqual({x.url for x in job_results}, {f"{SERVICE_URL}/job/result?ticket=1&tag=tag-1"})
+        self.assertEqual(len(connections.opened), 1)
+
+    async def test_does_not_use_ssl_for_http_service(self):
+        connections = FakeConnections()
+        listener = JobListener("http://on-prem/reporting/service", connect=connections)
+
+        await listener.wait("1")
+
+        self.assertEqual(
+            connections.opened, [("ws://on-prem/reporting/service/job/artifacts?ticket=1", None)]
+        )
+
+    async def test_reads_progress_until_the_job_finishes(self):
+        connections = FakeConnections(messages=[PROGRESS_MESSAGE, PROGRESS_MESSAGE, job_finished_message("tag")])
+        listener = JobListener(SERVICE_URL, connect=connections)
+
+        job_result = await listener.wait("1")
+
+        self.assertEqual(job_result.tag, "tag")
+        self.assertEqual(len(connections.opened), 1)
+        self.assertEqual(connections.open_count, 0)
+
+    async def test_reconnects_when_the_socket_drops(self):
+        connections = FakeConnections(
+            messages=[PROGRESS_MESSAGE, ConnectionClosed(1006, ""), job_finished_message("tag")],
+            connect_errors=[ConnectionRefusedError()],
+        )
+        listener = JobListener(SERVICE_URL, connect=connections, max_reconnects=2, reconnect_delay=0)
+
+        job_result = await listener.wait("1")
+
+        self.assertEqual(job_result.tag, "tag")
+        self.assertEqual(len(connections.opened), 3)
+        self.assertEqual(connections.open_count, 0)
+
+    async def test_gives_up_after_max_reconnects(self):
+        connections = FakeConnections(messages=[ConnectionClosed(1006, "")] * 3)
+        listener = JobListener(SERVICE_URL, connect=connections, max_reconnects=1, reconnect_delay=0)
+
+        with self.assertRaises(WebSocketUnavailableError):
+            await listener.wait("1")
+        self.assertEqual(len(connections.opened), 2)
+
+    async def test_does_not_reconnect_when_rejected(self):
+        connections = FakeConnections(connect_errors=[InvalidStatusCode(404), InvalidStatusCode(404)])
+        listener = JobListener(SERVICE_URL, connect=connections, reconnect_delay=0)
+
+        with self.assertRaises(WebSocketUnavailableError):
+            await listener.wait("1")
+        self.assertEqual(len(connections.opened), 1)
+
+    async def test_gives_up_on_sockets_that_do_not_open(self):
+        connections = FakeConnections(open_delay=10)
+        listener = JobListener(SERVICE_URL, connect=connections, open_timeout=0.05)
+
+        with self.assertRaises(WebSocketUnavailableError):
+            await listener.wait("1")
+        self.assertEqual(connections.open_count, 0)
+
+    async def test_waits_on_quiet_sockets(self):
+        # The service may send nothing until a long job finishes.
+        connections = FakeConnections(delay=0.1)
+        listener = JobListener(SERVICE_URL, connect=connections, open_timeout=0.05)
+
+        job_result = await listener.wait("1")
+
+        self.assertEqual(job_result.tag, "tag-1")
+        self.assertEqual(len(connections.opened), 1)
+
+    async def test_raises_job_failures(self):
+        connections = FakeConnections(messages=[json.dumps({"results": [{"$type": "JobQuit", "kind": "Run"}]})])
+        listener = JobListener(SERVICE_URL, connect=connections)
+
+        with self.assertRaises(Exception) as context_manager:
+            await listener.wait("1")
+        self.assertIn("failed to produce an artifact", str(context_manager.exception))
+
+    async def test_closes_socket_when_no_one_is_waiting(self):
+        connections = FakeConnections(delay=10)
+        listener = JobListener(SERVICE_URL, connect=connections)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(listener.wait("1"), 0.05)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(connections.open_count, 0)
+        self.assertEqual(listener.pending_tickets, 0)
+
+    async def test_closes_socket_when_cancelled_as_it_opens(self):
+        connections = FakeConnections(delay=10)
+
+        def connect(url, ssl=None):  # pylint: disable=redefined-outer-name
+            # Block the loop, as loading CA certificates does, until the wait times out.
+            time.sleep(0.06)
+            return connections(url, ssl)
+
+        listener = JobListener(SERVICE_URL, connect=connect)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(listener.wait("1"), 0.05)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(connections.open_count, 0)
+
+    async def test_shares_listener_per_service_url(self):
+        self.assertIs(get_job_listener(SERVICE_URL), get_job_listener(SERVICE_URL))
+        self.assertIsNot(get_job_listener(SERVICE_URL), get_job_listener("http://other/service"))
+
+
+class TestWaitingOverWebSocket(aiounittest.AsyncTestCase):
+    def use_connections(self, connections):
+        listener = get_job_listener(SERVICE_URL)
+        listener._connect = connections  # pylint: disable=protected-access
+        listener.reconnect_delay = 0
+
+    async def test_polls_when_websockets_are_unavailable(self):
+        self.use_connections(FakeConnections(connect_errors=[InvalidStatusCode(403)]))
+        transport = FakeTransport(result={"tag": "polled"})
+
+        job_result = await _wait_for_job_result_ws(transport, SERVICE_URL, "1")
+
+        self.assertEqual(job_result.tag, "polled")
+        self.assertEqual(transport.polled_tickets, ["1"])
+
+    async def test_enforces_the_strategy_timeout(self):
+        connections = FakeConnections(delay=10)
+        self.use_connections(connections)
+        strategy = PollingStrategy(timeout=0.05)
+
+        with self.assertRaises(JobTimeoutError):
+            await _wait_for_job_result_ws(FakeTransport(), SERVICE_URL, "1", strategy)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(connections.open_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
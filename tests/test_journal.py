@@ -0,0 +1,140 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import (
+    JobResult,
+    ReportingClient,
+    TicketJournal,
+    run_many,
+)
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+SERVICE_URL = "https://fake/reporting/service"
+
+
+class TestTicketJournal(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "journal.db")
+
+    def test_records_job_states(self):
+        job_args = {"template": {"itemId": "item"}, "parameters": [{"name": "A", "containsMultipleValues": True, "values": [1, 2]}]}
+
+        with TicketJournal(self.path) as journal:
+            journal.record_submitted("a", SERVICE_URL, job_args, "ticket1")
+            journal.record_submitted("b", SERVICE_URL, job_args, "ticket2")
+            journal.record_submitted("c", SERVICE_URL, job_args, "ticket3")
+            journal.record_finished("b", JobResult(SERVICE_URL, "ticket2", "tag", length=10))
+            journal.record_failed("c", Exception("No artifact"))
+
+        # The entries survive the journal being reopened.
+        with TicketJournal(self.path) as journal:
+            outstanding = journal.outstanding()
+            finished = journal.get("b")
+            failed = journal.get("c")
+
+            self.assertEqual([x.ticket for x in outstanding], ["ticket1"])
+            self.assertEqual(outstanding[0].parameters, {"A": [1, 2]})
+            self.assertEqual((finished.status, finished.result.length), ("finished", 10))
+            self.assertEqual((failed.status, failed.error), ("failed", "No artifact"))
+            self.assertIsNone(journal.get("d"))
+
+            journal.clear()
+            self.assertEqual(journal.entries(), [])
+
+
+class TestResumingJobs(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.journal = TicketJournal(os.path.join(temp_dir.name, "journal.db"))
+        self.addCleanup(self.journal.close)
+
+    async def interrupt_batch(self):
+        """Submits three jobs, then stops before they finish."""
+
+        transport = FakeTransport(polls_needed=None)
+
+        async def run_batch():
+            return [x async for x in run_many(MOCK_PORTAL_ITEM_ID, ({"A": x} for x in range(3)), use_polling=True, transport=transport, journal=self.journal)]
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(run_batch(), 0.1)
+        self.assertEqual(len(transport.submitted), 3)
+
+    async def test_reattaches_to_submitted_jobs(self):
+        await self.interrupt_batch()
+        transport = FakeTransport()
+
+        results = [x async for x in run_many(MOCK_PORTAL_ITEM_ID, ({"A": x} for x in range(4)), use_polling=True, transport=transport, journal=self.journal)]
+
+        self.assertTrue(all(x.error is None for x in results))
+        # Only the job that wasn't in the journal is submitted.
+        self.assertEqual(len(transport.submitted), 1)
+        self.assertEqual(set(transport.polled_tickets), {"ticket1", "ticket2", "ticket3"})
+        self.assertEqual(self.journal.outstanding(), [])
+
+    async def test_resumes_outstanding_jobs(self):
+        await self.interrupt_batch()
+        transport = FakeTransport()
+
+        async with ReportingClient(transport=transport, journal=self.journal) as client:
+            results = [x async for x in client.resume(use_polling=True)]
+
+            self.assertEqual(sorted(x.parameters["A"] for x in results), [0, 1, 2])
+            self.assertEqual(sorted(x.result.ticket for x in results), ["ticket1", "ticket2", "ticket3"])
+            self.assertEqual(transport.submitted, [])
+
+            # Finished jobs are skipped.
+            self.assertEqual([x async for x in client.resume(use_polling=True)], [])
+            url = await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, A=1)
+            self.assertIn("ticket=ticket2", url)
+            self.assertEqual(transport.submitted, [])
+
+    async def test_resubmits_failed_jobs(self):
+        async with ReportingClient(transport=FakeTransport(failing_tickets={"ticket1"}), journal=self.journal) as client:
+            with self.assertRaises(Exception):
+                await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, A=1)
+
+        self.assertEqual(self.journal.entries()[0].status, "failed")
+        transport = FakeTransport()
+        async with ReportingClient(transport=transport, journal=self.journal) as client:
+            await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, A=1)
+
+        self.assertEqual(len(transport.submitted), 1)
+        self.assertEqual(self.journal.entries()[0].status, "finished")
+
+    async def test_writes_off_the_event_loop(self):
+        threads = set()
+        record_submitted = self.journal.record_submitted
+
+        def record_thread(*args):
+            threads.add(threading.get_ident())
+            record_submitted(*args)
+
+        self.journal.record_submitted = record_thread
+        async with ReportingClient(transport=FakeTransport(), journal=self.journal) as client:
+            await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, A=1)
+
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_requires_a_journal_to_resume(self):
+        async with ReportingClient(transport=FakeTransport()) as client:
+            with self.assertRaises(ValueError):
+                async for _ in client.resume():
+                    pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import time
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import PollingStrategy
+from geocortex.reporting.client.polling import PollingScheduler, _schedulers, get_polling_scheduler
+from tests.fake_transport import FakeTransport
+
+SERVICE_URL = "https://apps.vertigisstudio.com/reporting/service"
+
+
+class SlowTransport(FakeTransport):
+    """Takes `delay` seconds to answer polls for the "slow" ticket."""
+
+    def __init__(self, polls_needed, delay):
+        super().__init__(polls_needed=polls_needed)
+        self.delay = delay
+
+    def get_poll_delay(self, ticket):
+        return self.delay if ticket == "slow" else 0
+
+
+class TestPollingStrategy(unittest.TestCase):
+    def test_backs_off_up_to_max_interval(self):
+        strategy = PollingStrategy(initial_interval=1, multiplier=2, max_interval=5, jitter=0)
+
+        self.assertEqual([strategy.interval(x) for x in range(5)], [1, 2, 4, 5, 5])
+
+    def test_applies_jitter(self):
+        strategy = PollingStrategy(initial_interval=1, max_interval=1, jitter=0.5)
+
+        for _ in range(100):
+            self.assertTrue(0.5 <= strategy.interval(0) <= 1.5)
+
+    def test_rejects_invalid_options(self):
+        with self.assertRaises(ValueError):
+            PollingStrategy(initial_interval=2, max_interval=1)
+        with self.assertRaises(ValueError):
+            PollingStrategy(multiplier=0.5)
+
+
+class TestPollingScheduler(aiounittest.AsyncTestCase):
+    async def test_polls_many_tickets_from_one_loop(self):
+        transport = FakeTransport(polls_needed=3)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01, jitter=0)
+        scheduler = PollingScheduler(transport, SERVICE_URL, strategy)
+
+        job_results = await asyncio.gather(*(scheduler.wait(str(x)) for x in range(20)))
+
+        self.assertEqual(job_results[3].url, f"{SERVICE_URL}/job/result?ticket=3&tag=tag")
+        self.assertEqual(transport.polls, {str(x): 3 for x in range(20)})
+        self.assertEqual(transport.max_running, 20, "Polls due tickets in the same pass")
+        self.assertEqual(scheduler.pending_tickets, 0)
+
+    async def test_raises_after_timeout(self):
+        transport = FakeTransport(polls_needed=1000)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.05, timeout=0.1)
+        scheduler = PollingScheduler(transport, SERVICE_URL, strategy)
+
+        with self.assertRaises(TimeoutError) as context_manager:
+            await scheduler.wait("1")
+
+        self.assertEqual(
+            str(context_manager.exception),
+            "Report job did not finish within 0.1 seconds. Ticket: 1",
+        )
+        self.assertLess(transport.polls["1"], 20)
+
+    async def test_stops_polling_cancelled_ticket(self):
+        transport = FakeTransport(polls_needed=1000)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01)
+        scheduler = PollingScheduler(transport, SERVICE_URL, strategy)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.wait("1"), 0.05)
+
+        self.assertEqual(scheduler.pending_tickets, 0)
+
+    async def test_slow_poll_does_not_hold_up_other_tickets(self):
+        transport = SlowTransport(polls_needed=2, delay=5)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01)
+        scheduler = PollingScheduler(transport, SERVICE_URL, strategy)
+        slow = asyncio.ensure_future(scheduler.wait("slow"))
+        start = time.monotonic()
+
+        await scheduler.wait("fast")
+
+        self.assertLess(time.monotonic() - start, 1)
+        slow.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await slow
+        await asyncio.sleep(0.01)
+        self.assertEqual(scheduler.pending_tickets, 0)
+
+    async def test_enforces_deadline_during_slow_poll(self):
+        transport = SlowTransport(polls_needed=2, delay=5)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01, timeout=0.1)
+        scheduler = PollingScheduler(transport, SERVICE_URL, strategy)
+        start = time.monotonic()
+
+        with self.assertRaises(TimeoutError):
+            await scheduler.wait("slow")
+
+        self.assertLess(time.monotonic() - start, 1)
+
+    async def test_forgets_idle_schedulers(self):
+        transport = FakeTransport(polls_needed=1)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01)
+
+        await get_polling_scheduler(transport, SERVICE_URL, strategy).wait("1")
+        await asyncio.sleep(0)
+
+        self.assertNotIn((transport, SERVICE_URL, strategy), _schedulers.get(asyncio.get_event_loop(), {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,15 @@
 # pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring
 
 import json
+import time
 import unittest
 # Swap for unittest.IsolatedAsyncioTestCase if we drop Python < 3.8
 import aiounittest
 import responses
 
-from geocortex.reporting.client import run
+from geocortex.reporting.client import JobResult, run, run_many
+from geocortex.reporting.client.auth import reporting_token_cache
+from geocortex.reporting.client.portal_utils import portal_item_cache
 
 MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
 MOCK_PORTAL_TOKEN = "mock-portal-token"
@@ -55,6 +58,10 @@ def setup_default_responses(
 
 
 class TestReporting(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        reporting_token_cache.clear()
+
     async def test_basic(self):
         with responses.RequestsMock() as rsps:
             setup_default_responses(rsps)
@@ -66,6 +73,30 @@ class TestReporting(aiounittest.AsyncTestCase):
                 f"{DEFAULT_REPORTING_URL}/service/job/result?ticket={MOCK_REPORT_TICKET}&tag={MOCK_REPORT_TAG}",
             )
 
+    async def test_returns_job_result(self):
+        with responses.RequestsMock() as rsps:
+            setup_default_responses(rsps)
+
+            before = time.time()
+            job_result = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, return_job_result=True)
+
+            self.assertIsInstance(job_result, JobResult)
+            self.assertEqual(job_result.ticket, MOCK_REPORT_TICKET)
+            self.assertEqual(job_result.tag, MOCK_REPORT_TAG)
+            self.assertEqual(
+                job_result.url,
+                f"{DEFAULT_REPORTING_URL}/service/job/result?ticket={MOCK_REPORT_TICKET}&tag={MOCK_REPORT_TAG}",
+            )
+            self.assertEqual(job_result.content_type, "application/pdf")
+            self.assertEqual(job_result.length, 24003)
+            self.assertEqual(
+                job_result.logs_url,
+                f"{DEFAULT_REPORTING_URL}/service/job/logs?ticket={MOCK_REPORT_TICKET}",
+            )
+            self.assertTrue(before <= job_result.submitted <= job_result.started <= job_result.finished)
+            self.assertGreaterEqual(job_result.duration, 0)
+            self.assertFalse(hasattr(job_result, "__dict__"), "Is slotted")
+
     async def test_with_token(self):
         with responses.RequestsMock() as rsps:
             setup_default_responses(rsps)
@@ -285,7 +316,104 @@ class TestReporting(aiounittest.AsyncTestCase):
             )
 
 
+class TestRunMany(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        reporting_token_cache.clear()
+
+    async def test_runs_job_for_each_param_set(self):
+        with responses.RequestsMock() as rsps:
+            setup_default_responses(rsps)
+            rsps.remove(
+                responses.GET,
+                f"{DEFAULT_PORTAL_URL}/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json",
+            )
+            rsps.add(
+                responses.GET,
+                f"{DEFAULT_PORTAL_URL}/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json&token={MOCK_PORTAL_TOKEN}",
+                json={"access": "private", "url": f"{DEFAULT_REPORTING_URL}/"},
+                status=200,
+            )
+            rsps.add(
+                responses.POST,
+                f"{DEFAULT_REPORTING_URL}/service/auth/token/run",
+                json={"response": {"token": MOCK_REPORTING_TOKEN}},
+                status=200,
+            )
+
+            param_sets = [{"FeatureIds": [feature_id]} for feature_id in range(5)]
+            results = [
+                result
+                async for result in run_many(
+                    MOCK_PORTAL_ITEM_ID,
+                    param_sets,
+                    max_concurrency=2,
+                    use_polling=True,
+                    token=MOCK_PORTAL_TOKEN,
+                )
+            ]
+
+            self.assertEqual(sorted(x.index for x in results), [0, 1, 2, 3, 4])
+            for result in results:
+                self.assertIsNone(result.error)
+                self.assertEqual(result.parameters, param_sets[result.index])
+                self.assertEqual(
+                    result.url,
+                    f"{DEFAULT_REPORTING_URL}/service/job/result?ticket={MOCK_REPORT_TICKET}&tag={MOCK_REPORT_TAG}",
+                )
+                self.assertEqual(result.result.length, 24003)
+
+            called_urls = [x.request.url for x in rsps.calls]
+            self.assertEqual(
+                called_urls.count(f"{DEFAULT_PORTAL_URL}/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json&token={MOCK_PORTAL_TOKEN}"),
+                1,
+                "Resolves the portal item once",
+            )
+            self.assertEqual(
+                called_urls.count(f"{DEFAULT_REPORTING_URL}/service/auth/token/run"),
+                1,
+                "Exchanges the token once",
+            )
+            self.assertEqual(
+                called_urls.count(f"{DEFAULT_REPORTING_URL}/service/job/run"), 5
+            )
+
+    async def test_captures_job_errors(self):
+        def start_job(request):
+            parameters = json.loads(request.body)["parameters"]
+            if parameters[0]["values"] == [2]:
+                return (500, {}, "")
+            return (200, {}, json.dumps({"response": {"ticket": MOCK_REPORT_TICKET}}))
+
+        with responses.RequestsMock() as rsps:
+            setup_default_responses(rsps)
+            rsps.remove(responses.POST, f"{DEFAULT_REPORTING_URL}/service/job/run")
+            rsps.add_callback(
+                responses.POST,
+                f"{DEFAULT_REPORTING_URL}/service/job/run",
+                callback=start_job,
+            )
+
+            results = [
+                result
+                async for result in run_many(
+                    MOCK_PORTAL_ITEM_ID,
+                    ({"FeatureIds": [feature_id]} for feature_id in range(4)),
+                    use_polling=True,
+                )
+            ]
+
+            failed = [x for x in results if x.error]
+            self.assertEqual(len(results), 4)
+            self.assertEqual([x.index for x in failed], [2])
+            self.assertEqual(failed[0].url, "")
+
+
 class TestPrinting(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+        reporting_token_cache.clear()
+
     async def test_passes_dpi_as_job_arg(self):
         with responses.RequestsMock() as rsps:
             setup_default_responses(rsps)
@@ -0,0 +1,206 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import (
+    DiskResultCache,
+    JobResult,
+    MemoryResultCache,
+    PollingStrategy,
+    ReportingClient,
+    RetryPolicy,
+    run,
+)
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from geocortex.reporting.client.result_cache import get_result_key
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+SERVICE_URL = "https://fake/reporting/service"
+
+FAST_POLLING = PollingStrategy(initial_interval=0.005, max_interval=0.005)
+
+
+def job_args(parameters, culture=""):
+    args = {"template": {"itemId": "item"}, "parameters": parameters}
+    if culture:
+        args["culture"] = culture
+    return args
+
+
+class TestResultKey(unittest.TestCase):
+    def test_ignores_parameter_order(self):
+        first = {"name": "A", "containsMultipleValues": False, "value": 1}
+        second = {"name": "B", "containsMultipleValues": True, "values": [1, 2]}
+
+        self.assertEqual(
+            get_result_key(SERVICE_URL, job_args([first, second])),
+            get_result_key(SERVICE_URL, job_args([second, first])),
+        )
+
+    def test_distinguishes_arguments_and_token(self):
+        parameter = {"name": "A", "containsMultipleValues": False, "value": 1}
+        keys = {
+            get_result_key(SERVICE_URL, job_args([parameter])),
+            get_result_key(SERVICE_URL, job_args([dict(parameter, value=2)])),
+            get_result_key(SERVICE_URL, job_args([parameter], culture="fr")),
+            get_result_key(SERVICE_URL, job_args([parameter]), token="token"),
+            get_result_key("https://other/service", job_args([parameter])),
+        }
+
+        self.assertEqual(len(keys), 5)
+
+
+class TestResultCache(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_reuses_results_of_identical_jobs(self):
+        transport = FakeTransport(poll_delay=0.01)
+        cache = MemoryResultCache()
+
+        first = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, result_cache=cache, A=1, B=2)
+        second = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, result_cache=cache, B=2, A=1)
+        other = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, result_cache=cache, A=2, B=2)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(len(transport.submitted), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    async def test_collapses_concurrent_identical_jobs(self):
+        transport = FakeTransport(poll_delay=0.01)
+        async with ReportingClient(transport=transport, result_cache=MemoryResultCache()) as client:
+            reports = await asyncio.gather(*(client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, A=1) for _ in range(10)))
+
+        self.assertEqual(len(set(reports)), 1)
+        self.assertEqual(len(transport.submitted), 1)
+
+    async def test_cancels_shared_job_once_every_caller_is_cancelled(self):
+        transport = FakeTransport(polls_needed=None)
+        async with ReportingClient(transport=transport, result_cache=MemoryResultCache()) as client:
+            callers = [asyncio.ensure_future(client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, polling_strategy=FAST_POLLING, A=1)) for _ in range(2)]
+            while not transport.polled_tickets:
+                await asyncio.sleep(0.001)
+
+            callers[0].cancel()
+            polls = len(transport.polled_tickets)
+            await asyncio.sleep(0.05)
+            self.assertGreater(len(transport.polled_tickets), polls, "Keeps polling for the other caller")
+
+            callers[1].cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0.01)
+            polls = len(transport.polled_tickets)
+            await asyncio.sleep(0.05)
+
+        self.assertEqual(len(transport.polled_tickets), polls)
+        self.assertEqual(len(transport.submitted), 1)
+
+    async def test_reads_and_writes_files_off_the_event_loop(self):
+        threads = set()
+
+        class RecordingCache(DiskResultCache):
+            def get(self, key):
+                threads.add(threading.current_thread())
+                return super().get(key)
+
+            def set(self, key, job_result):
+                threads.add(threading.current_thread())
+                super().set(key, job_result)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = RecordingCache(temp_dir)
+            for _ in range(2):
+                await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=FakeTransport(), result_cache=cache, A=1)
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_does_not_cache_failures(self):
+        transport = FakeTransport(poll_delay=0.01, submit_errors=[ConnectionError()])
+        cache = MemoryResultCache()
+
+        with self.assertRaises(ConnectionError):
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, result_cache=cache, retry_policy=RetryPolicy(max_attempts=1), A=1)
+        await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, result_cache=cache, A=1)
+
+        self.assertEqual(len(transport.submitted), 1)
+
+    async def test_runs_every_job_without_a_cache(self):
+        transport = FakeTransport(poll_delay=0.01)
+        for _ in range(2):
+            await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport, A=1)
+
+        self.assertEqual(len(transport.submitted), 2)
+
+
+class TestDiskResultCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_shares_results_between_instances(self):
+        job_result = JobResult(SERVICE_URL, "1", "tag", content_type="application/pdf", length=100, submitted=1.0, finished=3.0)
+        DiskResultCache(self.temp_dir.name).set("key", job_result)
+
+        cached = DiskResultCache(self.temp_dir.name).get("key")
+
+        self.assertEqual(cached.url, job_result.url)
+        self.assertEqual(cached.to_dict(), job_result.to_dict())
+        self.assertEqual(cached.duration, 2.0)
+
+    def test_expires_results(self):
+        cache = DiskResultCache(self.temp_dir.name, ttl=0.01)
+        cache.set("key", JobResult(SERVICE_URL, "1", "tag"))
+        path = os.path.join(self.temp_dir.name, "key.json")
+        with open(path, encoding="utf-8") as file:
+            entry = json.load(file)
+        entry["expires"] = 0
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+
+        self.assertIsNone(cache.get("key"))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_evicts_oldest_results(self):
+        cache = DiskResultCache(self.temp_dir.name, max_size=2)
+        for index in range(3):
+            cache.set(str(index), JobResult(SERVICE_URL, str(index), "tag"))
+            path = os.path.join(self.temp_dir.name, f"{index}.json")
+            os.utime(path, (index, index))
+
+        self.assertIsNone(cache.get("0"))
+        self.assertEqual(cache.get("2").ticket, "2")
+
+    def test_frees_a_tenth_of_the_space_when_full(self):
+        cache = DiskResultCache(self.temp_dir.name, max_size=20)
+        scans = []
+        scan = cache._scan  # pylint: disable=protected-access
+        cache._scan = lambda: scans.append(1) or scan()  # pylint: disable=protected-access
+
+        for index in range(22):
+            cache.set(str(index), JobResult(SERVICE_URL, str(index), "tag"))
+            cache.set(str(index), JobResult(SERVICE_URL, str(index), "tag"))
+
+        self.assertEqual(len(scans), 1, "Only scans the directory when it's full")
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 19)
+
+    def test_ignores_corrupt_entries(self):
+        cache = DiskResultCache(self.temp_dir.name)
+        with open(os.path.join(self.temp_dir.name, "key.json"), "w", encoding="utf-8") as file:
+            file.write("{")
+
+        self.assertIsNone(cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import unittest
+import aiounittest
+from websockets.exceptions import ConnectionClosed
+
+from geocortex.reporting.client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HTTPStatusError,
+    Instrumentation,
+    JobTimeoutError,
+    PollingStrategy,
+    ReportingClient,
+    RetryPolicy,
+)
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from geocortex.reporting.client.transport import is_transient_error
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+SERVICE_URL = "https://fake/reporting/service"
+
+FAST_RETRIES = RetryPolicy(initial_delay=0.001, max_delay=0.001)
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        self.retries = []
+
+    def retried(self, stage, attempt, error):
+        self.retries.append((stage, attempt))
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backs_off_up_to_max_delay(self):
+        policy = RetryPolicy(initial_delay=1, multiplier=2, max_delay=5, jitter=0)
+
+        self.assertEqual([policy.delay(x) for x in range(1, 6)], [1, 2, 4, 5, 5])
+
+    def test_retries_transient_errors_only(self):
+        policy = RetryPolicy(max_attempts=2)
+
+        self.assertTrue(policy.should_retry(HTTPStatusError(503, SERVICE_URL), 1))
+        self.assertTrue(policy.should_retry(ConnectionResetError(), 1))
+        self.assertFalse(policy.should_retry(ConnectionResetError(), 2))
+        self.assertFalse(policy.should_retry(HTTPStatusError(400, SERVICE_URL), 1))
+        self.assertFalse(policy.should_retry(JobTimeoutError(), 1))
+        self.assertFalse(policy.should_retry(CircuitOpenError(SERVICE_URL, 1), 1))
+
+    def test_treats_dropped_websockets_as_transient(self):
+        self.assertTrue(is_transient_error(ConnectionClosed(1006, "")))
+
+    def test_rejects_invalid_options(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+        with self.assertRaises(ValueError):
+            RetryPolicy(initial_delay=2, max_delay=1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure(SERVICE_URL)
+        breaker.record_success(SERVICE_URL)
+        breaker.record_failure(SERVICE_URL)
+        breaker.before_call(SERVICE_URL)
+        breaker.record_failure(SERVICE_URL)
+
+        self.assertTrue(breaker.is_open(SERVICE_URL))
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call(SERVICE_URL)
+        breaker.before_call("https://other/reporting/service")
+
+    def test_lets_one_trial_through_after_reset_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure(SERVICE_URL)
+
+        # Only the first call after the timeout is let through.
+        breaker._circuits[SERVICE_URL].opened_at -= 60  # pylint: disable=protected-access
+        breaker.before_call(SERVICE_URL)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call(SERVICE_URL)
+
+        breaker.record_success(SERVICE_URL)
+        self.assertFalse(breaker.is_open(SERVICE_URL))
+
+
+class TestRetries(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_retries_submission(self):
+        transport = FakeTransport(submit_errors=[HTTPStatusError(502, SERVICE_URL), ConnectionResetError()])
+        instrumentation = RecordingInstrumentation()
+
+        async with ReportingClient(transport=transport, retry_policy=FAST_RETRIES, instrumentation=instrumentation) as client:
+            url = await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+        self.assertIn("ticket=ticket1", url)
+        self.assertEqual(len(transport.submitted), 1)
+        self.assertEqual(instrumentation.retries, [("start_job", 1), ("start_job", 2)])
+
+    async def test_gives_up_after_max_attempts(self):
+        transport = FakeTransport(submit_errors=[HTTPStatusError(503, SERVICE_URL)] * 3)
+
+        async with ReportingClient(transport=transport, retry_policy=FAST_RETRIES) as client:
+            with self.assertRaises(HTTPStatusError):
+                await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+        self.assertEqual(len(transport.submitted), 0)
+
+    async def test_does_not_retry_rejected_jobs(self):
+        transport = FakeTransport(submit_errors=[HTTPStatusError(400, SERVICE_URL), ConnectionResetError()])
+
+        async with ReportingClient(transport=transport, retry_policy=FAST_RETRIES) as client:
+            with self.assertRaises(HTTPStatusError):
+                await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+        self.assertEqual(len(transport.submit_errors), 1)
+
+    async def test_resumes_waiting_on_the_same_ticket(self):
+        transport = FakeTransport(poll_errors=[ConnectionResetError(), HTTPStatusError(504, SERVICE_URL)])
+
+        async with ReportingClient(transport=transport, retry_policy=FAST_RETRIES) as client:
+            url = await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+        self.assertIn("ticket=ticket1", url)
+        self.assertEqual(len(transport.submitted), 1)
+        self.assertEqual(transport.polled_tickets, ["ticket1"] * 3)
+
+    async def test_does_not_retry_job_timeouts(self):
+        transport = FakeTransport(polls_needed=None)
+        strategy = PollingStrategy(initial_interval=0.01, max_interval=0.01, timeout=0.03)
+
+        async with ReportingClient(transport=transport, retry_policy=FAST_RETRIES) as client:
+            with self.assertRaises(JobTimeoutError):
+                await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, polling_strategy=strategy)
+
+        self.assertEqual(len(transport.submitted), 1)
+
+    async def test_fails_fast_while_the_circuit_is_open(self):
+        transport = FakeTransport(submit_errors=[HTTPStatusError(503, SERVICE_URL)] * 3)
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        async with ReportingClient(transport=transport, retry_policy=FAST_RETRIES, circuit_breaker=breaker) as client:
+            with self.assertRaises(CircuitOpenError):
+                await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+            with self.assertRaises(CircuitOpenError):
+                await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+
+        # The third attempt was never sent.
+        self.assertEqual(len(transport.submit_errors), 1)
+        self.assertTrue(breaker.is_open(SERVICE_URL))
+
+
+if __name__ == "__main__":
+    unittest.main()
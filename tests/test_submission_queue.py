@@ -0,0 +1,107 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import asyncio
+import inspect
+import time
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import BATCH, INTERACTIVE, PollingStrategy, ReportingClient, SubmissionQueue, run, run_chunked, run_many
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import FakeTransport
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+SERVICE_URL = "https://fake/reporting/service"
+
+FAST_POLLING = PollingStrategy(initial_interval=0.005, max_interval=0.005)
+
+
+class TestSubmissionQueue(aiounittest.AsyncTestCase):
+    async def test_lets_lower_priorities_through_first(self):
+        queue = SubmissionQueue(max_outstanding=1)
+        order = []
+
+        async def submit(name, priority):
+            await queue.acquire(SERVICE_URL, priority)
+            order.append(name)
+
+        await queue.acquire(SERVICE_URL)
+        waiters = [asyncio.ensure_future(submit(x, BATCH)) for x in ("batch1", "batch2")]
+        waiters.append(asyncio.ensure_future(submit("interactive", INTERACTIVE)))
+        await asyncio.sleep(0)
+        self.assertEqual(queue.queued(SERVICE_URL), 3)
+
+        for _ in range(3):
+            queue.release(SERVICE_URL)
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+
+        self.assertEqual(order, ["interactive", "batch1", "batch2"])
+        self.assertEqual(queue.outstanding(SERVICE_URL), 1)
+
+    async def test_limits_the_rate_per_service(self):
+        queue = SubmissionQueue(rate=100, burst=2)
+        start = time.monotonic()
+
+        for _ in range(6):
+            await queue.acquire(SERVICE_URL)
+        await queue.acquire("https://other/reporting/service")
+
+        # Two jobs go straight away, then one every 10 ms.
+        self.assertGreaterEqual(time.monotonic() - start, 0.035)
+        self.assertEqual(queue.outstanding(SERVICE_URL), 6)
+
+    async def test_skips_cancelled_jobs(self):
+        queue = SubmissionQueue(max_outstanding=1)
+        await queue.acquire(SERVICE_URL)
+        cancelled = asyncio.ensure_future(queue.acquire(SERVICE_URL))
+        waiting = asyncio.ensure_future(queue.acquire(SERVICE_URL))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        queue.release(SERVICE_URL)
+        await waiting
+
+        self.assertTrue(cancelled.cancelled())
+        self.assertEqual(queue.queued(SERVICE_URL), 0)
+        self.assertEqual(queue.outstanding(SERVICE_URL), 1)
+
+    def test_rejects_invalid_options(self):
+        with self.assertRaises(ValueError):
+            SubmissionQueue(rate=0)
+        with self.assertRaises(ValueError):
+            SubmissionQueue(max_outstanding=0)
+
+
+class TestQueuedJobs(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_runs_interactive_jobs_ahead_of_a_batch(self):
+        transport = FakeTransport(polls_needed=2)
+        queue = SubmissionQueue(max_outstanding=1)
+
+        async with ReportingClient(transport=transport, submission_queue=queue) as client:
+            batch = asyncio.ensure_future(self.collect(client.run_many(MOCK_PORTAL_ITEM_ID, ({"A": x} for x in range(4)), use_polling=True, polling_strategy=FAST_POLLING)))
+            while not transport.submitted:
+                await asyncio.sleep(0.001)
+            url = await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True, polling_strategy=FAST_POLLING, A="interactive")
+            results = await batch
+
+        self.assertIn("ticket=ticket2", url)
+        self.assertEqual([x["A"] for x in transport.submitted[:2]], [0, "interactive"])
+        self.assertTrue(all(x.error is None for x in results))
+        self.assertEqual(queue.outstanding(SERVICE_URL), 0)
+
+    def test_runs_single_jobs_ahead_of_batches_by_default(self):
+        for functions, priority in [((run, ReportingClient.run), INTERACTIVE), ((run_many, ReportingClient.run_many, run_chunked, ReportingClient.run_chunked), BATCH)]:
+            for function in functions:
+                self.assertEqual(inspect.signature(function).parameters["priority"].default, priority, function.__qualname__)
+
+    @staticmethod
+    async def collect(results):
+        return [x async for x in results]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+# pylint: disable=line-too-long,missing-class-docstring,missing-function-docstring,abstract-method
+
+import unittest
+import aiounittest
+
+from geocortex.reporting.client import (
+    run,
+    AiohttpTransport,
+    HTTPStatusError,
+    ReportingClient,
+    RequestsTransport,
+)
+from geocortex.reporting.client.portal_utils import portal_item_cache
+from tests.fake_transport import REPORTING_URL, FakeTransport
+from tests.local_server import LocalServer, web
+
+MOCK_PORTAL_ITEM_ID = "mock-portal-item-id"
+MOCK_REPORT_TICKET = "mock-report-ticket"
+MOCK_REPORT_TAG = "mock-report-tag"
+
+JOB_RESULTS = {
+    "results": [
+        {"$type": "JobResult", "tag": MOCK_REPORT_TAG},
+        {"$type": "JobQuit", "kind": "Run"},
+    ]
+}
+
+
+class TestTransport(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def test_uses_provided_transport(self):
+        transport = FakeTransport()
+
+        report = await run(MOCK_PORTAL_ITEM_ID, use_polling=True, transport=transport)
+
+        self.assertEqual(report, f"{REPORTING_URL}/service/job/result?ticket=ticket1&tag=tag")
+        self.assertEqual(
+            transport.requests,
+            [
+                ("GET", f"https://www.arcgis.com/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}?f=json"),
+                ("POST", f"{REPORTING_URL}/service/job/run"),
+                ("GET", f"{REPORTING_URL}/service/job/artifacts?ticket=ticket1"),
+            ],
+        )
+
+    async def test_closes_owned_transport(self):
+        closed = []
+
+        class ClosingTransport(RequestsTransport):
+            async def close(self):
+                closed.append(self)
+
+        async with ReportingClient(transport=ClosingTransport()):
+            pass
+        self.assertEqual(closed, [], "Doesn't close a transport it was given")
+
+        client = ReportingClient(pool_size=1, timeout=5)
+        self.assertEqual(client.transport.timeout, 5)
+        await client.close()
+
+
+def reporting_routes(peers):
+    """Routes for a local portal and reporting service that record the client's address."""
+
+    async def get_item(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"access": "public", "url": f"{request.url.origin()}/reporting"})
+
+    async def run_job(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"response": {"ticket": MOCK_REPORT_TICKET}})
+
+    async def get_artifacts(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response(JOB_RESULTS)
+
+    return [
+        web.get(f"/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}", get_item),
+        web.post("/reporting/service/job/run", run_job),
+        web.get("/reporting/service/job/artifacts", get_artifacts),
+    ]
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class TestReportingClient(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+    async def assert_reuses_connection(self, transport):
+        peers = set()
+        async with LocalServer(reporting_routes(peers)) as server:
+            async with ReportingClient(portal_url=server.base_url, transport=transport) as client:
+                for _ in range(5):
+                    report = await client.run(MOCK_PORTAL_ITEM_ID, use_polling=True)
+                    self.assertEqual(
+                        report,
+                        f"{server.base_url}/reporting/service/job/result?ticket={MOCK_REPORT_TICKET}&tag={MOCK_REPORT_TAG}",
+                    )
+
+        self.assertEqual(len(peers), 1, "Keeps a single connection alive")
+
+    async def test_requests_transport_reuses_connection(self):
+        transport = RequestsTransport(pool_size=2)
+        try:
+            await self.assert_reuses_connection(transport)
+        finally:
+            await transport.close()
+
+    async def test_aiohttp_transport_reuses_connection(self):
+        transport = AiohttpTransport(pool_size=2)
+        try:
+            await self.assert_reuses_connection(transport)
+        finally:
+            await transport.close()
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class TestAiohttpTransport(aiounittest.AsyncTestCase):
+    def setUp(self):
+        portal_item_cache.clear()
+
+
+    async def test_runs_job(self):
+        async def get_item(request):
+            return web.json_response({"access": "public", "url": f"{request.url.origin()}/reporting"})
+
+        async def run_job(request):
+            self.assertEqual((await request.json())["template"]["itemId"], MOCK_PORTAL_ITEM_ID)
+            return web.json_response({"response": {"ticket": MOCK_REPORT_TICKET}})
+
+        async def get_artifacts(_request):
+            return web.json_response(JOB_RESULTS)
+
+        routes = [
+            web.get(f"/sharing/rest/content/items/{MOCK_PORTAL_ITEM_ID}", get_item),
+            web.post("/reporting/service/job/run", run_job),
+            web.get("/reporting/service/job/artifacts", get_artifacts),
+        ]
+        async with LocalServer(routes) as server:
+            transport = AiohttpTransport()
+            try:
+                report = await run(
+                    MOCK_PORTAL_ITEM_ID,
+                    portal_url=server.base_url,
+                    use_polling=True,
+                    transport=transport,
+                )
+            finally:
+                await transport.close()
+
+        self.assertEqual(
+            report,
+            f"{server.base_url}/reporting/service/job/result?ticket={MOCK_REPORT_TICKET}&tag={MOCK_REPORT_TAG}",
+        )
+
+    async def test_raises_on_error_status(self):
+        async with LocalServer([]) as server:
+            transport = AiohttpTransport()
+            try:
+                with self.assertRaises(HTTPStatusError) as context_manager:
+                    await transport.get_json(f"{server.base_url}/missing")
+            finally:
+                await transport.close()
+
+        self.assertEqual(context_manager.exception.status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()